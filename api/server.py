@@ -0,0 +1,289 @@
+"""
+HTTP API рекомендаций без Gradio.
+
+Индексы BM25 и граф навыков загружаются один раз в пуле поиска, FAISS-индекс
+(если задан DENSE_INDEX_PATH) — при старте процесса. Состояния между
+запросами нет, поэтому процессов можно запустить сколько угодно за
+балансировщиком; общий кэш LLM — через LLM_CACHE_PATH.
+
+Пример:
+    uvicorn api.server:app --host 0.0.0.0 --port 8000 --workers 2
+    curl -X POST localhost:8000/recommend -H 'Content-Type: application/json' \\
+        -d '{"career_goals": "Сейчас я Data Scientist, через 2 года хочу стать Senior ML Engineer"}'
+"""
+import asyncio
+import json
+import re
+import sys
+import time
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional, Union
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field, ValidationError
+
+from backend.worker_pool import RetrievalBusyError, RetrievalPool
+from config import ROOT_DIR, config
+from services.model_api import (
+    PRIORITY_RECOMMENDATION,
+    AdmissionController,
+    AdmissionRejectedError,
+    CircuitBreaker,
+    CircuitOpenError,
+    ModelAPIClient,
+    ResponseCache,
+    get_completion,
+)
+from services.prompt_builder import PromptBuilder
+
+# Модули vectorize импортируют друг друга без пакета
+sys.path.insert(0, str(ROOT_DIR / "vectorize"))
+
+VACANCIES_PATH = ROOT_DIR / "data_artefacts" / "vacancy_final.parquet"
+MODEL_NAME = f"gpt://{config.FOLDER_ID}/{config.MODEL_NAME}"
+
+llm_client = ModelAPIClient(
+    limit_per_host=config.LLM_CONNECTIONS_PER_HOST,
+    keepalive_timeout=config.LLM_KEEPALIVE_TIMEOUT,
+)
+llm_cache = ResponseCache(
+    max_entries=config.LLM_CACHE_SIZE,
+    ttl=config.LLM_CACHE_TTL,
+    disk_path=config.LLM_CACHE_PATH or None,
+)
+llm_admission = AdmissionController(
+    max_in_flight=config.LLM_MAX_IN_FLIGHT,
+    rps=config.LLM_RPS,
+    tpm=config.LLM_TPM,
+)
+llm_breaker = CircuitBreaker(
+    failure_threshold=config.LLM_BREAKER_FAILURES,
+    recovery_timeout=config.LLM_BREAKER_RECOVERY,
+)
+prompt_builder = PromptBuilder(token_budget=config.PROMPT_TOKEN_BUDGET)
+retrieval_pool = RetrievalPool(
+    workers=config.RETRIEVAL_WORKERS,
+    processes=config.RETRIEVAL_PROCESSES,
+    max_pending=config.RETRIEVAL_MAX_PENDING,
+    queue_timeout=config.RETRIEVAL_QUEUE_TIMEOUT,
+)
+
+# Состояние процесса для /ready
+state: Dict[str, Any] = {"retrieval": False, "dense": None, "dense_error": None, "started_at": None}
+
+
+class Message(BaseModel):
+    role: str
+    content: str
+
+
+class RecommendRequest(BaseModel):
+    career_goals: str = Field(..., min_length=1, description="Текущая позиция и цель, как в career_goals UI")
+    history: List[Message] = Field(default=[], description="Диалог анкеты; из него строится профиль")
+    profile: Dict[str, Any] = Field(default={}, description="Готовый профиль, если истории нет")
+    top_k: int = Field(default=10, ge=1, le=50)
+    with_llm: bool = Field(default=True, description="Сформировать текст рекомендаций через LLM")
+
+
+class BatchRequest(BaseModel):
+    items: List[RecommendRequest]
+
+
+class KeywordSearchRequest(BaseModel):
+    keywords: List[str] = Field(..., min_length=1)
+    top_k: int = Field(default=10, ge=1, le=100)
+
+
+class DenseSearchRequest(BaseModel):
+    query: Union[str, Dict[str, Any]] = Field(..., description="Текст или CandidateProfile")
+    top_n: int = Field(default=10, ge=1, le=100)
+    filters: Optional[Dict[str, Any]] = None
+
+
+def load_dense_engine():
+    """VacancySearchEngine с FAISS-индексом с диска (DENSE_INDEX_PATH)"""
+    import polars as pl
+    from vectorize import VacancySearchEngine
+
+    engine = VacancySearchEngine(config.DENSE_MODEL_NAME)
+    engine.load_index(config.DENSE_INDEX_PATH, pl.read_parquet(VACANCIES_PATH))
+    engine.warmup()
+    engine.enable_batching()
+    return engine
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    loop = asyncio.get_running_loop()
+    state["started_at"] = time.time()
+    await loop.run_in_executor(None, retrieval_pool.start, True)
+    state["retrieval"] = True
+    if config.DENSE_INDEX_PATH:
+        try:
+            state["dense"] = await loop.run_in_executor(None, load_dense_engine)
+        except Exception as e:
+            # Плотный поиск недоступен, остальные эндпоинты работают
+            state["dense_error"] = str(e)
+            print(f"[API] Не удалось загрузить FAISS-индекс: {e}")
+    try:
+        yield
+    finally:
+        await llm_client.close()
+        retrieval_pool.shutdown()
+
+
+app = FastAPI(title="Career Coach API", lifespan=lifespan)
+
+
+async def with_timeout(coro, timeout: float = None):
+    """Ограничивает время обработки запроса и переводит ошибки перегрузки в HTTP-коды"""
+    try:
+        return await asyncio.wait_for(coro, timeout or config.API_REQUEST_TIMEOUT)
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Превышено время обработки запроса")
+    except (RetrievalBusyError, AdmissionRejectedError, CircuitOpenError) as e:
+        raise HTTPException(status_code=503, detail=str(e))
+
+
+def parse_recommendation(llm_response: str) -> Dict[str, Any]:
+    """JSON рекомендаций из ответа LLM; если JSON нет — текст в поле response"""
+    json_match = re.search(r"\{[\s\S]*\}", llm_response)
+    if json_match:
+        try:
+            return json.loads(json_match.group(0))
+        except json.JSONDecodeError:
+            pass
+    return {"response": llm_response}
+
+
+async def recommend(request: RecommendRequest) -> Dict[str, Any]:
+    if request.history:
+        history = [message.model_dump() for message in request.history]
+        profile, _ = await retrieval_pool.process_user_profile(history)
+    else:
+        profile = request.profile
+    recommendations, expanded_skills, career_paths = await retrieval_pool.recommend_vacancies(
+        request.career_goals, top_k=request.top_k, top_career=2, min_skill_freq=2, top_skills=15
+    )
+    result = {
+        "recommendations": recommendations,
+        "skills_to_develop": expanded_skills,
+        "career_paths": career_paths,
+        "recommendation": None,
+    }
+    if not recommendations or not request.with_llm:
+        return result
+
+    messages, stats = prompt_builder.build(profile, request.career_goals, recommendations, expanded_skills, career_paths)
+    llm_response = await get_completion(
+        config.MODEL_URL, config.API_TOKEN, messages, MODEL_NAME, config.MODEL_TEMP, folder_id=config.FOLDER_ID,
+        client=llm_client, cache=llm_cache, admission=llm_admission, priority=PRIORITY_RECOMMENDATION,
+        budget=config.LLM_RECOMMENDATION_BUDGET, breaker=llm_breaker,
+    )
+    result["recommendation"] = parse_recommendation(llm_response)
+    result["prompt"] = stats
+    return result
+
+
+@app.get("/health")
+async def health():
+    """Процесс жив (для liveness-проверки)"""
+    return {"status": "ok"}
+
+
+@app.get("/ready")
+async def ready():
+    """Индексы загружены и LLM не отключён размыкателем (для readiness-проверки)"""
+    body = {
+        "retrieval": state["retrieval"],
+        "dense": state["dense"] is not None,
+        "dense_error": state["dense_error"],
+        "llm": llm_breaker.state,
+        "uptime": time.time() - state["started_at"] if state["started_at"] else 0.0,
+    }
+    is_ready = state["retrieval"] and not llm_breaker.is_open
+    return JSONResponse(body, status_code=200 if is_ready else 503)
+
+
+@app.get("/stats")
+async def stats():
+    return {
+        "retrieval": retrieval_pool.stats(),
+        "llm_cache": llm_cache.stats(),
+        "llm_admission": llm_admission.stats(),
+        "llm_breaker": llm_breaker.stats(),
+    }
+
+
+@app.post("/recommend")
+async def recommend_endpoint(request: RecommendRequest):
+    return await with_timeout(recommend(request))
+
+
+@app.post("/recommend/batch")
+async def recommend_batch(request: BatchRequest):
+    """
+    Рекомендации для нескольких запросов.
+
+    Ответ — NDJSON: по строке {"index", "result"} или {"index", "error"} на
+    каждый запрос в порядке готовности. Одновременно обрабатывается не
+    больше API_BATCH_CONCURRENCY запросов пакета.
+    """
+    if len(request.items) > config.API_MAX_BATCH:
+        raise HTTPException(status_code=413, detail=f"Не больше {config.API_MAX_BATCH} запросов в пакете")
+    semaphore = asyncio.Semaphore(config.API_BATCH_CONCURRENCY)
+
+    async def run_item(index: int, item: RecommendRequest) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                return {"index": index, "result": await with_timeout(recommend(item))}
+            except HTTPException as e:
+                return {"index": index, "error": e.detail, "status": e.status_code}
+            except Exception as e:
+                return {"index": index, "error": str(e), "status": 500}
+
+    async def lines():
+        tasks = [asyncio.ensure_future(run_item(index, item)) for index, item in enumerate(request.items)]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield json.dumps(await task, ensure_ascii=False, default=str) + "\n"
+        finally:
+            # Клиент отключился — оставшиеся запросы пакета не нужны
+            for task in tasks:
+                task.cancel()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
+@app.post("/search/keywords")
+async def search_keywords(request: KeywordSearchRequest):
+    """BM25-поиск вакансий по ключевым словам"""
+    return {"results": await with_timeout(retrieval_pool.search_keywords(request.keywords, request.top_k))}
+
+
+@app.post("/search/dense")
+async def search_dense(request: DenseSearchRequest):
+    """Семантический поиск вакансий (VacancySearchEngine)"""
+    engine = state["dense"]
+    if engine is None:
+        raise HTTPException(status_code=503, detail=state["dense_error"] or "FAISS-индекс не загружен (DENSE_INDEX_PATH)")
+    query = request.query
+    if isinstance(query, dict):
+        from schema import CandidateProfile
+
+        try:
+            query = CandidateProfile(**query)
+        except ValidationError as e:
+            raise HTTPException(status_code=400, detail=e.errors(include_url=False, include_context=False))
+    try:
+        results = await with_timeout(engine.search_async(query, top_n=request.top_n, filters=request.filters))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"results": results.to_dicts()}
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host=config.API_HOST, port=config.API_PORT)
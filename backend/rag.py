@@ -1,14 +1,20 @@
+import os
 import re
+import threading
 import numpy as np
-import pandas as pd
 from collections import Counter
-import networkx as nx
-from rank_bm25 import BM25Okapi
-from nltk.tokenize import word_tokenize
 
-print(f"read vacancies")
+# Быстрый старт: данные и индексы загружаются при первом обращении, а не при импорте
+FAST_START = os.getenv("CAREER_COACH_FAST_START", "0") == "1"
 
-df_vacancies = pd.read_parquet('./data_artefacts/vacancy_final.parquet')
+df_vacancies = None
+vacancy_texts = []
+tokenized_corpus = []
+bm25 = None
+G = None
+position_nodes = []
+_loaded = False
+_load_lock = threading.Lock()
 
 def normalize_text(text: str) -> str:
     if not isinstance(text, str):
@@ -28,66 +34,97 @@ def tokenize_text(text: str) -> list:
     tokens = [token for token in tokens if len(token) > 2]
     return tokens
 
-# Подготовка текстов вакансий
-vacancy_texts = []
-tokenized_corpus = []
+def preload():
+    """Читает датасет вакансий, строит BM25 индекс и граф навыков (однократно)."""
+    global _loaded
+    if _loaded:
+        return
+    with _load_lock:
+        if not _loaded:
+            _build_indexes()
+            _loaded = True
 
-for _, row in df_vacancies.iterrows():
-    # Объединяем все текстовые поля вакансии
-    full_text = f"{row['title']} {row['company']} {', '.join(row['skills'])} {row['experience']} {row['keywords']}"
-    
-    vacancy_texts.append(normalize_text(full_text))
-    tokenized_corpus.append(tokenize_text(full_text))
+def _build_indexes():
+    global df_vacancies, vacancy_texts, tokenized_corpus, bm25, G, position_nodes
 
-print(f"prepare BM25 index")
+    import pandas as pd
+    import networkx as nx
+    from rank_bm25 import BM25Okapi
 
-# Создание BM25 индекса
-bm25 = BM25Okapi(tokenized_corpus)
+    print(f"read vacancies")
 
-print(f"BM25 index created")
+    df_vacancies = pd.read_parquet('./data_artefacts/vacancy_final.parquet')
 
-print(f"graph init")
+    # Подготовка текстов вакансий
+    vacancy_texts = []
+    tokenized_corpus = []
 
-G = nx.DiGraph()
-position_nodes = []
+    for _, row in df_vacancies.iterrows():
+        # Объединяем все текстовые поля вакансии
+        full_text = f"{row['title']} {row['company']} {', '.join(row['skills'])} {row['experience']} {row['keywords']}"
 
-for i, row in df_vacancies.iterrows():
-    pos_node = row["title"]
-    position_nodes.append(pos_node)
-    
-    # Вершины вакансии
-    G.add_node(pos_node, type="position", vacancy_id=row["vacancy_id"], 
-               company=row["company"], experience=row["experience"],
-               salary=row["salary_str"], industry=row["industry"],
-               requirements=row["keywords"],
-               bm25_index=i)  # Сохраняем индекс для BM25
-    
-    if row["company"]:
-        G.add_node(row["company"], type="company")
-        G.add_edge(pos_node, row["company"])
-    if row["experience"]:
-        G.add_node(row["experience"], type="level")
-        G.add_edge(pos_node, row["experience"])
-    if row["industry"]:
-        G.add_node(row["industry"], type="domain")
-        G.add_edge(pos_node, row["industry"])
-
-    # Навыки
-    skills_arr = row["skills"]
-    if isinstance(skills_arr, (list, np.ndarray)):
-        for skill in skills_arr:
-            skill = str(skill).strip()
-            if skill:
-                G.add_node(skill, type="skill")
-                G.add_edge(pos_node, skill)  # position → skill
-                G.add_edge(skill, pos_node)  # skill → position
-
-print(f"graph done")
-
-def recommend_vacancies(user_text, top_k=5, top_career=1, min_skill_freq=2, top_skills=10):
+        vacancy_texts.append(normalize_text(full_text))
+        tokenized_corpus.append(tokenize_text(full_text))
+
+    print(f"prepare BM25 index")
+
+    # Создание BM25 индекса
+    bm25 = BM25Okapi(tokenized_corpus)
+
+    print(f"BM25 index created")
+
+    print(f"graph init")
+
+    G = nx.DiGraph()
+    position_nodes = []
+    normalized = "skill_ids" in df_vacancies.columns
+
+    for i, row in df_vacancies.iterrows():
+        pos_node = row["title"]
+        position_nodes.append(pos_node)
+
+        # Вершины вакансии
+        G.add_node(pos_node, type="position", vacancy_id=row["vacancy_id"], 
+                   company=row["company"], experience=row["experience"],
+                   salary=row["salary_str"], industry=row["industry"],
+                   requirements=row["keywords"],
+                   bm25_index=i)  # Сохраняем индекс для BM25
+
+        if row["company"]:
+            G.add_node(row["company"], type="company")
+            G.add_edge(pos_node, row["company"])
+        if row["experience"]:
+            G.add_node(row["experience"], type="level")
+            G.add_edge(pos_node, row["experience"])
+        if row["industry"]:
+            G.add_node(row["industry"], type="domain")
+            G.add_edge(pos_node, row["industry"])
+
+        # Навыки
+        skills_arr = row["skills"]
+        if isinstance(skills_arr, (list, np.ndarray)):
+            for skill in skills_arr:
+                # В нормализованном датасете (parser/normalize.py) навыки уже канонические
+                skill = str(skill) if normalized else str(skill).strip()
+                if skill:
+                    G.add_node(skill, type="skill")
+                    G.add_edge(pos_node, skill)  # position → skill
+                    G.add_edge(skill, pos_node)  # skill → position
+
+    print(f"graph done")
+
+
+if not FAST_START:
+    preload()
+
+def recommend_vacancies(user_text, top_k=5, top_career=1, min_skill_freq=2, top_skills=10, verbose=True):
     """
     Рекомендация вакансий на основе BM25
+
+    verbose=False отключает печать результатов (для воркеров backend/worker_pool.py)
     """
+    preload()
+
     # Токенизируем пользовательский запрос
     user_tokens = tokenize_text(user_text)
     
@@ -96,6 +133,7 @@ def recommend_vacancies(user_text, top_k=5, top_career=1, min_skill_freq=2, top_
     
     # Получаем топ-K индексов с наивысшими скорами
     top_indices = np.argsort(bm25_scores)[::-1][:top_k]
+    max_score = float(np.max(bm25_scores)) if len(bm25_scores) else 0.0
     
     recommendations = []
     career_paths = set()
@@ -119,7 +157,8 @@ def recommend_vacancies(user_text, top_k=5, top_career=1, min_skill_freq=2, top_
             "skills": skills,
             "requirements":n_data["requirements"],
             "bm25_score": bm25_score,
-            "similarity_score": min(bm25_score / max(bm25_scores), 1.0)  # Нормализованный скор
+            # Нормализованный скор; при нулевых скорах (нет общих слов с запросом) — 0
+            "similarity_score": min(bm25_score / max_score, 1.0) if max_score > 0 else 0.0
         })
         
         # Поиск похожих позиций через навыки
@@ -153,34 +192,37 @@ def recommend_vacancies(user_text, top_k=5, top_career=1, min_skill_freq=2, top_
     # Ограничиваем топ N по частоте
     expanded_skills = [s for s, _ in skill_counts.most_common(top_skills) if s in filtered_skills]
 
-    print(f"Итого: {len(recommendations)} рекомендаций, {len(expanded_skills)} навыков, {len(career_paths)} карьерных путей")
-    
-    print("\n=== РЕКОМЕНДУЕМЫЕ ВАКАНСИИ ===")
-    for i, rec in enumerate(recommendations, 1):
-        print(f"{i}. {rec['title']}")
-        print(f"   Компания: {rec['company']}")
-        print(f"   Опыт: {rec['experience']}")
-        print(f"   Зарплата: {rec['salary']}")
-        print(f"   Отрасль: {rec['industry']}")
-        print(f"   Требования: {rec['requirements']}")
-        print(f"   BM25 Score: {rec['bm25_score']:.3f}")
-        print(f"   Навыки: {', '.join(rec['skills'][:5])}{'...' if len(rec['skills']) > 5 else ''}")
-        print()
-    
-    print("=== РЕКОМЕНДУЕМЫЕ НАВЫКИ ДЛЯ РАЗВИТИЯ ===")
-    for i, skill in enumerate(expanded_skills, 1):
-        print(f"{i}. {skill}")
-    
-    print(f"\n=== ВОЗМОЖНЫЕ КАРЬЕРНЫЕ ПУТИ (топ-10) ===")
-    for i, career in enumerate(list(career_paths)[:10], 1):
-        print(f"{i}. {career}")
-    
+    if verbose:
+        print(f"Итого: {len(recommendations)} рекомендаций, {len(expanded_skills)} навыков, {len(career_paths)} карьерных путей")
+    
+        print("\n=== РЕКОМЕНДУЕМЫЕ ВАКАНСИИ ===")
+        for i, rec in enumerate(recommendations, 1):
+            print(f"{i}. {rec['title']}")
+            print(f"   Компания: {rec['company']}")
+            print(f"   Опыт: {rec['experience']}")
+            print(f"   Зарплата: {rec['salary']}")
+            print(f"   Отрасль: {rec['industry']}")
+            print(f"   Требования: {rec['requirements']}")
+            print(f"   BM25 Score: {rec['bm25_score']:.3f}")
+            print(f"   Навыки: {', '.join(rec['skills'][:5])}{'...' if len(rec['skills']) > 5 else ''}")
+            print()
+    
+        print("=== РЕКОМЕНДУЕМЫЕ НАВЫКИ ДЛЯ РАЗВИТИЯ ===")
+        for i, skill in enumerate(expanded_skills, 1):
+            print(f"{i}. {skill}")
+    
+        print(f"\n=== ВОЗМОЖНЫЕ КАРЬЕРНЫЕ ПУТИ (топ-10) ===")
+        for i, career in enumerate(list(career_paths)[:10], 1):
+            print(f"{i}. {career}")
+
     return recommendations, expanded_skills, list(career_paths)
 
 def get_relevant_vacancies_by_keywords(keywords, top_k=10):
     """
     Поиск вакансий по списку ключевых слов
     """
+    preload()
+
     # Объединяем ключевые слова в один запрос
     query = " ".join(keywords)
     user_tokens = tokenize_text(query)
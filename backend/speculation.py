@@ -0,0 +1,108 @@
+"""
+Спекулятивный поиск вакансий, пока пользователь ещё отвечает на анкету.
+"""
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+
+class SpeculativeRetrieval:
+    """
+    Фоновые задачи поиска по сессиям.
+
+    launch() запускает задачу под именем name, как только известны её
+    входные данные (key). Повторный вызов с тем же key ничего не делает,
+    с другим — отменяет устаревшую задачу и запускает новую. get() отдаёт
+    результат задачи, если она была запущена с тем же key, и иначе
+    выполняет factory сам. Сессии, не обращавшиеся дольше ttl секунд или
+    вытесненные сверх max_sessions, отменяются.
+
+    Пример:
+        speculation.launch(session_id, "recommend", goals, lambda: pool.recommend_vacancies(goals))
+        ...
+        result = await speculation.get(session_id, "recommend", goals, lambda: pool.recommend_vacancies(goals))
+    """
+
+    def __init__(self, ttl: float = 1800.0, max_sessions: int = 1000):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        # session_id -> (время последнего обращения, {name: (key, task)})
+        self._sessions: "OrderedDict[Hashable, Tuple[float, Dict[str, Tuple[Any, asyncio.Task]]]]" = OrderedDict()
+        self.launched = 0
+        self.cancelled = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _tasks(self, session_id: Hashable) -> Dict[str, Tuple[Any, asyncio.Task]]:
+        now = time.monotonic()
+        _, tasks = self._sessions.pop(session_id, (now, {}))
+        self._sessions[session_id] = (now, tasks)
+        self._evict(now)
+        return tasks
+
+    def _evict(self, now: float) -> None:
+        while self._sessions:
+            session_id, (touched, _) = next(iter(self._sessions.items()))
+            if len(self._sessions) <= self.max_sessions and now - touched < self.ttl:
+                break
+            self.drop(session_id)
+
+    def _cancel(self, task: asyncio.Task) -> None:
+        if not task.done():
+            task.cancel()
+            self.cancelled += 1
+
+    def launch(self, session_id: Optional[Hashable], name: str, key: Any, factory: Callable[[], Awaitable]) -> None:
+        """Запускает задачу name для сессии, если для key она ещё не запущена"""
+        if session_id is None:
+            return
+        tasks = self._tasks(session_id)
+        current = tasks.get(name)
+        if current is not None:
+            if current[0] == key:
+                return
+            self._cancel(current[1])
+        task = asyncio.ensure_future(factory())
+        # Ошибка фоновой задачи не должна попадать в лог как необработанная
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        tasks[name] = (key, task)
+        self.launched += 1
+
+    async def get(self, session_id: Optional[Hashable], name: str, key: Any, factory: Callable[[], Awaitable]):
+        """
+        Результат спекулятивной задачи или, если её нет, устарела или
+        завершилась ошибкой, — результат factory().
+        """
+        if session_id is not None and session_id in self._sessions:
+            current = self._tasks(session_id).pop(name, None)
+            if current is not None:
+                if current[0] == key:
+                    try:
+                        result = await current[1]
+                        self.hits += 1
+                        return result
+                    except asyncio.CancelledError:
+                        if not current[1].cancelled():
+                            raise
+                    except Exception as e:
+                        print(f"[SPECULATION] Фоновый поиск завершился ошибкой: {e}")
+                else:
+                    self._cancel(current[1])
+        self.misses += 1
+        return await factory()
+
+    def drop(self, session_id: Optional[Hashable]) -> None:
+        """Отменяет все задачи сессии"""
+        _, tasks = self._sessions.pop(session_id, (None, {}))
+        for _, task in tasks.values():
+            self._cancel(task)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "sessions": len(self._sessions),
+            "launched": self.launched,
+            "cancelled": self.cancelled,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,190 @@
+"""
+Пул воркеров для поиска вакансий вне event loop.
+
+BM25 по всему корпусу, обход графа навыков и разбор профиля — CPU-работа;
+выполненная прямо в корутине, она останавливает все диалоги на том же
+event loop. RetrievalPool выполняет её в потоках или процессах, индексы
+загружаются один раз на воркер.
+"""
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class RetrievalBusyError(RuntimeError):
+    """Очередь пула заполнена дольше допустимого времени ожидания"""
+
+
+def _init_worker() -> None:
+    from backend import rag
+
+    rag.preload()
+
+
+def _recommend(user_text: str, kwargs: Dict[str, Any]):
+    from backend.rag import recommend_vacancies
+
+    return recommend_vacancies(user_text, verbose=False, **kwargs)
+
+
+def _keyword_search(keywords: List[str], top_k: int):
+    from backend.rag import get_relevant_vacancies_by_keywords
+
+    return get_relevant_vacancies_by_keywords(keywords, top_k=top_k)
+
+
+def _user_profile(history: List[Dict[str, str]]):
+    from services.user_profile import process_user_profile_from_history
+
+    return process_user_profile_from_history(history)
+
+
+def _release_threadsafe(loop: asyncio.AbstractEventLoop, semaphore: asyncio.Semaphore) -> None:
+    try:
+        loop.call_soon_threadsafe(semaphore.release)
+    except RuntimeError:
+        # Event loop уже закрыт, семафор больше никому не нужен
+        pass
+
+
+class RetrievalPool:
+    """
+    Ограниченный пул для поиска вакансий.
+
+    Одновременно в пуле (в работе и в очереди исполнителя) находится не
+    больше max_pending задач, включая задачи отменённых вызовов, которые
+    ещё выполняются; остальные вызовы ждут свободного места до
+    queue_timeout секунд, после чего получают RetrievalBusyError. Так
+    перегрузка не копится в очереди исполнителя, а сразу видна вызывающему.
+
+    С processes=True поиск выполняется в отдельных процессах (spawn) и не
+    делит GIL с UI; по умолчанию используются потоки, которые разделяют
+    с процессом уже загруженные индексы.
+
+    Пример:
+        pool = RetrievalPool(workers=2)
+        recommendations, skills, paths = await pool.recommend_vacancies("ML Engineer", top_k=10)
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        processes: bool = False,
+        max_pending: int = 32,
+        queue_timeout: float = 30.0,
+    ):
+        self.workers = workers
+        self.processes = processes
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+        self._executor: Optional[Executor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop = None
+        self.completed = 0
+        self.rejected = 0
+        self._wait_total = 0.0
+        self._run_total = 0.0
+
+    def _get_executor(self) -> Executor:
+        # Воркеры создаются в start() или при первой задаче, а не при импорте UI
+        if self._executor is None:
+            if self.processes:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                )
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers,
+                    thread_name_prefix="retrieval",
+                    initializer=_init_worker,
+                )
+        return self._executor
+
+    def start(self, wait: bool = False) -> None:
+        """
+        Запускает воркеры и загрузку индексов, не дожидаясь первого запроса.
+
+        Args:
+            wait: Дождаться загрузки индексов во всех воркерах
+        """
+        executor = self._get_executor()
+        futures = [executor.submit(_init_worker) for _ in range(self.workers)]
+        if wait:
+            for future in futures:
+                future.result()
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore = asyncio.Semaphore(self.max_pending)
+            self._loop = loop
+        return self._semaphore
+
+    async def run(self, fn, *args):
+        """
+        Выполняет fn(*args) в пуле.
+
+        Args:
+            fn: Функция уровня модуля (для процессов она должна сериализоваться)
+
+        Returns:
+            Результат fn
+        """
+        semaphore = self._get_semaphore()
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected += 1
+            raise RetrievalBusyError(
+                f"Пул поиска занят: {self.max_pending} задач ждут дольше {self.queue_timeout} с"
+            ) from None
+        queued = time.monotonic()
+        self._wait_total += queued - started
+        loop = asyncio.get_running_loop()
+        try:
+            job = self._get_executor().submit(fn, *args)
+        except BaseException:
+            semaphore.release()
+            raise
+        # Место освобождается, когда задача закончилась в исполнителе, а не когда
+        # вызывающий перестал ждать: отмена не прерывает уже начатую работу
+        job.add_done_callback(lambda _: _release_threadsafe(loop, semaphore))
+        # При отмене вызывающего ещё не начатая задача снимается с очереди исполнителя
+        result = await asyncio.wrap_future(job)
+        self._run_total += time.monotonic() - queued
+        self.completed += 1
+        return result
+
+    async def recommend_vacancies(self, user_text: str, **kwargs) -> Tuple[List[Dict[str, Any]], List[str], List[str]]:
+        """Асинхронный backend.rag.recommend_vacancies без отладочного вывода"""
+        return await self.run(_recommend, user_text, kwargs)
+
+    async def search_keywords(self, keywords: List[str], top_k: int = 10) -> List[Dict[str, Any]]:
+        """Асинхронный backend.rag.get_relevant_vacancies_by_keywords"""
+        return await self.run(_keyword_search, list(keywords), top_k)
+
+    async def process_user_profile(self, history: List[Dict[str, str]]) -> Tuple[Dict[str, Any], str]:
+        """Асинхронный services.user_profile.process_user_profile_from_history"""
+        return await self.run(_user_profile, list(history))
+
+    def stats(self) -> Dict[str, Any]:
+        semaphore = self._semaphore
+        return {
+            "workers": self.workers,
+            "processes": self.processes,
+            "pending": self.max_pending - semaphore._value if semaphore is not None else 0,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "avg_wait": self._wait_total / self.completed if self.completed else 0.0,
+            "avg_run": self._run_total / self.completed if self.completed else 0.0,
+        }
+
+    def shutdown(self, wait: bool = False) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
@@ -11,7 +11,64 @@ class DefaultPipelineSettings(BaseSettings):
     FOLDER_ID: str
     MODEL_TEMP: float
 
-    MAX_HISTORY: int
+    # Не используется: профиль строится по всем ответам анкеты, история не
+    # обрезается. Оставлено, чтобы старые .env с MAX_HISTORY продолжали работать
+    MAX_HISTORY: int = 0
+    # Бюджет входных токенов промпта финальных рекомендаций
+    PROMPT_TOKEN_BUDGET: int = 3000
+
+    # Пул соединений к LLM API
+    LLM_CONNECTIONS_PER_HOST: int = 10
+    LLM_KEEPALIVE_TIMEOUT: float = 60.0
+
+    # Кэш ответов LLM; пустой LLM_CACHE_PATH — только память
+    LLM_CACHE_SIZE: int = 1024
+    LLM_CACHE_TTL: float = 24 * 60 * 60
+    LLM_CACHE_PATH: str = ""
+
+    # Допуск запросов к LLM; 0 — без ограничения частоты
+    LLM_MAX_IN_FLIGHT: int = 8
+    LLM_RPS: float = 0.0
+    LLM_TPM: float = 0.0
+
+    # Бюджеты времени на вызов LLM вместе с повторами, секунды
+    LLM_VALIDATION_BUDGET: float = 10.0
+    LLM_RECOMMENDATION_BUDGET: float = 90.0
+    # Дубль запроса валидации после этого перцентиля задержки; 0 — без дублей
+    LLM_HEDGE_QUANTILE: float = 0.95
+    LLM_BREAKER_FAILURES: int = 5
+    LLM_BREAKER_RECOVERY: float = 30.0
+
+    # Локальная проверка ответов: журнал вердиктов LLM (JSONL) для обучения
+    # классификатора, доля перепроверок в LLM и порог уверенности классификатора
+    VALIDATOR_LOG_PATH: str = ""
+    VALIDATOR_AUDIT_RATE: float = 0.05
+    VALIDATOR_CONFIDENCE: float = 0.9
+
+    # Пул поиска вакансий: потоки или процессы (spawn), задач в пуле, ожидание места, с
+    RETRIEVAL_WORKERS: int = 2
+    RETRIEVAL_PROCESSES: bool = False
+    RETRIEVAL_MAX_PENDING: int = 32
+    RETRIEVAL_QUEUE_TIMEOUT: float = 30.0
+
+    # Хранилище диалогов; пустой SESSION_STORE_PATH — только память
+    SESSION_STORE_SIZE: int = 10_000
+    SESSION_TTL: float = 24 * 60 * 60
+    SESSION_STORE_PATH: str = ""
+
+    # Очередь Gradio: одновременно обрабатываемые сообщения и длина очереди
+    UI_CONCURRENCY_LIMIT: int = 64
+    UI_QUEUE_SIZE: int = 256
+
+    # HTTP API (api/server.py)
+    API_HOST: str = "0.0.0.0"
+    API_PORT: int = 8000
+    API_REQUEST_TIMEOUT: float = 120.0
+    API_BATCH_CONCURRENCY: int = 4
+    API_MAX_BATCH: int = 100
+    # FAISS-индекс для /search/dense (vectorize/example.py); пустой — плотный поиск выключен
+    DENSE_INDEX_PATH: str = ""
+    DENSE_MODEL_NAME: str = "efederici/sentence-bert-base"
 
     class Config:
         env_file = ROOT_DIR / ".env"
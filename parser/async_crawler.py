@@ -0,0 +1,255 @@
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+import polars as pl
+
+from dataset_writer import PartitionedParquetWriter, compact_dataset
+from http_cache import HttpCache
+from vacancy_parser import (
+    HH_API_URL,
+    VACANCY_QUERIES,
+    build_record,
+    extract_industry,
+    extract_skills,
+)
+
+
+class TokenBucket:
+    """Token bucket: не больше rate запросов в секунду с допустимым всплеском burst."""
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.capacity = max(1, burst)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class AsyncVacancyCrawler:
+    """
+    Асинхронный парсер вакансий hh.ru.
+
+    Все запросы идут через одну сессию aiohttp с пулом соединений, число
+    одновременных запросов ограничено concurrency, частота — token bucket.
+    Детальные карточки вакансий и работодателей запрашиваются параллельно,
+    пока продолжается листание страниц поиска; готовые страницы сразу
+    пишутся в партиционированный датасет <path>.dataset.
+    """
+
+    def __init__(
+        self,
+        hh_api_token: str,
+        path: str = "vacancy.parquet",
+        base_url: str = HH_API_URL,
+        concurrency: int = 10,
+        rate: float = 5.0,
+        burst: int = 5,
+        max_retries: int = 5,
+        backoff_base: float = 1.0,
+        per_page: int = 100,
+        cache_path: Optional[str] = None,
+    ):
+        self.headers = {
+            'Authorization': f'Bearer {hh_api_token}'
+        }
+        self.path = path
+        self.base_url = base_url.rstrip('/')
+        self.concurrency = concurrency
+        self.rate = rate
+        self.burst = burst
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.per_page = per_page
+        self.request_count = 0
+        self.cache = HttpCache(cache_path) if cache_path else None
+        self.dataset_dir = f"{path}.dataset"
+        self._employer_tasks: Dict[str, asyncio.Task] = {}
+        self._vacancy_tasks: Dict[str, asyncio.Task] = {}
+
+    async def _get_json(self, session: aiohttp.ClientSession, path: str, params: Dict[str, Any] = None, cached: bool = False) -> Optional[Dict[str, Any]]:
+        """GET с ограничением частоты и повтором при 429/5xx и таймауте; для 404 возвращает None"""
+        entry = None
+        if cached and self.cache is not None:
+            fresh = self.cache.get_fresh(path)
+            if fresh is not None:
+                return fresh.payload
+            entry = self.cache.lookup(path)
+        headers = HttpCache.revalidation_headers(entry)
+
+        url = f"{self.base_url}{path}"
+        for attempt in range(self.max_retries + 1):
+            await self._bucket.acquire()
+            retry_after = None
+            try:
+                async with self._semaphore:
+                    self.request_count += 1
+                    async with session.get(url, params=params, headers=headers) as response:
+                        if response.status == 304 and entry is not None:
+                            self.cache.touch(path)
+                            return entry.payload
+                        if response.status == 404:
+                            if cached and self.cache is not None:
+                                self.cache.store(path, None, status=404)
+                            return None
+                        if response.status != 429 and response.status < 500:
+                            response.raise_for_status()
+                            data = await response.json()
+                            if cached and self.cache is not None:
+                                self.cache.store(
+                                    path, data,
+                                    etag=response.headers.get('ETag'),
+                                    last_modified=response.headers.get('Last-Modified'),
+                                )
+                            return data
+                        retry_after = response.headers.get('Retry-After')
+                        reason = f"HTTP {response.status}"
+            except asyncio.TimeoutError:
+                # Таймаут сессии (ClientTimeout) повторяется так же, как 5xx
+                if attempt == self.max_retries:
+                    raise
+                reason = "Таймаут"
+
+            if attempt == self.max_retries:
+                break
+            if retry_after and retry_after.isdigit():
+                delay = float(retry_after)
+            else:
+                delay = self.backoff_base * 2 ** attempt + random.uniform(0, self.backoff_base)
+            logging.warning(f"{reason} для {path}, повтор через {delay:.1f} с")
+            await asyncio.sleep(delay)
+
+        raise aiohttp.ClientResponseError(
+            response.request_info, response.history, status=response.status,
+            message=f"Превышено число повторов для {path}",
+        )
+
+    async def _fetch_skills(self, session: aiohttp.ClientSession, vacancy_id: str) -> List[str]:
+        try:
+            data = await self._get_json(session, f"/vacancies/{vacancy_id}", cached=True)
+            return extract_skills(data) if data else []
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logging.error(f"Ошибка при получении навыков для вакансии {vacancy_id}: {str(e) or type(e).__name__}")
+            return []
+
+    async def get_vacancy_skills(self, session: aiohttp.ClientSession, vacancy_id: str) -> List[str]:
+        # Одна и та же вакансия находится по нескольким запросам; карточку запрашиваем один раз за прогон
+        if vacancy_id not in self._vacancy_tasks:
+            self._vacancy_tasks[vacancy_id] = asyncio.create_task(self._fetch_skills(session, vacancy_id))
+        return await self._vacancy_tasks[vacancy_id]
+
+    async def _fetch_industry(self, session: aiohttp.ClientSession, company_id: str) -> str:
+        try:
+            data = await self._get_json(session, f"/employers/{company_id}", cached=True)
+            return extract_industry(data) if data else 'Unknown'
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logging.error(f"Ошибка при получении отрасли работодателя {company_id}: {str(e) or type(e).__name__}")
+            return 'Unknown'
+
+    async def get_industry(self, session: aiohttp.ClientSession, company_id: Optional[str]) -> str:
+        if company_id is None:
+            return 'Unknown'
+        # Один запрос на работодателя за прогон, даже если он встречается одновременно в разных вакансиях
+        if company_id not in self._employer_tasks:
+            self._employer_tasks[company_id] = asyncio.create_task(self._fetch_industry(session, company_id))
+        return await self._employer_tasks[company_id]
+
+    async def _build_record(self, session: aiohttp.ClientSession, item: Dict[str, Any], vacancy: str) -> Dict[str, Any]:
+        skills_list, industry = await asyncio.gather(
+            self.get_vacancy_skills(session, item['id']),
+            self.get_industry(session, item['employer'].get('id')),
+        )
+        return build_record(item, skills_list, industry, vacancy)
+
+    async def _write_page(self, detail_tasks: List[asyncio.Task], vacancy: str, name: str) -> List[int]:
+        records = await asyncio.gather(*detail_tasks)
+        self._writer.write_batch(list(records), vacancy, name)
+        return [int(record['vacancy_id']) for record in records]
+
+    async def crawl_query(self, session: aiohttp.ClientSession, vacancy: str, query_idx: int = 0) -> List[int]:
+        """Листает поисковую выдачу по запросу и пишет записи вакансий постранично"""
+        logging.info(f"Парсинг вакансии: {vacancy}")
+        page_tasks = []
+        page = 0
+        while True:
+            try:
+                data = await self._get_json(session, "/vacancies", {
+                    'text': vacancy,
+                    'per_page': self.per_page,
+                    'page': page,
+                    'order_by': 'publication_time',
+                })
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logging.error(f"Ошибка при обработке вакансии {vacancy}, страница {page}: {str(e) or type(e).__name__}")
+                break
+            if not data or not data.get('items'):
+                break
+            if page == 0:
+                logging.info(f"Число страниц по запросу {data.get('pages')}")
+
+            detail_tasks = [asyncio.create_task(self._build_record(session, item, vacancy)) for item in data['items']]
+            page_tasks.append(asyncio.create_task(
+                self._write_page(detail_tasks, vacancy, f"{self._run_id}-{query_idx:03d}-{page:04d}")
+            ))
+
+            page += 1
+            if page >= data.get('pages', 0):
+                break
+
+        pages = await asyncio.gather(*page_tasks)
+        return [vacancy_id for page_ids in pages for vacancy_id in page_ids]
+
+    async def crawl(self, queries: List[str] = None) -> pl.DataFrame:
+        """Парсит все запросы и сохраняет датасет в self.path"""
+        queries = queries or VACANCY_QUERIES
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._bucket = TokenBucket(self.rate, self.burst)
+        self._employer_tasks = {}
+        self._vacancy_tasks = {}
+        self.request_count = 0
+        self._run_id = datetime.now().strftime("%Y%m%dT%H%M%S_%f")
+        self._writer = PartitionedParquetWriter(self.dataset_dir)
+
+        connector = aiohttp.TCPConnector(limit=self.concurrency, ttl_dns_cache=300)
+        timeout = aiohttp.ClientTimeout(total=60)
+        async with aiohttp.ClientSession(headers=self.headers, connector=connector, timeout=timeout) as session:
+            results = await asyncio.gather(*(
+                self.crawl_query(session, vacancy, query_idx) for query_idx, vacancy in enumerate(queries)
+            ))
+
+        vacancy_ids = {vacancy_id for query_ids in results for vacancy_id in query_ids}
+        logging.info(f"Выполнено {self.request_count} запросов к API")
+        if self.cache is not None:
+            logging.info(f"Статистика кэша: {self.cache.stats()}")
+        if not vacancy_ids:
+            return pl.DataFrame()
+
+        # Дубликаты между запросами убираются ленивым сканом партиций этого прогона
+        compact_dataset(self.dataset_dir, self.path, vacancy_ids=vacancy_ids)
+        logging.info(f"Спаршено {len(vacancy_ids)} уникальных вакансий")
+        return pl.read_parquet(self.path)
+
+    def run(self, queries: List[str] = None) -> pl.DataFrame:
+        return asyncio.run(self.crawl(queries))
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    HH_API_TOKEN = ""
+    crawler = AsyncVacancyCrawler(hh_api_token=HH_API_TOKEN, cache_path="hh_cache.sqlite")
+    crawler.run()
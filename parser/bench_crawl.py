@@ -0,0 +1,91 @@
+"""
+Офлайн-бенчмарк пропускной способности парсеров на записанных фикстурах.
+
+Пример:
+    python bench_crawl.py --fixtures hh_fixtures.jsonl.gz --mode both --latency-ms 30 --error-rate 0.01
+"""
+import argparse
+import logging
+import tempfile
+import time
+from typing import Any, Dict, List
+
+from async_crawler import AsyncVacancyCrawler
+from http_fixtures import FixtureArchive, ReplayServer
+from vacancy_parser import Vacancy_parser
+
+
+def run_sync(base_url: str, queries: List[str], tmp_dir: str) -> int:
+    parser = Vacancy_parser(
+        hh_api_token="", path=f"{tmp_dir}/sync.parquet", base_url=base_url, query_pause=(0, 0)
+    )
+    return len(parser.parse_vacancies_incremental(queries=queries))
+
+
+def run_async(base_url: str, queries: List[str], tmp_dir: str, concurrency: int, rate: float) -> int:
+    crawler = AsyncVacancyCrawler(
+        hh_api_token="", path=f"{tmp_dir}/async.parquet", base_url=base_url,
+        concurrency=concurrency, rate=rate, burst=concurrency, backoff_base=0.05,
+    )
+    return len(crawler.run(queries))
+
+
+def bench(archive: FixtureArchive, mode: str, args: argparse.Namespace) -> Dict[str, Any]:
+    queries = archive.queries()
+    with ReplayServer(
+        archive, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate, error_status=args.error_status, seed=args.seed,
+    ) as server, tempfile.TemporaryDirectory() as tmp_dir:
+        started = time.perf_counter()
+        if mode == "sync":
+            vacancies = run_sync(server.url, queries, tmp_dir)
+        else:
+            vacancies = run_async(server.url, queries, tmp_dir, args.concurrency, args.rate)
+        elapsed = time.perf_counter() - started
+        stats = server.stats()
+
+    return {
+        "mode": mode,
+        "queries": len(queries),
+        "vacancies": vacancies,
+        "seconds": elapsed,
+        "vacancies_per_s": vacancies / elapsed if elapsed else 0.0,
+        "requests_per_s": stats["requests"] / elapsed if elapsed else 0.0,
+        **stats,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", required=True)
+    parser.add_argument("--mode", choices=["sync", "async", "both"], default="both")
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--rate", type=float, default=1000.0, help="Лимит запросов в секунду для async")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    archive = FixtureArchive.load(args.fixtures)
+    modes = ["sync", "async"] if args.mode == "both" else [args.mode]
+    missed = []
+    for mode in modes:
+        result = bench(archive, mode, args)
+        print(
+            f"{result['mode']:>5}: {result['vacancies']} вакансий по {result['queries']} запросам "
+            f"за {result['seconds']:.2f} с ({result['vacancies_per_s']:.1f} вак/с), "
+            f"запросов {result['requests']} ({result['requests_per_s']:.1f}/с), "
+            f"ошибок {result['errors']}, промахов {result['misses']}"
+        )
+        if result["misses"]:
+            missed.append(mode)
+    # Промах — запрос, которого нет в записи: результат такого прогона не сравним
+    if missed:
+        raise SystemExit(f"Парсер запрашивал незаписанные ответы в режимах: {', '.join(missed)}")
+
+
+if __name__ == '__main__':
+    main()
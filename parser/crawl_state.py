@@ -0,0 +1,172 @@
+import json
+import os
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+
+class CrawlState:
+    """
+    Состояние инкрементального парсинга.
+
+    Между прогонами хранит известные вакансии (vacancy_id -> published_at)
+    и high-water mark по published_at для каждого поискового запроса.
+    Внутри прогона — последнюю обработанную страницу по каждому запросу,
+    завершённые запросы и найденные изменения, чтобы прерванный прогон
+    можно было продолжить с места остановки.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.seen: Dict[str, str] = {}
+        self.high_water: Dict[str, str] = {}
+        self.run: Optional[Dict[str, Any]] = None
+        if self.path.exists():
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+            self.seen = data.get("seen", {})
+            self.high_water = data.get("high_water", {})
+            self.run = data.get("run")
+        self._index_run()
+
+    def _index_run(self) -> None:
+        # Множества для быстрых проверок; в JSON прогон хранится списками
+        run = self.run or {}
+        self._run_seen = set(run.get("run_seen", []))
+        self._changed = set(run.get("added", [])) | set(run.get("updated", []))
+
+    def save(self) -> None:
+        """Атомарно сохраняет состояние на диск"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps({
+            "seen": self.seen,
+            "high_water": self.high_water,
+            "run": self.run,
+        }, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+    def start_run(self, full_scan: bool) -> bool:
+        """
+        Начинает новый прогон или продолжает прерванный.
+
+        Returns:
+            True, если продолжается прерванный прогон
+        """
+        if self.run is not None:
+            return True
+        self.run = {
+            "run_id": datetime.now().strftime("%Y%m%dT%H%M%S_%f"),
+            "full_scan": full_scan,
+            "last_page": {},
+            "completed": [],
+            "run_seen": [],
+            "added": [],
+            "updated": [],
+            "high_water": {},
+            "published": {},
+            "crawl_date": datetime.now().date().isoformat(),
+        }
+        self._index_run()
+        self.save()
+        return False
+
+    @property
+    def run_id(self) -> str:
+        return self.run["run_id"]
+
+    @property
+    def crawl_date(self) -> date:
+        return date.fromisoformat(self.run["crawl_date"])
+
+    def is_completed(self, query: str) -> bool:
+        return query in self.run["completed"]
+
+    def next_page(self, query: str) -> int:
+        return self.run["last_page"].get(query, -1) + 1
+
+    def classify(self, vacancy_id: str, published_at: Optional[str]) -> Optional[str]:
+        """Возвращает 'added' или 'updated' для новой/изменившейся вакансии и None для известной"""
+        known = self.seen.get(vacancy_id)
+        if vacancy_id not in self.seen:
+            return "added"
+        if published_at and known and published_at > known:
+            return "updated"
+        return None
+
+    def below_high_water(self, query: str, published_at: Optional[str]) -> bool:
+        """Вакансия опубликована не позже, чем самая свежая из предыдущего прогона"""
+        mark = self.high_water.get(query)
+        return bool(mark and published_at and published_at <= mark)
+
+    def commit_page(self, query: str, page: int, items: List[Dict[str, Any]], changes: Dict[str, str]) -> None:
+        """Фиксирует обработанную страницу; вызывается после сохранения её записей"""
+        for item in items:
+            self._run_seen.add(item["id"])
+            published_at = item.get("published_at")
+            if item["id"] in changes:
+                self.run["published"][item["id"]] = published_at or ""
+            if published_at:
+                current = self.run["high_water"].get(query)
+                if current is None or published_at > current:
+                    self.run["high_water"][query] = published_at
+        self.run["run_seen"] = sorted(self._run_seen)
+        for vacancy_id, change in changes.items():
+            if vacancy_id not in self._changed:
+                self._changed.add(vacancy_id)
+                self.run[change].append(vacancy_id)
+        self.run["last_page"][query] = page
+        self.save()
+
+    def complete_query(self, query: str) -> None:
+        self.run["completed"].append(query)
+        self.save()
+
+    def pending_seen(self, vacancy_id: str) -> bool:
+        """Вакансия уже встречалась в текущем прогоне (например, по другому запросу)"""
+        return vacancy_id in self._changed
+
+    def compute_delta(self) -> Dict[str, Any]:
+        """
+        Возвращает дельту текущего прогона: списки added, updated и expired (vacancy_id).
+
+        Истёкшие вакансии определяются только при полном обходе выдачи.
+        """
+        run = self.run
+        expired = []
+        if run["full_scan"]:
+            expired = [vacancy_id for vacancy_id in self.seen if vacancy_id not in self._run_seen]
+        return {
+            "run_id": run["run_id"],
+            "full_scan": run["full_scan"],
+            "added": [int(vacancy_id) for vacancy_id in run["added"]],
+            "updated": [int(vacancy_id) for vacancy_id in run["updated"]],
+            "expired": [int(vacancy_id) for vacancy_id in expired],
+        }
+
+    def mark_partial(self) -> None:
+        """Прогон обошёл выдачу не полностью, истёкшие вакансии определять нельзя"""
+        self.run["full_scan"] = False
+        self.save()
+
+    def live_ids(self, delta: Dict[str, Any]) -> List[int]:
+        """vacancy_id всех актуальных вакансий после применения дельты"""
+        live = {int(vacancy_id) for vacancy_id in self.seen} - set(delta["expired"])
+        return sorted(live | set(delta["added"]) | set(delta["updated"]))
+
+    def finish_run(self, delta: Dict[str, Any]) -> None:
+        """
+        Переносит результаты прогона в постоянное состояние.
+
+        Args:
+            delta: Дельта прогона из compute_delta()
+        """
+        for vacancy_id in delta["expired"]:
+            self.seen.pop(str(vacancy_id), None)
+        for vacancy_id, published_at in self.run["published"].items():
+            self.seen[vacancy_id] = published_at or self.seen.get(vacancy_id, "")
+        for query, mark in self.run["high_water"].items():
+            if mark > self.high_water.get(query, ""):
+                self.high_water[query] = mark
+        self.run = None
+        self._index_run()
+        self.save()
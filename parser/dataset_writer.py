@@ -0,0 +1,137 @@
+import logging
+import os
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import quote
+
+import polars as pl
+
+# Схема записей в том виде, в котором их собирает build_record
+RAW_SCHEMA = {
+    'vacancy_id': pl.String,
+    'title': pl.String,
+    'loc': pl.String,
+    'requirement': pl.String,
+    'responsibility': pl.String,
+    'work_format_ids': pl.List(pl.String),
+    'work_format_names': pl.List(pl.String),
+    'skills': pl.List(pl.String),
+    'company': pl.String,
+    'industry': pl.String,
+    'experience': pl.String,
+    'salary_from': pl.Int64,
+    'salary_to': pl.Int64,
+    'salary_currency': pl.String,
+    'salary_str': pl.String,
+    'url': pl.String,
+    'published_at': pl.String,
+    'source_vacancy': pl.String,
+}
+
+# Итоговая схема датасета вакансий
+VACANCY_SCHEMA = {
+    **RAW_SCHEMA,
+    'vacancy_id': pl.Int64,
+    'published_at': pl.Datetime('us', 'UTC'),
+}
+
+PARTITION_SCHEMA = {
+    'crawl_date': pl.Date,
+    'source_vacancy': pl.String,
+}
+
+
+def to_typed_frame(records: List[Dict[str, Any]]) -> pl.DataFrame:
+    """Строит DataFrame с фиксированной схемой и приводит типы колонок"""
+    df = pl.DataFrame(records, schema=RAW_SCHEMA)
+    return df.with_columns([
+        pl.col('vacancy_id').cast(pl.Int64),
+        pl.col('published_at').str.strptime(pl.Datetime, format='%Y-%m-%dT%H:%M:%S%z').dt.convert_time_zone('UTC'),
+    ])
+
+
+class PartitionedParquetWriter:
+    """
+    Потоковая запись вакансий в parquet-датасет, разбитый на партиции
+    crawl_date=<дата>/source_vacancy=<запрос>.
+
+    Каждый батч приводится к фиксированной схеме и сразу пишется отдельным
+    файлом, поэтому в памяти держится только текущий батч.
+    """
+
+    def __init__(self, root: str, crawl_date: Optional[date] = None):
+        self.root = Path(root)
+        self.crawl_date = crawl_date or date.today()
+        self.rows_written = 0
+
+    def partition_dir(self, source_vacancy: str) -> Path:
+        return self.root / f"crawl_date={self.crawl_date.isoformat()}" / f"source_vacancy={quote(source_vacancy, safe='')}"
+
+    def write_batch(self, records: List[Dict[str, Any]], source_vacancy: str, name: str) -> Optional[Path]:
+        """
+        Пишет батч записей в партицию запроса.
+
+        Args:
+            records: Записи вакансий (как из build_record)
+            source_vacancy: Поисковый запрос — ключ партиции
+            name: Имя файла внутри партиции; повторная запись с тем же
+                именем перезаписывает файл, что делает её идемпотентной
+
+        Returns:
+            Путь к записанному файлу или None для пустого батча
+        """
+        if not records:
+            return None
+        # Ключи партиции хранятся в пути, а не в файле
+        df = to_typed_frame(records).drop('source_vacancy')
+        directory = self.partition_dir(source_vacancy)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"part-{name}.parquet"
+        tmp_path = path.with_suffix('.tmp')
+        df.write_parquet(tmp_path)
+        os.replace(tmp_path, path)
+        self.rows_written += len(df)
+        return path
+
+
+def scan_dataset(root: str) -> pl.LazyFrame:
+    """Ленивое чтение партиционированного датасета вместе с ключами партиций"""
+    return pl.scan_parquet(
+        Path(root) / "**" / "*.parquet",
+        hive_partitioning=True,
+        hive_schema=PARTITION_SCHEMA,
+        schema={name: dtype for name, dtype in VACANCY_SCHEMA.items() if name != 'source_vacancy'},
+    )
+
+
+def compact_dataset(root: str, output_path: str, vacancy_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Собирает из партиций итоговый датасет без дубликатов (ленивым сканом).
+
+    Для каждой вакансии остаётся самая свежая запись по crawl_date и published_at.
+
+    Args:
+        root: Корень партиционированного датасета
+        output_path: Путь итогового parquet-файла (заменяется атомарно)
+        vacancy_ids: Если задано — оставить только эти вакансии
+
+    Returns:
+        Число вакансий в итоговом датасете
+    """
+    lazy = scan_dataset(root)
+    if vacancy_ids is not None:
+        lazy = lazy.filter(pl.col('vacancy_id').is_in(list(vacancy_ids)))
+    lazy = (
+        lazy.sort(['crawl_date', 'published_at'], nulls_last=False)
+        .unique(subset=['vacancy_id'], keep='last', maintain_order=True)
+        .drop('crawl_date')
+        .select(list(VACANCY_SCHEMA))
+    )
+
+    tmp_path = f"{output_path}.tmp"
+    lazy.sink_parquet(tmp_path)
+    os.replace(tmp_path, output_path)
+    rows = pl.scan_parquet(output_path).select(pl.len()).collect().item()
+    logging.info(f"Датасет из {rows} вакансий собран в {output_path}")
+    return rows
@@ -0,0 +1,112 @@
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+DAY = 24 * 60 * 60
+
+
+@dataclass
+class CacheEntry:
+    """Закэшированный ответ API"""
+    payload: Optional[Any]
+    status: int
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+
+
+class HttpCache:
+    """
+    Персистентный кэш JSON-ответов hh.ru в SQLite.
+
+    Ключ — путь запроса (например, /employers/123). Пока запись свежая
+    (моложе TTL для своего типа ресурса), она отдаётся без обращения к сети;
+    устаревшая запись перепроверяется условным запросом с If-None-Match /
+    If-Modified-Since. Ответы 404 тоже кэшируются.
+    """
+
+    def __init__(self, path: str = "hh_cache.sqlite", employer_ttl: float = 30 * DAY, vacancy_ttl: float = DAY):
+        self.path = path
+        self.ttls = {
+            '/employers/': employer_ttl,
+            '/vacancies/': vacancy_ttl,
+        }
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                payload TEXT,
+                status INTEGER NOT NULL,
+                etag TEXT,
+                last_modified TEXT,
+                fetched_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    def ttl_for(self, key: str) -> float:
+        for prefix, ttl in self.ttls.items():
+            if key.startswith(prefix):
+                return ttl
+        return 0.0
+
+    def lookup(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload, status, etag, last_modified, fetched_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        payload, status, etag, last_modified, fetched_at = row
+        return CacheEntry(json.loads(payload) if payload is not None else None, status, etag, last_modified, fetched_at)
+
+    def get_fresh(self, key: str) -> Optional[CacheEntry]:
+        """Возвращает запись, если она ещё не устарела; учитывает статистику попаданий"""
+        entry = self.lookup(key)
+        if entry is not None and time.time() - entry.fetched_at < self.ttl_for(key):
+            self.hits += 1
+            return entry
+        self.misses += 1
+        return None
+
+    @staticmethod
+    def revalidation_headers(entry: Optional[CacheEntry]) -> Dict[str, str]:
+        headers = {}
+        if entry is not None and entry.status == 200:
+            if entry.etag:
+                headers['If-None-Match'] = entry.etag
+            if entry.last_modified:
+                headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def store(self, key: str, payload: Optional[Any], status: int = 200, etag: str = None, last_modified: str = None) -> None:
+        serialized = json.dumps(payload, ensure_ascii=False) if payload is not None else None
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                (key, serialized, status, etag, last_modified, time.time()),
+            )
+            self._conn.commit()
+
+    def touch(self, key: str) -> None:
+        """Продлевает запись после ответа 304 Not Modified"""
+        self.revalidated += 1
+        with self._lock:
+            self._conn.execute("UPDATE responses SET fetched_at = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, int]:
+        return {'hits': self.hits, 'misses': self.misses, 'revalidated': self.revalidated}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,263 @@
+"""
+Запись и воспроизведение ответов hh.ru для офлайн-бенчмарков и регрессионных проверок парсера.
+
+Запись (нужен токен и сеть):
+    python http_fixtures.py record --out hh_fixtures.jsonl.gz --queries ML NLP --max-pages 2
+
+Воспроизведение через локальный сервер:
+    python http_fixtures.py serve --fixtures hh_fixtures.jsonl.gz --port 8000 --latency-ms 50 --error-rate 0.02
+"""
+import argparse
+import gzip
+import json
+import logging
+import random
+import re
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import requests
+
+# Ресурсы API, которые использует парсер
+RECORDED_PATHS = re.compile(r"^/(vacancies|vacancies/\d+|employers/\d+)$")
+RECORDED_HEADERS = ('ETag', 'Last-Modified')
+
+
+def fixture_key(path: str, query: str = "") -> str:
+    """Ключ фикстуры: путь и отсортированные параметры запроса"""
+    params = sorted(parse_qsl(query, keep_blank_values=True))
+    return f"{path}?{urlencode(params)}" if params else path
+
+
+class FixtureArchive:
+    """Архив ответов API в формате JSON Lines со сжатием gzip"""
+
+    def __init__(self, entries: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.entries = entries or {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: str) -> "FixtureArchive":
+        entries = {}
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            for line in f:
+                entry = json.loads(line)
+                entries[entry.pop("key")] = entry
+        return cls(entries)
+
+    def save(self, path: str) -> None:
+        with gzip.open(path, "wt", encoding="utf-8") as f:
+            for key, entry in self.entries.items():
+                f.write(json.dumps({"key": key, **entry}, ensure_ascii=False) + "\n")
+
+    def add(self, key: str, status: int, body: str, headers: Dict[str, str]) -> None:
+        with self._lock:
+            self.entries[key] = {"status": status, "body": body, "headers": headers}
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.entries.get(key)
+
+    def queries(self) -> List[str]:
+        """Поисковые запросы, для которых записана первая страница выдачи"""
+        result = []
+        for key in self.entries:
+            path, _, query = key.partition("?")
+            params = dict(parse_qsl(query))
+            if path == "/vacancies" and params.get("page") == "0" and "text" in params:
+                result.append(params["text"])
+        return result
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+class RecordingSession(requests.Session):
+    """requests.Session, которая складывает ответы API парсера в архив фикстур"""
+
+    def __init__(self, archive: FixtureArchive):
+        super().__init__()
+        self.archive = archive
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        url = urlsplit(request.url)
+        if RECORDED_PATHS.match(url.path) and response.status_code in (200, 404):
+            headers = {name: response.headers[name] for name in RECORDED_HEADERS if name in response.headers}
+            self.archive.add(fixture_key(url.path, url.query), response.status_code, response.text, headers)
+        return response
+
+
+class ReplayServer:
+    """
+    Локальный HTTP-сервер, отдающий ответы из архива фикстур вместо api.hh.ru.
+
+    Поддерживает искусственную задержку (latency_ms ± jitter_ms), случайные
+    ошибки с заданной вероятностью, ошибки на первых fail_first запросах и
+    условные запросы по ETag. В served считается, сколько раз был отдан
+    ответ по каждому ключу архива.
+    """
+
+    def __init__(
+        self,
+        archive: FixtureArchive,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        fail_first: int = 0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        seed: Optional[int] = None,
+    ):
+        self.archive = archive
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.fail_first = fail_first
+        self.requests = 0
+        self.errors = 0
+        self.misses = 0
+        self.served: Counter = Counter()
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler_class(self):
+        replay = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, body: str = "", headers: Dict[str, str] = None):
+                payload = body.encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                with replay._lock:
+                    replay.requests += 1
+                    delay = max(0.0, replay._random.gauss(replay.latency_ms, replay.jitter_ms)) / 1000
+                    fail = replay.requests <= replay.fail_first or replay._random.random() < replay.error_rate
+                time.sleep(delay)
+
+                if fail:
+                    with replay._lock:
+                        replay.errors += 1
+                    retry = {"Retry-After": "0"} if replay.error_status == 429 else {}
+                    self._send(replay.error_status, json.dumps({"errors": [{"type": "injected"}]}), retry)
+                    return
+
+                key = fixture_key(url.path, url.query)
+                entry = replay.archive.get(key)
+                if entry is None:
+                    with replay._lock:
+                        replay.misses += 1
+                    self._send(404, json.dumps({"errors": [{"type": "not_found"}]}))
+                    return
+
+                with replay._lock:
+                    replay.served[key] += 1
+                etag = entry["headers"].get("ETag")
+                if etag and self.headers.get("If-None-Match") == etag:
+                    self._send(304, "", entry["headers"])
+                    return
+                self._send(entry["status"], entry["body"], entry["headers"])
+
+        return Handler
+
+    def stats(self) -> Dict[str, int]:
+        return {"requests": self.requests, "errors": self.errors, "misses": self.misses}
+
+    def start(self) -> "ReplayServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "ReplayServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def record_fixtures(hh_api_token: str, out_path: str, queries: List[str], max_pages: int = 1) -> FixtureArchive:
+    """Прогоняет парсер против api.hh.ru и сохраняет все ответы в архив"""
+    from vacancy_parser import Vacancy_parser
+
+    archive = FixtureArchive()
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        parser = Vacancy_parser(
+            hh_api_token=hh_api_token,
+            path=f"{tmp_dir}/vacancy.parquet",
+            session=RecordingSession(archive),
+        )
+        parser.parse_vacancies_incremental(queries=queries, max_pages=max_pages)
+    archive.save(out_path)
+    logging.info(f"Записано {len(archive)} ответов в {out_path}")
+    return archive
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record = commands.add_parser("record", help="Записать ответы api.hh.ru")
+    record.add_argument("--out", required=True)
+    record.add_argument("--token", default="")
+    record.add_argument("--queries", nargs="+", required=True)
+    record.add_argument("--max-pages", type=int, default=1)
+
+    serve = commands.add_parser("serve", help="Отдавать записанные ответы локально")
+    serve.add_argument("--fixtures", required=True)
+    serve.add_argument("--port", type=int, default=8000)
+    serve.add_argument("--latency-ms", type=float, default=0.0)
+    serve.add_argument("--jitter-ms", type=float, default=0.0)
+    serve.add_argument("--error-rate", type=float, default=0.0)
+    serve.add_argument("--error-status", type=int, default=503)
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "record":
+        record_fixtures(args.token, args.out, args.queries, args.max_pages)
+        return
+
+    server = ReplayServer(
+        FixtureArchive.load(args.fixtures),
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate, error_status=args.error_status, port=args.port,
+    )
+    logging.info(f"Фикстуры доступны на {server.url}")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
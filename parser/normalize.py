@@ -0,0 +1,165 @@
+"""
+Нормализация датасета вакансий после парсинга.
+
+Навыки приводятся к каноническому виду (регистр, пробелы, синонимы) и
+получают числовые id, опыт — к уровням ExperienceLevel, повторяющиеся
+строковые колонки кодируются словарём (Categorical). Словарь навыков
+сохраняется рядом с датасетом в <output>.skills.parquet.
+
+Пример:
+    python normalize.py vacancy.parquet ../data_artefacts/vacancy_final.parquet
+"""
+import argparse
+import logging
+import re
+from collections import Counter
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import polars as pl
+
+# Значения совпадают с vectorize/schema.py::ExperienceLevel
+EXPERIENCE_LEVELS = ["нет опыта", "от 1 до 3 лет", "от 3 до 6 лет", "более 6 лет"]
+
+EXPERIENCE_BY_HH_NAME = {
+    "нет опыта": "нет опыта",
+    "от 1 года до 3 лет": "от 1 до 3 лет",
+    "от 3 до 6 лет": "от 3 до 6 лет",
+    "более 6 лет": "более 6 лет",
+}
+
+# Синонимы навыков -> каноническое написание (ключи в casefold)
+SKILL_ALIASES = {
+    "питон": "python",
+    "python3": "python",
+    "python 3": "python",
+    "postgres": "postgresql",
+    "postgre sql": "postgresql",
+    "ms sql": "mssql",
+    "ms sql server": "mssql",
+    "ms excel": "excel",
+    "microsoft excel": "excel",
+    "ms power bi": "power bi",
+    "powerbi": "power bi",
+    "ml": "machine learning",
+    "машинное обучение": "machine learning",
+    "dl": "deep learning",
+    "глубокое обучение": "deep learning",
+    "cv": "computer vision",
+    "компьютерное зрение": "computer vision",
+    "nlp": "natural language processing",
+    "k8s": "kubernetes",
+    "js": "javascript",
+    "git hub": "github",
+    "английский язык": "english",
+}
+
+CATEGORICAL_COLUMNS = ["company", "industry", "experience", "source_vacancy", "salary_currency", "loc", "city"]
+CATEGORICAL_LIST_COLUMNS = ["work_format_ids", "work_format_names"]
+
+
+def canonical_skill(name: str, aliases: Dict[str, str] = SKILL_ALIASES) -> str:
+    """Ключ навыка: casefold, схлопнутые пробелы, синонимы"""
+    key = re.sub(r"\s+", " ", str(name)).strip().casefold()
+    return aliases.get(key, key)
+
+
+def build_skill_dictionary(skills: List[List[str]], aliases: Dict[str, str] = SKILL_ALIASES) -> Tuple[pl.DataFrame, Dict[str, int]]:
+    """
+    Строит словарь навыков по всем вакансиям.
+
+    Returns:
+        DataFrame (skill_id, skill, name, vacancies), где skill — канонический
+        ключ, а name — самое частое исходное написание, и отображение ключ -> id
+    """
+    spellings: Dict[str, Counter] = {}
+    for vacancy_skills in skills:
+        for name in vacancy_skills or []:
+            name = re.sub(r"\s+", " ", str(name)).strip()
+            if name:
+                spellings.setdefault(canonical_skill(name, aliases), Counter())[name] += 1
+
+    # Самые частые навыки получают меньшие id
+    ordered = sorted(spellings.items(), key=lambda item: (-sum(item[1].values()), item[0]))
+    skill_ids = {key: skill_id for skill_id, (key, _) in enumerate(ordered)}
+    dictionary = pl.DataFrame({
+        "skill_id": pl.Series([skill_ids[key] for key, _ in ordered], dtype=pl.UInt32),
+        "skill": [key for key, _ in ordered],
+        "name": [counter.most_common(1)[0][0] for _, counter in ordered],
+        "vacancies": pl.Series([sum(counter.values()) for _, counter in ordered], dtype=pl.UInt32),
+    })
+    return dictionary, skill_ids
+
+
+def normalize_vacancies(df: pl.DataFrame, aliases: Dict[str, str] = SKILL_ALIASES) -> Tuple[pl.DataFrame, pl.DataFrame]:
+    """
+    Нормализует датасет вакансий.
+
+    Добавляет колонки skill_ids (List[UInt32]) и experience_level (Enum с
+    уровнями ExperienceLevel), заменяет skills на отображаемые названия из
+    словаря и кодирует повторяющиеся строковые колонки словарём.
+
+    Returns:
+        Кортеж (нормализованный датасет, словарь навыков)
+    """
+    skills = df["skills"].to_list() if "skills" in df.columns else [[] for _ in range(len(df))]
+    dictionary, skill_ids = build_skill_dictionary(skills, aliases)
+    names = dictionary["name"].to_list()
+
+    ids_column = []
+    for vacancy_skills in skills:
+        ids = []
+        for name in vacancy_skills or []:
+            name = str(name).strip()
+            if name:
+                skill_id = skill_ids[canonical_skill(name, aliases)]
+                if skill_id not in ids:
+                    ids.append(skill_id)
+        ids_column.append(ids)
+
+    df = df.with_columns(pl.Series("skill_ids", ids_column, dtype=pl.List(pl.UInt32)))
+    df = df.with_columns(
+        pl.col("skill_ids").list.eval(
+            pl.element().replace_strict(list(range(len(names))), names, return_dtype=pl.String)
+        ).cast(pl.List(pl.Categorical)).alias("skills")
+    )
+
+    if "experience" in df.columns:
+        df = df.with_columns(
+            pl.col("experience").str.to_lowercase()
+            .replace_strict(EXPERIENCE_BY_HH_NAME, default=EXPERIENCE_LEVELS[0])
+            .cast(pl.Enum(EXPERIENCE_LEVELS))
+            .alias("experience_level")
+        )
+
+    df = df.with_columns(
+        [pl.col(name).cast(pl.Categorical) for name in CATEGORICAL_COLUMNS if name in df.columns]
+        + [pl.col(name).cast(pl.List(pl.Categorical)) for name in CATEGORICAL_LIST_COLUMNS if name in df.columns]
+    )
+    return df, dictionary
+
+
+def normalize_dataset(input_path: str, output_path: Optional[str] = None) -> pl.DataFrame:
+    """Читает датасет, нормализует его и пишет результат и словарь навыков"""
+    output_path = output_path or input_path
+    df, dictionary = normalize_vacancies(pl.read_parquet(input_path))
+
+    tmp_path = f"{output_path}.tmp"
+    df.write_parquet(tmp_path)
+    Path(tmp_path).replace(output_path)
+    dictionary.write_parquet(f"{output_path}.skills.parquet")
+    logging.info(f"Нормализовано {len(df)} вакансий, {len(dictionary)} уникальных навыков -> {output_path}")
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input")
+    parser.add_argument("output", nargs="?")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    normalize_dataset(args.input, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,44 +3,155 @@ import requests
 import time
 import random
 import logging
+import json
 from typing import Dict, Any, List, Optional
 from datetime import datetime
+from pathlib import Path
+
+from http_cache import HttpCache
+from crawl_state import CrawlState
+from dataset_writer import PartitionedParquetWriter, compact_dataset
+
+HH_API_URL = 'https://api.hh.ru'
+
+VACANCY_QUERIES = [
+    'Computer vision',
+    'Data Analyst', 'Data Engineer', 'Data Science', 'Data Scientist', 'ML Engineer',
+    'MLOps инженер', 'AI',
+    'Product Manager', 'Python Developer', 'Web Analyst', 'Аналитик данных',
+    'Бизнес-аналитик', 'Системный аналитик', 'Финансовый аналитик', 'ML',
+    'Deep Learning', 'NLP', 'LLM', "Project Manager", 'Product Owner','Time series',
+]
+
+
+def extract_skills(data: Dict[str, Any]) -> List[str]:
+    """Достаёт список навыков из детальной карточки вакансии"""
+    skills = data.get('key_skills', [])
+    if skills and isinstance(skills, list):
+        if isinstance(skills[0], dict) and 'name' in skills[0]:
+            return [skill['name'] for skill in skills]
+        elif isinstance(skills[0], str):
+            return skills
+    return []
+
+
+def extract_industry(data: Dict[str, Any]) -> str:
+    """Достаёт отрасль из карточки работодателя"""
+    if 'industries' in data and len(data['industries']) > 0:
+        return data['industries'][0].get('name')
+    return 'Unknown'
+
+
+def build_record(item: Dict[str, Any], skills_list: List[str], industry: str, vacancy: str) -> Dict[str, Any]:
+    """Собирает запись датасета из элемента поисковой выдачи и дополнительных данных"""
+    salary_data = item.get('salary')
+    if salary_data is None:
+        salary_from = salary_to = salary_currency = None
+        salary_str = "з/п не указана"
+    else:
+        salary_from = salary_data.get('from')
+        salary_to = salary_data.get('to')
+        salary_currency = salary_data.get('currency')
+        salary_str = f"{salary_from or ''}-{salary_to or ''} {salary_currency or ''}"
+
+    work_format = item.get('work_format', [])
+    work_format_ids = [fmt['id'] for fmt in work_format]
+    work_format_names = [fmt['name'] for fmt in work_format]
+
+    return {
+        'vacancy_id': item['id'],
+        'title': item['name'],
+        'loc': item['area']['name'],
+        'requirement': item['snippet'].get('requirement', ''),
+        'responsibility': item['snippet'].get('responsibility', ''),
+        'work_format_ids': work_format_ids,
+        'work_format_names': work_format_names,
+        'skills': skills_list,
+        'company': item['employer']['name'],
+        'industry': industry,
+        'experience': item['experience'].get('name', 'Не указан'),
+        'salary_from': salary_from,
+        'salary_to': salary_to,
+        'salary_currency': salary_currency,
+        'salary_str': salary_str,
+        'url': item['alternate_url'],
+        'published_at': item.get('published_at'),
+        'source_vacancy': vacancy
+    }
+
 
 class Vacancy_parser:
-    def __init__(self, hh_api_token: str, path: str = "vacancy.patquet"):
+    def __init__(
+        self,
+        hh_api_token: str,
+        path: str = "vacancy.patquet",
+        base_url: str = HH_API_URL,
+        cache_path: Optional[str] = None,
+        session: Optional[requests.Session] = None,
+        query_pause: tuple = (1, 2),
+    ):
         self.headers = {
             'Authorization': f'Bearer {hh_api_token}'
         }
         self.path = path
+        self.base_url = base_url.rstrip('/')
+        # Общая сессия переиспользует соединения; подменяется для записи фикстур
+        self.session = session or requests.Session()
+        self.query_pause = query_pause
+        self.cache = HttpCache(cache_path) if cache_path else None
+        # Состояние инкрементального парсинга, чекпоинты страниц и дельты прогонов
+        self.state_dir = Path(f"{path}.crawl")
+        # Партиционированный датасет всех прогонов: crawl_date=.../source_vacancy=...
+        self.dataset_dir = Path(f"{path}.dataset")
+
+    def get_cached_json(self, path: str) -> Optional[Dict[str, Any]]:
+        """GET детальной карточки через кэш; для 404 возвращает None"""
+        entry = None
+        if self.cache is not None:
+            fresh = self.cache.get_fresh(path)
+            if fresh is not None:
+                return fresh.payload
+            entry = self.cache.lookup(path)
+
+        headers = {**self.headers, **HttpCache.revalidation_headers(entry)}
+        response = self.session.get(f"{self.base_url}{path}", headers=headers)
+        if response.status_code == 304 and entry is not None:
+            self.cache.touch(path)
+            return entry.payload
+        if response.status_code == 404:
+            if self.cache is not None:
+                self.cache.store(path, None, status=404)
+            return None
+        response.raise_for_status()
+
+        data = response.json()
+        if self.cache is not None:
+            self.cache.store(
+                path, data,
+                etag=response.headers.get('ETag'),
+                last_modified=response.headers.get('Last-Modified'),
+            )
+        return data
 
     def get_vacancies(self, city, vacancy, page):
-        url = 'https://api.hh.ru/vacancies'
+        url = f'{self.base_url}/vacancies'
         params = {
             'text': f"{vacancy}",
             'per_page': 100,
-            'page': page
+            'page': page,
+            'order_by': 'publication_time',
         }
     
-        response = requests.get(url, params=params, headers=self.headers)
+        response = self.session.get(url, params=params, headers=self.headers)
         response.raise_for_status()
         return response.json()
 
 
     def get_vacancy_skills(self, vacancy_id: str) -> List[str]:
-    """Получает навыки для конкретной вакансии"""
+        """Получает навыки для конкретной вакансии"""
         try:
-            url = f"https://api.hh.ru/vacancies/{vacancy_id}"
-            response = requests.get(url, headers=self.headers)
-            response.raise_for_status()
-            data = response.json()
-    
-            skills = data.get('key_skills', [])
-            if skills and isinstance(skills, list):
-                if isinstance(skills[0], dict) and 'name' in skills[0]:
-                    return [skill['name'] for skill in skills]
-                elif isinstance(skills[0], str):
-                    return skills
-            return []
+            data = self.get_cached_json(f"/vacancies/{vacancy_id}")
+            return extract_skills(data) if data else []
         except Exception as e:
             logging.error(f"Ошибка при получении навыков для вакансии {vacancy_id}: {e}")
             return []
@@ -50,121 +161,136 @@ class Vacancy_parser:
         if company_id is None:
             return 'Unknown'
     
-        url = f'https://api.hh.ru/employers/{company_id}'
-        response = requests.get(url, headers=self.headers)
-        if response.status_code == 404:
+        data = self.get_cached_json(f'/employers/{company_id}')
+        if data is None:
             return 'Unknown'
-        response.raise_for_status()
-        data = response.json()
-    
-        if 'industries' in data and len(data['industries']) > 0:
-            return data['industries'][0].get('name')
-        return 'Unknown'
-
-    def parse_vacancies_incremental(self, city_id: int = 1, city: str = "Москва") -> pl.DataFrame:
-        """Версия с постепенным наращиванием DataFrame"""
-        vacancies = [
-            'Computer vision',
-            'Data Analyst', 'Data Engineer', 'Data Science', 'Data Scientist', 'ML Engineer',
-            'MLOps инженер', 'AI',
-            'Product Manager', 'Python Developer', 'Web Analyst', 'Аналитик данных',
-            'Бизнес-аналитик', 'Системный аналитик', 'Финансовый аналитик', 'ML',
-            'Deep Learning', 'NLP', 'LLM', "Project Manager", 'Product Owner','Time series',
-        ]
+        return extract_industry(data)
+
+    def parse_vacancies_incremental(
+        self,
+        city_id: int = 1,
+        city: str = "Москва",
+        full_scan: bool = True,
+        queries: Optional[List[str]] = None,
+        max_pages: Optional[int] = None,
+    ) -> pl.DataFrame:
+        """
+        Инкрементальный парсинг с чекпоинтом после каждой страницы.
+
+        Детальные карточки запрашиваются только для новых и изменившихся
+        (переопубликованных) вакансий, остальные берутся из прошлого датасета.
+        Прерванный прогон продолжается с последней сохранённой страницы.
+
+        Args:
+            full_scan: Обходить выдачу целиком, чтобы найти истёкшие вакансии;
+                иначе листание запроса останавливается на уже известных вакансиях
+            queries: Поисковые запросы (по умолчанию VACANCY_QUERIES)
+            max_pages: Ограничение числа страниц на запрос
+
+        Returns:
+            Итоговый датасет; дельта прогона пишется в state_dir/deltas
+        """
+        vacancies = queries or VACANCY_QUERIES
+        state = CrawlState(self.state_dir / "state.json")
+        if state.start_run(full_scan):
+            logging.info(f"Продолжаем прерванный прогон {state.run_id}")
+        writer = PartitionedParquetWriter(self.dataset_dir, crawl_date=state.crawl_date)
+        failed = []
     
-        df_final = None
         cities = {
             'Москва': 1,
         }
         for city, city_id in cities.items():
-            for vacancy in vacancies:
-                page = 0
-                vacancy_data = []
-                logging.info(f"Парсинг вакансии: {vacancy}")
+            for query_idx, vacancy in enumerate(vacancies):
+                if state.is_completed(vacancy):
+                    continue
+                page = state.next_page(vacancy)
+                logging.info(f"Парсинг вакансии: {vacancy}, начиная со страницы {page}")
     
                 while True:
                     try:
-                        data = get_vacancies(city_id, vacancy, page)
+                        data = self.get_vacancies(city_id, vacancy, page)
                         if page==0:
                             logging.info(f"Число страниц по запросу {data.get('pages')}")
                         if not data.get('items'):
                             break
     
+                        records = []
+                        changes = {}
+                        only_known = True
                         for item in data['items']:
-                            salary_data = item.get('salary')
-                            if salary_data is None:
-                                salary_from = salary_to = salary_currency = None
-                                salary_str = "з/п не указана"
-                            else:
-                                salary_from = salary_data.get('from')
-                                salary_to = salary_data.get('to')
-                                salary_currency = salary_data.get('currency')
-                                salary_str = f"{salary_from or ''}-{salary_to or ''} {salary_currency or ''}"
-    
-                            skills_list = get_vacancy_skills(item['id'])
-                            industry = get_industry(item['employer'].get('id'))
+                            published_at = item.get('published_at')
+                            if not state.below_high_water(vacancy, published_at):
+                                only_known = False
+                            if item['id'] in changes or state.pending_seen(item['id']):
+                                continue
+                            change = state.classify(item['id'], published_at)
+                            if change is None:
+                                continue
     
-                            work_format = item.get('work_format', [])
-                            work_format_ids = [fmt['id'] for fmt in work_format]
-                            work_format_names = [fmt['name'] for fmt in work_format]
+                            skills_list = self.get_vacancy_skills(item['id'])
+                            industry = self.get_industry(item['employer'].get('id'))
+                            records.append(build_record(item, skills_list, industry, vacancy))
+                            changes[item['id']] = change
     
-                            record = {
-                                'vacancy_id': item['id'],
-                                'title': item['name'],
-                                'loc': item['area']['name'],
-                                'requirement': item['snippet'].get('requirement', ''),
-                                'responsibility': item['snippet'].get('responsibility', ''),
-                                'work_format_ids': work_format_ids,
-                                'work_format_names': work_format_names,
-                                'skills': skills_list,
-                                'company': item['employer']['name'],
-                                'industry': industry,
-                                'experience': item['experience'].get('name', 'Не указан'),
-                                'salary_from': salary_from,
-                                'salary_to': salary_to,
-                                'salary_currency': salary_currency,
-                                'salary_str': salary_str,
-                                'url': item['alternate_url'],
-                                'published_at': item.get('published_at'),
-                                'source_vacancy': vacancy
-                            }
+                        writer.write_batch(records, vacancy, name=f"{state.run_id}-{query_idx:03d}-{page:04d}")
+                        state.commit_page(vacancy, page, data['items'], changes)
     
-                            vacancy_data.append(record)
-    
-                        if page >= data.get('pages'):
-                            logging.info(f"Страницы {page} из {data.get('pages')} закончились")
+                        if not full_scan and only_known:
+                            logging.info(f"Дальше по запросу {vacancy} только известные вакансии")
+                            break
+                        # Страницы hh.ru нумеруются с 0, последняя — pages - 1
+                        if page + 1 >= data.get('pages', 0):
+                            logging.info(f"Страницы по запросу {vacancy} закончились ({data.get('pages')})")
+                            break
+                        if max_pages is not None and page + 1 >= max_pages:
+                            # Выдача обойдена не до конца, истёкшие вакансии определять нельзя
+                            state.mark_partial()
                             break
     
                         page += 1
     
                     except requests.HTTPError as e:
+                        # Чекпоинт остаётся на последней сохранённой странице:
+                        # следующий запуск продолжит запрос с упавшей страницы
                         logging.error(f"Ошибка при обработке вакансии {vacancy}, страница {page}: {e}")
+                        failed.append(vacancy)
                         break
-                time.sleep(random.uniform(1, 2))
-                if vacancy_data:
-                    df_current = pl.DataFrame(vacancy_data)
+                if vacancy not in failed:
+                    state.complete_query(vacancy)
+                time.sleep(random.uniform(*self.query_pause))
+    
+        if failed:
+            logging.warning(
+                f"Прогон {state.run_id} не завершён: ошибки по запросам {failed}. "
+                "Повторный запуск продолжит их с места остановки"
+            )
+            return pl.read_parquet(self.path) if Path(self.path).exists() else pl.DataFrame()
+        return self._finish_incremental_run(state)
+
+    def _finish_incremental_run(self, state: CrawlState) -> pl.DataFrame:
+        """Собирает итоговый датасет из партиций, пишет дельту и закрывает прогон"""
+        delta = state.compute_delta()
+        logging.info(
+            f"Прогон {delta['run_id']}: добавлено {len(delta['added'])}, "
+            f"обновлено {len(delta['updated'])}, истекло {len(delta['expired'])}"
+        )
+    
+        if self.dataset_dir.exists():
+            compact_dataset(self.dataset_dir, self.path, vacancy_ids=state.live_ids(delta))
     
-                    if df_final is None:
-                        df_final = df_current
-                    else:
-                        df_final = pl.concat([df_final, df_current])
+        deltas_dir = self.state_dir / "deltas"
+        deltas_dir.mkdir(parents=True, exist_ok=True)
+        delta_path = deltas_dir / f"delta_{delta['run_id']}.json"
+        delta_path.write_text(json.dumps(delta, ensure_ascii=False), encoding="utf-8")
+        logging.info(f"Дельта прогона сохранена в {delta_path}")
     
-        if df_final is not None:
-            df_final = df_final.with_columns([
-                pl.col('published_at').str.strptime(pl.Datetime, format='%Y-%m-%dT%H:%M:%S%z'),
-                pl.col('salary_from').cast(pl.Int64),
-                pl.col('salary_to').cast(pl.Int64),
-            ]).unique(subset=['vacancy_id'])
-            df_final = df_final.with_columns(pl.col('vacancy_id').cast(pl.Int64).alias('vacancy_id'))
-            logging.info(f"Спаршено {len(df_final)} уникальных вакансий")
-            
-            df_final.write_parquet(self.path)
-            logging.info(f"Датасет сохранён в {self.path}")
-            return df_final
-        else:
-            return pl.DataFrame()
+        state.finish_run(delta)
+        if self.cache is not None:
+            logging.info(f"Статистика кэша: {self.cache.stats()}")
+        return pl.read_parquet(self.path) if Path(self.path).exists() else pl.DataFrame()
 
 if __name__ == '__main__':
     HH_API_TOKEN=""
-    parser = Vacancy_parser(hh_api_token=HH_API_TOKEN)
+    parser = Vacancy_parser(hh_api_token=HH_API_TOKEN, cache_path="hh_cache.sqlite")
     parser.parse_vacancies_incremental()
\ No newline at end of file
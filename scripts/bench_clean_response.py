@@ -0,0 +1,127 @@
+"""
+Фаззинг и бенчмарк clean_yandex_hallucination.
+
+Проверяет на случайных ответах модели (JSON с ответом, блоки ```json,
+галлюцинированное продолжение диалога, шум вокруг), что найден ожидаемый
+JSON, и замеряет время на патологических входах: незакрытые скобки,
+глубокая вложенность, длинные строки с экранированием. Для каждого
+семейства входов время при удвоении длины должно расти не более чем
+в --max-ratio раз (линейная сложность).
+
+Пример:
+    python scripts/bench_clean_response.py
+    python scripts/bench_clean_response.py --fuzz 5000 --sizes 20000 40000 80000
+"""
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+
+from services.model_api import clean_yandex_hallucination  # noqa: E402
+
+WORDS = ["опыт", "Python", "ML", "позиция", "{", "}", '"', "\\", "навыки", "\n", "Сбер", ":", ","]
+
+
+def random_answer(rng: random.Random) -> Dict:
+    text = " ".join(rng.choice(WORDS) for _ in range(rng.randint(0, 30)))
+    answer = {"response": text}
+    if rng.random() < 0.5:
+        answer["recommendation"] = {
+            "nearest_position": rng.choice(["ML Engineer", "Data Scientist {senior}"]),
+            "recommended_courses": [rng.choice(WORDS) for _ in range(rng.randint(0, 3))],
+        }
+    return answer
+
+
+def random_reply(rng: random.Random):
+    """Ответ модели и JSON, который из него должен быть извлечён"""
+    answer = random_answer(rng)
+    body = json.dumps(answer, ensure_ascii=rng.random() < 0.5, indent=rng.choice([None, 2]))
+    prefix = rng.choice(["", "Вот ответ:\n", "Конечно! ", "{не json} "])
+    if rng.random() < 0.3:
+        body = f"```json\n{body}\n```"
+    suffix = rng.choice(["", "\n\nПользователь: а ещё?", "\n\nассистент: {\"response\": \"лишнее\"}", " Надеюсь, помог!"])
+    return prefix + body + suffix, answer
+
+
+def fuzz(iterations: int, seed: int) -> int:
+    rng = random.Random(seed)
+    failures = 0
+    for _ in range(iterations):
+        reply, expected = random_reply(rng)
+        cleaned = clean_yandex_hallucination(reply)
+        try:
+            ok = json.loads(cleaned) == expected
+        except json.JSONDecodeError:
+            ok = False
+        if not ok:
+            failures += 1
+            if failures <= 5:
+                print(f"FAIL: {reply!r}\n  -> {cleaned!r}")
+    return failures
+
+
+PATHOLOGICAL: Dict[str, Callable[[int], str]] = {
+    "unbalanced_open": lambda n: "{" * n,
+    "unbalanced_mixed": lambda n: ("{a" * (n // 4)) + ("b}" * (n // 8)),
+    "nested_objects": lambda n: '{"a":' * (n // 5) + "1" + "}" * (n // 5),
+    "many_small_invalid": lambda n: "{x}" * (n // 3),
+    "many_small_valid": lambda n: '{"k": 1} ' * (n // 9),
+    "nested_invalid": lambda n: '{"a" ' * (n // 5) + "}" * (n // 5),
+    "invalid_around_valid": lambda n: "{x " * (n // 6) + '{"response": 1}' + "}" * (n // 6),
+    "escaped_string": lambda n: '{"response": "' + '\\"{' * (n // 3) + '"}',
+    "open_string": lambda n: '{"response": "' + "x" * n,
+    "long_text_no_json": lambda n: "Пользователь" * (n // 12),
+}
+
+
+def measure(make_input: Callable[[int], str], size: int, repeat: int) -> float:
+    text = make_input(size)
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        clean_yandex_hallucination(text)
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def bench(sizes: List[int], repeat: int, max_ratio: float) -> int:
+    violations = 0
+    print(f"{'вход':<20}" + "".join(f"{size:>12}" for size in sizes) + f"{'рост':>8}")
+    for name, make_input in PATHOLOGICAL.items():
+        timings = [measure(make_input, size, repeat) for size in sizes]
+        # Рост времени на каждое удвоение длины
+        ratio = (timings[-1] / max(timings[0], 1e-9)) ** (1 / max(1, len(sizes) - 1))
+        flag = ""
+        if ratio > max_ratio:
+            violations += 1
+            flag = " !"
+        print(f"{name:<20}" + "".join(f"{t * 1000:>10.2f}ms" for t in timings) + f"{ratio:>7.2f}x{flag}")
+    return violations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fuzz", type=int, default=2000, help="Число случайных ответов")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 20_000, 40_000, 80_000],
+                        help="Длины патологических входов (каждая вдвое больше предыдущей)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-ratio", type=float, default=3.0,
+                        help="Допустимый рост времени при удвоении длины")
+    args = parser.parse_args()
+
+    failures = fuzz(args.fuzz, args.seed)
+    print(f"Фаззинг: {args.fuzz - failures}/{args.fuzz} ответов разобраны верно\n")
+    violations = bench(args.sizes, args.repeat, args.max_ratio)
+    sys.exit(1 if failures or violations else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Отчёт о времени импорта модулей проекта по данным `python -X importtime`.
+
+Для каждого модуля запускается отдельный интерпретатор, из stderr собираются
+суммарное время импорта и самые тяжёлые пакеты верхнего уровня.
+
+Пример:
+    python scripts/importtime_report.py --budget-ms 1000
+    python scripts/importtime_report.py backend.rag --eager
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+
+DEFAULT_MODULES = [
+    "services.model_api",
+    "services.user_profile",
+    "backend.rag",
+    "vectorize",
+]
+
+# vectorize/ использует плоские импорты, поэтому добавляем папку в sys.path
+EXTRA_PATHS = [ROOT_DIR, ROOT_DIR / "vectorize"]
+
+LINE_RE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def measure(module: str, eager: bool) -> Tuple[float, Dict[str, float]]:
+    """
+    Импортирует модуль в отдельном процессе и разбирает вывод -X importtime.
+
+    Returns:
+        Кортеж (суммарное время импорта в мс, время по пакетам верхнего уровня в мс)
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([str(p) for p in EXTRA_PATHS] + [env.get("PYTHONPATH", "")])
+    if not eager:
+        env["CAREER_COACH_FAST_START"] = "1"
+
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT_DIR, env=env, capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        tail = proc.stderr.strip().splitlines()[-1:] or ["неизвестная ошибка"]
+        raise RuntimeError(f"Не удалось импортировать {module}: {tail[0]}")
+
+    total_us = 0
+    by_package = defaultdict(float)
+    for line in proc.stderr.splitlines():
+        match = LINE_RE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        by_package[name.split(".")[0]] += int(self_us) / 1000
+        # Модули верхнего уровня в выводе не имеют отступа
+        if len(indent) == 1:
+            total_us += int(cumulative_us)
+    return total_us / 1000, dict(by_package)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES, help="Модули для замера")
+    parser.add_argument("--budget-ms", type=float, default=None, help="Бюджет времени импорта на модуль, мс")
+    parser.add_argument("--top", type=int, default=5, help="Сколько самых тяжёлых пакетов показывать")
+    parser.add_argument("--eager", action="store_true", help="Замер без режима быстрого старта")
+    args = parser.parse_args(argv)
+
+    over_budget = []
+    for module in args.modules:
+        total_ms, by_package = measure(module, args.eager)
+        status = ""
+        if args.budget_ms is not None and total_ms > args.budget_ms:
+            status = "  ПРЕВЫШЕН БЮДЖЕТ"
+            over_budget.append(module)
+        print(f"{module}: {total_ms:.1f} мс{status}")
+        heaviest = sorted(by_package.items(), key=lambda item: item[1], reverse=True)[:args.top]
+        for package, ms in heaviest:
+            print(f"    {package:<30} {ms:8.1f} мс")
+
+    if over_budget:
+        print(f"\nБюджет {args.budget_ms:.0f} мс превышен: {', '.join(over_budget)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
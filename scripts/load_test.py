@@ -0,0 +1,197 @@
+"""
+Нагрузочный тест диалога: множество одновременных пользователей проходят
+анкету через ui.app_gradio.chatbot_step от первого вопроса до рекомендаций.
+
+По умолчанию поднимает mock LLM (scripts/mock_llm_server.py) в том же
+процессе; с --model-url нагрузка идёт на внешний сервер. Отчёт: пропускная
+способность и перцентили задержки по этапам (context, education, goals —
+ответы на вопросы с валидацией; recommendation — финальные рекомендации;
+session — весь диалог).
+
+Пример:
+    python scripts/load_test.py --users 50 --concurrency 20 --latency-ms 300
+    python scripts/load_test.py --users 10 --model-url http://127.0.0.1:8800/foundationModels/v1/completion
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, List
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT_DIR))
+sys.path.insert(0, str(ROOT_DIR / "scripts"))
+
+from mock_llm_server import add_server_arguments, server_from_args  # noqa: E402
+
+ANSWERS = {
+    "context": [
+        "Я работаю Data Scientist в банке, занимаюсь скорингом и антифродом.",
+        "Общий опыт 5 лет, из них 3 года в анализе данных.",
+        "Модель оттока клиентов и система рекомендаций для мобильного приложения.",
+    ],
+    "education": [
+        "Окончил МФТИ по прикладной математике, проходил курсы по глубокому обучению.",
+        "Python, SQL, машинное обучение, A/B тесты, PyTorch.",
+        "Ответственность, любознательность, умение объяснять сложное простым языком.",
+        "Python, pandas, scikit-learn, PyTorch, Airflow, Docker, Git.",
+    ],
+    "goals": [
+        "Через 2 года хочу стать Senior ML Engineer в продуктовой компании.",
+        "Гибридный формат, 2-3 дня в офисе.",
+        "От 350 тысяч рублей на руки.",
+        "Интересные задачи и профессиональный рост.",
+    ],
+}
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
+
+
+class LoadStats:
+    """Задержки по этапам диалога"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.rejected_answers = 0
+        self.failed_sessions = 0
+
+    def record(self, stage: str, seconds: float) -> None:
+        self.latencies[stage].append(seconds)
+
+    def report(self, elapsed: float) -> str:
+        lines = [f"{'этап':<16}{'n':>7}{'rps':>9}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}"]
+        for stage in ["context", "education", "goals", "recommendation", "session"]:
+            values = self.latencies.get(stage, [])
+            if not values:
+                continue
+            lines.append(
+                f"{stage:<16}{len(values):>7}{len(values) / elapsed:>9.2f}"
+                + "".join(f"{percentile(values, q) * 1000:>8.0f}ms" for q in (0.5, 0.9, 0.99))
+                + f"{max(values) * 1000:>8.0f}ms"
+            )
+        lines.append(f"Отклонённых ответов: {self.rejected_answers}, сессий с ошибкой: {self.failed_sessions}")
+        return "\n".join(lines)
+
+
+async def simulate_user(
+    app, user_id: int, stats: LoadStats, think_time: float, max_retries: int, rng: random.Random, speculation: bool = True
+):
+    """Один пользователь проходит анкету целиком"""
+    started = time.monotonic()
+    session_id = f"load-test-{user_id}" if speculation else None
+    history, block, index, waiting, _ = await app.chatbot_step("", [], "context", 0, False, session_id)
+    retries = 0
+    while block != "recommendation":
+        if think_time:
+            await asyncio.sleep(rng.uniform(0, 2 * think_time))
+        # Номер пользователя делает ответы разными, чтобы не попадать в кэш LLM
+        answer = f"{ANSWERS[block][index]} (пользователь {user_id})"
+        stage = block
+        step_started = time.monotonic()
+        history, next_block, next_index, waiting, _ = await app.chatbot_step(
+            answer, history, block, index, waiting, session_id
+        )
+        if next_block == "recommendation":
+            stage = "recommendation"
+        stats.record(stage, time.monotonic() - step_started)
+        if (next_block, next_index) == (block, index):
+            stats.rejected_answers += 1
+            retries += 1
+            if retries > max_retries:
+                raise RuntimeError(f"Ответ пользователя {user_id} отклонён {retries} раз подряд")
+            continue
+        retries = 0
+        block, index = next_block, next_index
+    stats.record("session", time.monotonic() - started)
+
+
+async def run(args: argparse.Namespace) -> str:
+    """Прогоняет нагрузку и возвращает текст отчёта"""
+    import ui.app_gradio as app
+
+    server = None
+    if not args.model_url:
+        server = await server_from_args(args).start()
+
+    # Загрузка индексов поиска не входит в замер
+    await asyncio.get_running_loop().run_in_executor(None, app.retrieval_pool.start, True)
+
+    stats = LoadStats()
+    semaphore = asyncio.Semaphore(args.concurrency)
+    rng = random.Random(args.seed)
+
+    async def session(user_id: int):
+        async with semaphore:
+            try:
+                await simulate_user(app, user_id, stats, args.think_time, args.max_retries, rng, not args.no_speculation)
+            except Exception as e:
+                stats.failed_sessions += 1
+                print(f"[load_test] Сессия {user_id} завершилась ошибкой: {e}", file=sys.stderr)
+
+    started = time.monotonic()
+    await asyncio.gather(*(session(user_id) for user_id in range(args.users)))
+    elapsed = time.monotonic() - started
+
+    await app.llm_client.close()
+    app.retrieval_pool.shutdown()
+    report = [f"Пользователей: {args.users}, одновременно: {args.concurrency}, время: {elapsed:.1f} с"]
+    if server is not None:
+        report.append(f"Mock LLM: {server.stats()}")
+        await server.stop()
+    report.append(f"Допуск к LLM: {app.llm_admission.stats()}")
+    report.append(f"Пул поиска: {app.retrieval_pool.stats()}")
+    report.append(f"Фоновый поиск: {app.speculation.stats()}")
+    report.append(stats.report(elapsed))
+    return "\n".join(report)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--think-time", type=float, default=0.0, help="Средняя пауза пользователя между ответами, с")
+    parser.add_argument("--max-retries", type=int, default=5)
+    parser.add_argument("--model-url", default="", help="Внешний LLM вместо встроенного mock-сервера")
+    parser.add_argument("--cache", action="store_true", help="Не отключать кэш ответов LLM")
+    parser.add_argument("--no-speculation", action="store_true", help="Без фонового поиска вакансий до конца анкеты")
+    parser.add_argument("--verbose", action="store_true", help="Не подавлять вывод приложения")
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    # Настройки приложения задаются до импорта ui.app_gradio; MODEL_URL
+    # перекрывает .env, чтобы тест не ушёл в настоящий LLM
+    os.environ["MODEL_URL"] = args.model_url or f"http://127.0.0.1:{args.port}/foundationModels/v1/completion"
+    os.environ.setdefault("API_TOKEN", "load-test")
+    os.environ.setdefault("MODEL_NAME", "yandexgpt-lite")
+    os.environ.setdefault("FOLDER_ID", "load-test")
+    os.environ.setdefault("MODEL_TEMP", "0.1")
+    if not args.cache:
+        os.environ["LLM_CACHE_SIZE"] = "0"
+        os.environ["LLM_CACHE_PATH"] = ""
+
+    os.chdir(ROOT_DIR)
+    if args.verbose:
+        print(asyncio.run(run(args)))
+        return
+    # Приложение печатает каждый шаг диалога; в отчёт это не попадает
+    stdout = sys.stdout
+    with open(os.devnull, "w") as devnull:
+        sys.stdout = devnull
+        try:
+            report = asyncio.run(run(args))
+        finally:
+            sys.stdout = stdout
+    print(report)
+
+
+if __name__ == "__main__":
+    main()
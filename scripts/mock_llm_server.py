@@ -0,0 +1,231 @@
+"""
+Локальная замена LLM API для нагрузочного тестирования.
+
+Отвечает в форматах YandexGPT (result.alternatives) и OpenAI (choices),
+которые разбирает services.model_api, в том числе в потоковом режиме.
+На промпт валидации отвечает "Да"/"Нет", на остальные — JSON с рекомендациями.
+Задержка, доля ошибок и скорость потока настраиваются.
+
+Пример:
+    python scripts/mock_llm_server.py --port 8800 --latency-ms 300 --latency-dist lognormal --error-rate 0.02
+    MODEL_URL=http://127.0.0.1:8800/foundationModels/v1/completion python3 -m ui.app_gradio
+"""
+import argparse
+import asyncio
+import json
+import logging
+import math
+import random
+from typing import Any, Dict, Optional
+
+from aiohttp import web
+
+YANDEX_PATH = "/foundationModels/v1/completion"
+OPENAI_PATH = "/v1/chat/completions"
+
+RECOMMENDATION = {
+    "response": "С учётом вашего опыта оптимально начать с роли ML Engineer в Сбере, "
+                "а следующей целью выбрать Senior NLP Engineer в Just AI.",
+    "recommendation": {
+        "nearest_position": "ML Engineer в Сбер",
+        "nearest_position_reason": "Требования совпадают с текущими навыками.",
+        "recommended_position": "Senior NLP Engineer в Just AI",
+        "recommended_position_reason": "Следующий шаг с ростом в NLP.",
+        "skills_gap": "NLP, Deep Learning",
+        "plan_1_2_years": "За год углубить NLP, через два года выйти на Senior.",
+        "recommended_courses": ["Курс по NLP", "Advanced Deep Learning"],
+        "current_vacancies": ["ML Engineer в Сбер", "Senior NLP Engineer в Just AI"],
+    },
+}
+
+
+class MockLLMServer:
+    """
+    HTTP-сервер, имитирующий YandexGPT и OpenAI-совместимый API.
+
+    Формат ответа определяется путём запроса (OPENAI_PATH — OpenAI,
+    остальные — YandexGPT), потоковый режим — флагом stream в запросе.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8800,
+        latency_ms: float = 200.0,
+        latency_dist: str = "lognormal",
+        jitter_ms: float = 100.0,
+        error_rate: float = 0.0,
+        error_status: int = 503,
+        reject_rate: float = 0.1,
+        chunk_chars: int = 24,
+        chunk_delay_ms: float = 20.0,
+        seed: Optional[int] = None,
+    ):
+        self.host = host
+        self.port = port
+        self.latency_ms = latency_ms
+        self.latency_dist = latency_dist
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.reject_rate = reject_rate
+        self.chunk_chars = chunk_chars
+        self.chunk_delay_ms = chunk_delay_ms
+        self.requests = 0
+        self.errors = 0
+        self.streams = 0
+        self._random = random.Random(seed)
+        self._runner = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}{YANDEX_PATH}"
+
+    @property
+    def openai_url(self) -> str:
+        return f"http://{self.host}:{self.port}{OPENAI_PATH}"
+
+    def sample_latency(self) -> float:
+        """Задержка ответа в секундах по выбранному распределению"""
+        mean, jitter = self.latency_ms, self.jitter_ms
+        if self.latency_dist == "fixed":
+            value = mean
+        elif self.latency_dist == "normal":
+            value = self._random.gauss(mean, jitter)
+        elif self.latency_dist == "exponential":
+            value = self._random.expovariate(1 / mean) if mean > 0 else 0.0
+        else:
+            # Логнормальное с заданными средним и стандартным отклонением
+            if mean <= 0:
+                return 0.0
+            sigma2 = math.log(1 + (jitter / mean) ** 2)
+            value = self._random.lognormvariate(math.log(mean) - sigma2 / 2, math.sqrt(sigma2))
+        return max(0.0, value) / 1000
+
+    def answer_text(self, messages) -> str:
+        prompt = " ".join(message.get("text") or message.get("content") or "" for message in messages)
+        if 'Ответь ТОЛЬКО "Да" или "Нет"' in prompt:
+            return "Нет" if self._random.random() < self.reject_rate else "Да"
+        return json.dumps(RECOMMENDATION, ensure_ascii=False)
+
+    @staticmethod
+    def _usage(payload: Dict[str, Any], text: str) -> Dict[str, int]:
+        prompt_chars = sum(len(message.get("text") or message.get("content") or "") for message in payload.get("messages", []))
+        return {"input": prompt_chars // 3, "completion": len(text) // 3}
+
+    def _yandex_body(self, text: str, usage: Dict[str, int], final: bool = True) -> Dict[str, Any]:
+        status = "ALTERNATIVE_STATUS_FINAL" if final else "ALTERNATIVE_STATUS_PARTIAL"
+        return {"result": {
+            "alternatives": [{"message": {"role": "assistant", "text": text}, "status": status}],
+            "usage": {
+                "inputTextTokens": str(usage["input"]),
+                "completionTokens": str(usage["completion"]),
+                "totalTokens": str(usage["input"] + usage["completion"]),
+            },
+            "modelVersion": "mock",
+        }}
+
+    def _openai_body(self, text: str, usage: Dict[str, int]) -> Dict[str, Any]:
+        return {
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": usage["input"],
+                "completion_tokens": usage["completion"],
+                "total_tokens": usage["input"] + usage["completion"],
+            },
+        }
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        self.requests += 1
+        payload = await request.json()
+        await asyncio.sleep(self.sample_latency())
+        if self._random.random() < self.error_rate:
+            self.errors += 1
+            return web.json_response({"error": {"message": "injected"}}, status=self.error_status)
+
+        openai = request.path == OPENAI_PATH
+        text = self.answer_text(payload.get("messages", []))
+        usage = self._usage(payload, text)
+        stream = payload.get("stream") or payload.get("completionOptions", {}).get("stream")
+        if not stream:
+            return web.json_response(self._openai_body(text, usage) if openai else self._yandex_body(text, usage))
+
+        self.streams += 1
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream" if openai else "application/json"})
+        await response.prepare(request)
+        for end in range(self.chunk_chars, len(text) + self.chunk_chars, self.chunk_chars):
+            await asyncio.sleep(self.chunk_delay_ms / 1000)
+            if openai:
+                delta = {"choices": [{"index": 0, "delta": {"content": text[end - self.chunk_chars:end]}}]}
+                await response.write(f"data: {json.dumps(delta, ensure_ascii=False)}\n\n".encode("utf-8"))
+            else:
+                body = self._yandex_body(text[:end], usage, final=end >= len(text))
+                await response.write((json.dumps(body, ensure_ascii=False) + "\n").encode("utf-8"))
+        if openai:
+            await response.write(b"data: [DONE]\n\n")
+        await response.write_eof()
+        return response
+
+    def stats(self) -> Dict[str, int]:
+        return {"requests": self.requests, "errors": self.errors, "streams": self.streams}
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(YANDEX_PATH, self.handle)
+        app.router.add_post(OPENAI_PATH, self.handle)
+        return app
+
+    async def start(self) -> "MockLLMServer":
+        self._runner = web.AppRunner(self.app())
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        return self
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def __aenter__(self) -> "MockLLMServer":
+        return await self.start()
+
+    async def __aexit__(self, *exc) -> None:
+        await self.stop()
+
+
+def add_server_arguments(parser: argparse.ArgumentParser) -> None:
+    """Общие параметры сервера для CLI этого скрипта и load_test.py"""
+    parser.add_argument("--port", type=int, default=8800)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--latency-dist", choices=["fixed", "normal", "lognormal", "exponential"], default="lognormal")
+    parser.add_argument("--jitter-ms", type=float, default=100.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--error-status", type=int, default=503)
+    parser.add_argument("--reject-rate", type=float, default=0.1, help="Доля ответов 'Нет' на валидацию")
+    parser.add_argument("--chunk-chars", type=int, default=24)
+    parser.add_argument("--chunk-delay-ms", type=float, default=20.0)
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def server_from_args(args: argparse.Namespace) -> MockLLMServer:
+    return MockLLMServer(
+        port=args.port, latency_ms=args.latency_ms, latency_dist=args.latency_dist, jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate, error_status=args.error_status, reject_rate=args.reject_rate,
+        chunk_chars=args.chunk_chars, chunk_delay_ms=args.chunk_delay_ms, seed=args.seed,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    add_server_arguments(parser)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    server = server_from_args(args)
+    server.host = args.host
+    logging.info(f"Mock LLM: {server.url} (YandexGPT), {server.openai_url} (OpenAI)")
+    web.run_app(server.app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
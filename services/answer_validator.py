@@ -0,0 +1,381 @@
+"""
+Локальная предварительная проверка ответов на вопросы анкеты.
+
+Очевидно хорошие и очевидно пустые ответы решаются правилами без обращения
+к LLM; сомнительные передаются в LLM-валидацию. Вердикты LLM записываются в
+журнал, на котором можно обучить небольшой наивный байесовский классификатор
+и посчитать точность и долю пропущенных LLM-вызовов по каждому вопросу.
+
+Пример:
+    python -m services.answer_validator data_artefacts/validation_log.jsonl
+"""
+import argparse
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+ACCEPT = "accept"
+REJECT = "reject"
+ESCALATE = "escalate"
+
+_WORD_RE = re.compile(r"\w+")
+_VOWELS = set("аеёиоуыэюяaeiouy")
+# Аббревиатуры латиницей (SQL, ML, BI, DWH, C++) — обычный ответ про навыки, а не набор букв
+_ACRONYM_RE = re.compile(r"(?<![A-Za-z])[A-Z][A-Z0-9+#]+(?![a-z])")
+
+REFUSALS = re.compile(
+    r"\b(?:не знаю|не хочу|не скажу|не помню|без понятия|нет ответа|пропуст\w*|skip|хз|отстань|"
+    r"не могу сказать|затрудняюсь|ничего|не буду)\b"
+)
+
+
+@dataclass
+class QuestionRule:
+    """
+    Правила для одного вопроса анкеты.
+
+    Ответ короче min_chars без ключевого слова отклоняется. Ответ, в котором
+    найдено ключевое слово (или число при numeric=True), принимается, если
+    он не короче accept_chars; при short_ok — любой длины.
+    """
+    keywords: str = ""
+    min_chars: int = 5
+    accept_chars: int = 20
+    numeric: bool = False
+    short_ok: bool = False
+
+    def __post_init__(self):
+        self.pattern = re.compile(self.keywords) if self.keywords else None
+
+    def has_keyword(self, text: str) -> bool:
+        if self.numeric and re.search(r"\d", text):
+            return True
+        return bool(self.pattern and self.pattern.search(text))
+
+
+# Ключи — (блок, номер вопроса) из QUESTION_BLOCKS в ui/app_gradio.py
+QUESTION_RULES: Dict[Tuple[str, int], QuestionRule] = {
+    ("context", 0): QuestionRule(
+        r"работа|должност|инженер|разработ|аналити|программист|менеджер|руковод|специалист|консульт|"
+        r"дизайн|тестиров|студент|преподава|data|developer|engineer|scientist|analyst|manager|ml|"
+        r"devops|qa|backend|frontend|сфер|компани|банк|ритейл|финтех",
+    ),
+    ("context", 1): QuestionRule(
+        r"\bгод|\bлет\b|месяц|полгода|нет опыта|без опыта|первый", min_chars=1, numeric=True, short_ok=True,
+    ),
+    ("context", 2): QuestionRule(
+        r"проект|разработ|сделал|внедр|модел|систем|сервис|запуст|автоматиз|построил|оптимиз|"
+        r"пайплайн|платформ|приложени|dashboard|дашборд|исследован",
+    ),
+    ("education", 0): QuestionRule(
+        r"вуз|университет|универ|институт|академи|колледж|техникум|факультет|специальност|"
+        r"бакалавр|магистр|аспирант|курс|образован|диплом|школ|мгу|мфти|вшэ|итмо|бауман|спбгу",
+    ),
+    ("education", 1): QuestionRule(
+        r"python|sql|java|анализ|машинн|обучени|ml|статистик|разработ|управлен|коммуникац|"
+        r"проектирова|тестирова|моделирова|визуализац|переговор|продаж|excel|архитектур",
+    ),
+    ("education", 2): QuestionRule(
+        r"ответствен|коммуник|любознат|внимательн|обучаем|команд|лидер|стрессоустойчив|"
+        r"аналитическ|упорн|упорств|организован|инициатив|креатив|самостоятельн|пунктуальн|"
+        r"терпени|настойчив|целеустремл|эмпати|гибкост|дисциплин|усидчив",
+    ),
+    ("education", 3): QuestionRule(
+        r"python|java|sql|docker|git|excel|c\+\+|c#|golang|\bgo\b|javascript|typescript|kotlin|"
+        r"swift|pytorch|tensorflow|pandas|numpy|sklearn|scikit|airflow|spark|hadoop|kafka|"
+        r"kubernetes|linux|jira|figma|tableau|power bi|1с|react|postgres|clickhouse|\br\b",
+        min_chars=2, short_ok=True,
+    ),
+    ("goals", 0): QuestionRule(
+        r"senior|middle|junior|lead|head|cto|лид|руковод|директор|менеджер|архитект|эксперт|"
+        r"инженер|разработчик|аналитик|специалист|стать|вырасти|должност|позици|engineer|scientist",
+    ),
+    ("goals", 1): QuestionRule(
+        r"офис|удал|гибрид|remote|hybrid|дом|без разницы|неважно|любой|все равно|всё равно",
+        min_chars=3, short_ok=True,
+    ),
+    ("goals", 2): QuestionRule(
+        r"тыс|\d\s*к\b|руб|₽|\$|usd|eur|€|доход|зарплат|млн|оклад",
+        min_chars=2, numeric=True, short_ok=True,
+    ),
+    ("goals", 3): QuestionRule(
+        r"стабильн|рост|развит|интересн|задач|свобод|деньг|доход|зарплат|команд|баланс|график|"
+        r"удал|карьер|коллектив|проект|технолог|обучени|смысл|польз|признани",
+        min_chars=3, short_ok=True,
+    ),
+}
+
+DEFAULT_RULE = QuestionRule()
+
+
+def normalize_answer(answer: str) -> str:
+    return re.sub(r"\s+", " ", (answer or "").lower().replace("ё", "е")).strip()
+
+
+def is_gibberish(text: str) -> bool:
+    """Набор символов без слов: нет букв, почти нет гласных или одна повторяющаяся буква"""
+    letters = [c for c in text if c.isalpha()]
+    if not letters:
+        return True
+    if len(set(letters)) <= 2 and len(letters) > 3:
+        return True
+    vowels = sum(c in _VOWELS for c in letters)
+    return len(letters) >= 6 and vowels / len(letters) < 0.15
+
+
+def answer_features(block: str, index: int, answer: str) -> List[str]:
+    """Признаки ответа для классификатора: слова, номер вопроса и длина"""
+    text = normalize_answer(answer)
+    words = _WORD_RE.findall(text)
+    rule = QUESTION_RULES.get((block, index), DEFAULT_RULE)
+    features = [f"w:{word}" for word in words]
+    features.append(f"q:{block}:{index}")
+    features.append(f"len:{min(len(words), 32).bit_length()}")
+    features.append(f"kw:{rule.has_keyword(text)}")
+    if REFUSALS.search(text):
+        features.append("refusal")
+    return features
+
+
+class NaiveBayesClassifier:
+    """
+    Мультиномиальный наивный Байес по признакам answer_features.
+
+    Обучается на вердиктах LLM за пару миллисекунд и не требует
+    зависимостей; predict_proba возвращает вероятность того, что ответ
+    LLM бы приняла.
+    """
+
+    def __init__(self, alpha: float = 1.0):
+        self.alpha = alpha
+        self.class_counts = Counter()
+        self.feature_counts = {True: Counter(), False: Counter()}
+        self.totals = {True: 0, False: 0}
+        self.vocabulary = set()
+
+    def fit(self, samples: Iterable[Tuple[List[str], bool]]) -> "NaiveBayesClassifier":
+        for features, label in samples:
+            label = bool(label)
+            self.class_counts[label] += 1
+            self.feature_counts[label].update(features)
+            self.totals[label] += len(features)
+            self.vocabulary.update(features)
+        return self
+
+    @property
+    def samples(self) -> int:
+        return sum(self.class_counts.values())
+
+    def predict_proba(self, features: List[str]) -> float:
+        if not self.class_counts[True] or not self.class_counts[False]:
+            return 0.5
+        vocabulary = len(self.vocabulary) + 1
+        log_prob = {}
+        for label in (True, False):
+            counts = self.feature_counts[label]
+            denominator = self.totals[label] + self.alpha * vocabulary
+            log_prob[label] = math.log(self.class_counts[label] / self.samples) + sum(
+                math.log((counts[feature] + self.alpha) / denominator) for feature in features
+            )
+        # Сигмоида разности логарифмов устойчива к очень маленьким вероятностям
+        diff = max(-50.0, min(50.0, log_prob[False] - log_prob[True]))
+        return 1.0 / (1.0 + math.exp(diff))
+
+
+def read_log(path: str) -> List[Dict]:
+    """Записи журнала валидации; повреждённые строки пропускаются"""
+    records = []
+    log_path = Path(path)
+    if not log_path.exists():
+        return records
+    with log_path.open(encoding="utf-8") as f:
+        for line in f:
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return records
+
+
+class AnswerValidator:
+    """
+    Быстрая проверка ответа перед LLM-валидацией.
+
+    check() возвращает ACCEPT, REJECT или ESCALATE. Сначала применяются
+    правила вопроса (длина, язык, отказы, ключевые слова); если правила не
+    уверены и обучен классификатор, решение принимается при вероятности
+    не ниже confidence (или не выше 1 - confidence). Остальное — ESCALATE.
+
+    С вероятностью audit_rate локальное решение всё равно перепроверяется
+    LLM: так считается точность по вопросам. Вердикты LLM пишутся в
+    log_path (JSONL) и используются для обучения при следующем запуске.
+    """
+
+    def __init__(
+        self,
+        rules: Optional[Dict[Tuple[str, int], QuestionRule]] = None,
+        log_path: Optional[str] = None,
+        audit_rate: float = 0.05,
+        confidence: float = 0.9,
+        min_train_samples: int = 50,
+        seed: Optional[int] = None,
+    ):
+        self.rules = rules if rules is not None else QUESTION_RULES
+        self.log_path = log_path
+        self.audit_rate = audit_rate
+        self.confidence = confidence
+        self.min_train_samples = min_train_samples
+        self.classifier: Optional[NaiveBayesClassifier] = None
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._metrics = defaultdict(Counter)
+        if log_path:
+            self.train(read_log(log_path))
+
+    def train(self, records: List[Dict]) -> bool:
+        """
+        Обучает классификатор на записях журнала.
+
+        Returns:
+            True, если данных хватило (min_train_samples и оба класса)
+        """
+        samples = [
+            (answer_features(record["block"], record["index"], record["answer"]), record["label"])
+            for record in records
+            if "label" in record
+        ]
+        labels = {label for _, label in samples}
+        if len(samples) < self.min_train_samples or len(labels) < 2:
+            return False
+        self.classifier = NaiveBayesClassifier().fit(samples)
+        return True
+
+    def rule_decision(self, block: str, index: int, answer: str) -> str:
+        rule = self.rules.get((block, index), DEFAULT_RULE)
+        text = normalize_answer(answer)
+        has_keyword = rule.has_keyword(text)
+
+        # Короткий ответ с ключевым словом ("МФТИ", "SQL") — не пустой
+        if len(text) < rule.min_chars and not has_keyword:
+            return REJECT
+        if is_gibberish(text) and not (rule.numeric and re.search(r"\d", text)):
+            # Проверка гласных слабая: перечень аббревиатур отдаётся LLM, а не отклоняется
+            if has_keyword or _ACRONYM_RE.search(answer or ""):
+                return ESCALATE
+            return REJECT
+        if REFUSALS.search(text):
+            # Ответ с "не знаю" и по теме может быть содержательным
+            return ESCALATE if has_keyword else REJECT
+        if has_keyword and (rule.short_ok or len(text) >= rule.accept_chars):
+            return ACCEPT
+        return ESCALATE
+
+    def check(self, block: str, index: int, answer: str) -> str:
+        decision = self.rule_decision(block, index, answer)
+        if decision == ESCALATE and self.classifier is not None:
+            probability = self.classifier.predict_proba(answer_features(block, index, answer))
+            if probability >= self.confidence:
+                decision = ACCEPT
+            elif probability <= 1 - self.confidence:
+                decision = REJECT
+        with self._lock:
+            self._metrics[(block, index)][decision] += 1
+        return decision
+
+    def should_audit(self) -> bool:
+        """Перепроверить ли локальное решение в LLM"""
+        return self.audit_rate > 0 and self._random.random() < self.audit_rate
+
+    def record(self, block: str, index: int, answer: str, decision: str, label: bool) -> None:
+        """
+        Сохраняет вердикт LLM по ответу.
+
+        Args:
+            decision: Решение check() для этого ответа
+            label: Принят ли ответ LLM
+        """
+        with self._lock:
+            metrics = self._metrics[(block, index)]
+            if decision != ESCALATE:
+                metrics["audited"] += 1
+                metrics["agreed"] += (decision == ACCEPT) == label
+            if self.log_path:
+                entry = {
+                    "block": block, "index": index, "answer": answer,
+                    "decision": decision, "label": bool(label), "ts": time.time(),
+                }
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """Доля решений без LLM и точность на перепроверенных ответах по вопросам"""
+        with self._lock:
+            return {f"{block}:{index}": summarize(counts) for (block, index), counts in sorted(self._metrics.items())}
+
+
+def summarize(counts: Counter) -> Dict[str, float]:
+    total = counts[ACCEPT] + counts[REJECT] + counts[ESCALATE]
+    return {
+        "total": total,
+        "accepted": counts[ACCEPT],
+        "rejected": counts[REJECT],
+        "escalated": counts[ESCALATE],
+        "skip_rate": (counts[ACCEPT] + counts[REJECT]) / total if total else 0.0,
+        "accuracy": counts["agreed"] / counts["audited"] if counts["audited"] else None,
+    }
+
+
+def evaluate(validator: AnswerValidator, records: List[Dict]) -> Dict[str, Dict[str, float]]:
+    """
+    Прогоняет валидатор по журналу с вердиктами LLM.
+
+    Returns:
+        Словарь "блок:номер" -> total, accepted, rejected, escalated, skip_rate, accuracy
+    """
+    metrics = defaultdict(Counter)
+    for record in records:
+        if "label" not in record:
+            continue
+        counts = metrics[f"{record['block']}:{record['index']}"]
+        decision = validator.check(record["block"], record["index"], record["answer"])
+        counts[decision] += 1
+        if decision != ESCALATE:
+            counts["audited"] += 1
+            counts["agreed"] += (decision == ACCEPT) == record["label"]
+    return {key: summarize(counts) for key, counts in sorted(metrics.items())}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Точность и доля пропущенных LLM-валидаций по журналу")
+    parser.add_argument("log", help="JSONL-журнал вердиктов LLM (VALIDATOR_LOG_PATH)")
+    parser.add_argument("--holdout", type=float, default=0.3, help="Доля журнала для оценки, остальное — обучение")
+    parser.add_argument("--confidence", type=float, default=0.9)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    records = [record for record in read_log(args.log) if "label" in record]
+    random.Random(args.seed).shuffle(records)
+    split = int(len(records) * (1 - args.holdout))
+    train, test = records[:split], records[split:]
+
+    rules_only = AnswerValidator(confidence=args.confidence)
+    with_model = AnswerValidator(confidence=args.confidence)
+    trained = with_model.train(train)
+    print(f"Записей: {len(records)}, обучение: {len(train)}, оценка: {len(test)}, классификатор: {trained}")
+    for title, validator in [("Правила", rules_only), ("Правила + классификатор", with_model)]:
+        print(f"\n{title}")
+        print(f"{'вопрос':<14}{'n':>6}{'без LLM':>10}{'точность':>10}")
+        for key, row in evaluate(validator, test).items():
+            accuracy = "—" if row["accuracy"] is None else f"{row['accuracy']:.2f}"
+            print(f"{key:<14}{row['total']:>6}{row['skip_rate']:>10.2f}{accuracy:>10}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,664 @@
 import asyncio
+import atexit
 import aiohttp
+import hashlib
+import heapq
+import itertools
+import sqlite3
 import tenacity
 import json
 import os
 import re
+import threading
+import time
+from collections import OrderedDict, deque
 
 DEBUG = os.getenv("DEBUG_LLM", "0") == "1"
 
 class ModelAPIError(Exception):
     pass
 
+
+class AdmissionRejectedError(ModelAPIError):
+    """Очередь к LLM переполнена; такой запрос не повторяется"""
+    pass
+
+
+class AdmissionTimeoutError(AdmissionRejectedError):
+    """Бюджет времени вызова истёк в очереди допуска; запрос не отправлялся"""
+    pass
+
+
+class CircuitOpenError(ModelAPIError):
+    """LLM API считается недоступным; запрос не отправлялся"""
+    pass
+
+
+class CircuitBreaker:
+    """
+    Размыкатель цепи для LLM API.
+
+    После failure_threshold ошибок подряд цепь размыкается и запросы сразу
+    завершаются CircuitOpenError. Через recovery_timeout секунд пропускается
+    один пробный запрос: успех замыкает цепь, ошибка размыкает её снова.
+    """
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.failures = 0
+        self.opened = 0
+        self.rejected = 0
+        self._opened_at = None
+        self._probe = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if self._probe or time.monotonic() - self._opened_at >= self.recovery_timeout:
+                return "half_open"
+            return "open"
+
+    @property
+    def is_open(self) -> bool:
+        """Запросы сейчас отклоняются без обращения к API"""
+        return self.state == "open"
+
+    def before_call(self) -> bool:
+        """
+        Проверяет, можно ли отправить запрос.
+
+        Returns:
+            True, если этот запрос — пробный (его исход решает судьбу цепи)
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return False
+            if not self._probe and time.monotonic() - self._opened_at >= self.recovery_timeout:
+                self._probe = True
+                return True
+            self.rejected += 1
+        raise CircuitOpenError("LLM API временно недоступен")
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+            self._probe = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self._probe or (self._opened_at is None and self.failures >= self.failure_threshold):
+                self._opened_at = time.monotonic()
+                self.opened += 1
+            self._probe = False
+
+    def abandon(self) -> None:
+        """
+        Пробный запрос отменён без результата: пробу можно повторить.
+
+        Вызывается только тем запросом, для которого before_call() вернул True.
+        """
+        with self._lock:
+            self._probe = False
+
+    def stats(self) -> dict:
+        state = self.state
+        with self._lock:
+            return {"state": state, "failures": self.failures, "opened": self.opened, "rejected": self.rejected}
+
+
+class HedgePolicy:
+    """
+    Дублирующие (hedged) запросы.
+
+    Если ответ не пришёл за quantile-перцентиль времени недавних успешных
+    запросов (но не раньше min_delay), отправляется второй такой же запрос,
+    и используется тот, что завершится первым. Пока накоплено меньше
+    min_samples замеров, дубли не отправляются.
+    """
+
+    def __init__(self, quantile: float = 0.95, min_samples: int = 20, min_delay: float = 0.5, window: int = 200):
+        self.quantile = quantile
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self.hedged = 0
+        self.hedge_wins = 0
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def delay(self):
+        """Через сколько секунд отправлять дубль; None — не отправлять"""
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return None
+            ordered = sorted(self._latencies)
+        return max(self.min_delay, ordered[min(len(ordered) - 1, int(len(ordered) * self.quantile))])
+
+    async def run(self, call):
+        """Выполняет call(), при задержке запускает дубль; возвращает первый успешный результат"""
+        first = asyncio.ensure_future(call())
+        tasks = [first]
+        try:
+            delay = self.delay()
+            if delay is None:
+                return await first
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                self.hedged += 1
+                tasks.append(asyncio.ensure_future(call()))
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+
+# Полосы приоритета: меньшее значение обслуживается раньше
+PRIORITY_RECOMMENDATION = 0
+PRIORITY_VALIDATION = 1
+
+
+class _RateBucket:
+    """Token bucket без блокировок: вызывается под замком AdmissionController"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        """Сколько ждать, пока в ведре наберётся amount; 0 — можно сейчас"""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.tokens >= amount else (amount - self.tokens) / self.rate
+
+    def take(self, amount: float) -> None:
+        self.tokens -= min(amount, self.capacity)
+
+    def refund(self, amount: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+
+class _Waiter:
+    __slots__ = ("priority", "tokens", "loop", "future", "enqueued_at", "state")
+
+    def __init__(self, priority: int, tokens: int, loop, future):
+        self.priority = priority
+        self.tokens = tokens
+        self.loop = loop
+        self.future = future
+        self.enqueued_at = time.monotonic()
+        self.state = "queued"
+
+
+class AdmissionController:
+    """
+    Общий для процесса контроль допуска запросов к LLM.
+
+    Ограничивает число одновременных запросов (max_in_flight), частоту
+    (rps) и расход токенов в минуту (tpm). Ожидающие запросы обслуживаются
+    строго по приоритету, а внутри полосы — в порядке поступления; для
+    PRIORITY_RECOMMENDATION зарезервировано reserved_slots мест, которые
+    валидации занять не могут. Потокобезопасен: ожидать допуска можно из
+    любых event loop и потоков.
+
+    Пример:
+        async with admission.slot(priority=PRIORITY_VALIDATION, tokens=500):
+            ...
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int = 8,
+        rps: float = 0.0,
+        tpm: float = 0.0,
+        reserved_slots: int = 1,
+        max_queue: int = 1000,
+        throttle_pause: float = 1.0,
+    ):
+        self.max_in_flight = max_in_flight
+        self.reserved_slots = min(reserved_slots, max_in_flight - 1)
+        self.max_queue = max_queue
+        self.throttle_pause = throttle_pause
+        self._rps = _RateBucket(rps, max(1.0, rps)) if rps > 0 else None
+        self._tpm = _RateBucket(tpm / 60, tpm) if tpm > 0 else None
+        self._lock = threading.Lock()
+        self._queue = []
+        self._seq = itertools.count()
+        self._queued = 0
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._timer = None
+        self._timer_at = None
+        self.admitted = 0
+        self.rejected = 0
+        self.throttled = 0
+        self._waits = {PRIORITY_RECOMMENDATION: deque(maxlen=1000), PRIORITY_VALIDATION: deque(maxlen=1000)}
+
+    async def acquire(self, priority: int = PRIORITY_VALIDATION, tokens: int = 0) -> None:
+        """Ждёт допуска; после запроса обязательно вызвать release()"""
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(priority, tokens, loop, loop.create_future())
+        with self._lock:
+            if self._queued >= self.max_queue:
+                self.rejected += 1
+                raise AdmissionRejectedError(f"Очередь запросов к LLM переполнена ({self._queued})")
+            heapq.heappush(self._queue, (priority, next(self._seq), waiter))
+            self._queued += 1
+        self._dispatch()
+        try:
+            await waiter.future
+        except asyncio.CancelledError:
+            with self._lock:
+                granted = waiter.state == "granted"
+                if not granted:
+                    waiter.state = "cancelled"
+                    self._queued -= 1
+            # Если допуск уже выдан, место возвращает либо _grant, либо этот обработчик
+            if granted and waiter.future.done() and not waiter.future.cancelled():
+                self.release(tokens)
+            raise
+
+    def release(self, tokens: int = 0, used_tokens: int = None) -> None:
+        """
+        Освобождает место после запроса.
+
+        Args:
+            tokens: Оценка токенов, с которой запрос был допущен
+            used_tokens: Фактический расход токенов, если API его сообщил
+        """
+        with self._lock:
+            self._in_flight -= 1
+            if self._tpm is not None and used_tokens is not None and used_tokens < tokens:
+                self._tpm.refund(tokens - used_tokens)
+        self._dispatch()
+
+    def throttle(self, seconds: float = None) -> None:
+        """API ответил 429: приостанавливает допуск новых запросов"""
+        with self._lock:
+            self.throttled += 1
+            self._paused_until = max(self._paused_until, time.monotonic() + (seconds or self.throttle_pause))
+        self._dispatch()
+
+    def _grant(self, waiter: _Waiter) -> None:
+        # Выполняется в event loop ожидающего
+        if waiter.future.cancelled():
+            self.release(waiter.tokens)
+        else:
+            waiter.future.set_result(None)
+
+    def _dispatch(self) -> None:
+        delay = None
+        with self._lock:
+            while self._queue:
+                priority, _, waiter = self._queue[0]
+                if waiter.state != "queued":
+                    heapq.heappop(self._queue)
+                    continue
+                limit = self.max_in_flight if priority == PRIORITY_RECOMMENDATION else self.max_in_flight - self.reserved_slots
+                if self._in_flight >= limit:
+                    break
+                now = time.monotonic()
+                delay = max(
+                    self._paused_until - now,
+                    self._rps.wait_time(1, now) if self._rps else 0.0,
+                    self._tpm.wait_time(waiter.tokens, now) if self._tpm else 0.0,
+                )
+                if delay > 0:
+                    break
+                delay = None
+                heapq.heappop(self._queue)
+                if self._rps:
+                    self._rps.take(1)
+                if self._tpm:
+                    self._tpm.take(waiter.tokens)
+                waiter.state = "granted"
+                self._queued -= 1
+                self._in_flight += 1
+                self.admitted += 1
+                self._waits[priority].append(now - waiter.enqueued_at)
+                try:
+                    waiter.loop.call_soon_threadsafe(self._grant, waiter)
+                except RuntimeError:
+                    # Event loop ожидающего уже закрыт
+                    self._in_flight -= 1
+            if delay is not None:
+                self._schedule(delay)
+
+    def _schedule(self, delay: float) -> None:
+        # Одного таймера достаточно: он заново разбирает очередь
+        wake_at = time.monotonic() + delay
+        if self._timer is not None and self._timer_at <= wake_at:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = threading.Timer(delay, self._on_timer)
+        self._timer.daemon = True
+        self._timer_at = wake_at
+        self._timer.start()
+
+    def _on_timer(self) -> None:
+        with self._lock:
+            self._timer = None
+            self._timer_at = None
+        self._dispatch()
+
+    def slot(self, priority: int = PRIORITY_VALIDATION, tokens: int = 0, timeout: float = None) -> "_AdmissionSlot":
+        """
+        Args:
+            timeout: Сколько секунд ждать допуска; по истечении AdmissionTimeoutError
+        """
+        return _AdmissionSlot(self, priority, tokens, timeout)
+
+    def stats(self) -> dict:
+        """Состояние очереди и время ожидания допуска (в секундах) по полосам"""
+        with self._lock:
+            lanes = {}
+            for priority, waits in self._waits.items():
+                ordered = sorted(waits)
+                lanes[priority] = {
+                    "samples": len(ordered),
+                    "p50": ordered[len(ordered) // 2] if ordered else 0.0,
+                    "p95": ordered[int(len(ordered) * 0.95)] if ordered else 0.0,
+                    "max": ordered[-1] if ordered else 0.0,
+                }
+            return {
+                "in_flight": self._in_flight,
+                "queued": self._queued,
+                "admitted": self.admitted,
+                "rejected": self.rejected,
+                "throttled": self.throttled,
+                "queue_time": lanes,
+            }
+
+
+class _AdmissionSlot:
+    """Асинхронный контекстный менеджер для AdmissionController"""
+
+    def __init__(self, controller: AdmissionController, priority: int, tokens: int, timeout: float = None):
+        self.controller = controller
+        self.priority = priority
+        self.tokens = tokens
+        self.timeout = timeout
+        self.used_tokens = None
+
+    async def __aenter__(self) -> "_AdmissionSlot":
+        if self.timeout is None:
+            await self.controller.acquire(self.priority, self.tokens)
+            return self
+        # Отменённый acquire сам возвращает место, если допуск уже был выдан
+        try:
+            await asyncio.wait_for(self.controller.acquire(self.priority, self.tokens), max(0.0, self.timeout))
+        except asyncio.TimeoutError:
+            raise AdmissionTimeoutError(f"Бюджет времени истёк в очереди к LLM ({self.timeout:.1f} с)") from None
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self.controller.release(self.tokens, self.used_tokens)
+
+
+class ModelAPIClient:
+    """
+    Долгоживущий HTTP-клиент для LLM API.
+
+    Держит одну aiohttp-сессию с пулом keep-alive соединений и кэшем DNS,
+    поэтому повторные запросы к MODEL_URL не платят за TCP и TLS рукопожатие.
+    Сессия привязана к event loop: если клиент используется из другого loop,
+    она пересоздаётся.
+    """
+
+    def __init__(
+        self,
+        limit: int = 100,
+        limit_per_host: int = 10,
+        keepalive_timeout: float = 60.0,
+        ttl_dns_cache: int = 300,
+        timeout: float = 60.0,
+    ):
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.ttl_dns_cache = ttl_dns_cache
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self._session = None
+        self._loop = None
+
+    async def session(self) -> aiohttp.ClientSession:
+        loop = asyncio.get_running_loop()
+        if self._session is not None and (self._loop is not loop or self._session.closed):
+            self._discard_session()
+        if self._session is None:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                ttl_dns_cache=self.ttl_dns_cache,
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+            self._loop = loop
+        return self._session
+
+    def _discard_session(self) -> None:
+        # Сессию чужого loop нельзя закрыть await-ом: закрываем в её loop, если он ещё жив
+        session, loop = self._session, self._loop
+        self._session = None
+        self._loop = None
+        if session.closed:
+            return
+        if loop is not None and loop.is_running():
+            asyncio.run_coroutine_threadsafe(session.close(), loop)
+        elif loop is not None and not loop.is_closed():
+            loop.run_until_complete(session.close())
+
+    async def post(self, url: str, payload: dict, headers: dict):
+        """POST запрос; возвращает (HTTP статус, текст ответа)"""
+        session = await self.session()
+        async with session.post(url=url, json=payload, headers=headers) as resp:
+            return resp.status, await resp.text()
+
+    async def stream(self, url: str, payload: dict, headers: dict):
+        """POST запрос с потоковым ответом; отдаёт непустые строки тела по мере получения"""
+        session = await self.session()
+        async with session.post(url=url, json=payload, headers=headers) as resp:
+            if resp.status != 200:
+                text = await resp.text()
+                raise ModelAPIError(f"YandexGPT HTTP {resp.status}: {text}")
+            async for line in resp.content:
+                line = line.decode("utf-8").strip()
+                if line:
+                    yield line
+
+    async def close(self) -> None:
+        if self._session is None:
+            return
+        if self._loop is asyncio.get_running_loop():
+            session = self._session
+            self._session = None
+            self._loop = None
+            await session.close()
+        else:
+            self._discard_session()
+
+    def close_sync(self) -> None:
+        """Закрытие вне event loop (atexit, обработчики завершения)"""
+        if self._session is not None:
+            self._discard_session()
+
+    async def __aenter__(self) -> "ModelAPIClient":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+
+_default_client = None
+
+
+def get_default_client() -> ModelAPIClient:
+    """Общий клиент процесса; закрывается при выходе из интерпретатора"""
+    global _default_client
+    if _default_client is None:
+        _default_client = ModelAPIClient()
+        atexit.register(_default_client.close_sync)
+    return _default_client
+
+class ResponseCache:
+    """
+    Кэш ответов LLM для детерминированных запросов.
+
+    Ключ — sha256 от канонического JSON из modelUri, messages и completionOptions
+    (без флагов потокового режима). Первый уровень — LRU в памяти, второй
+    (если задан disk_path) — SQLite, общий для перезапусков и процессов.
+    Запросы, для которых вызывающий код просил температуру выше
+    max_temperature, не кэшируются: build_request всё равно прижимает
+    температуру к 0.1, но высокая запрошенная температура означает, что
+    ответы должны различаться. Ответы с ошибками не сохраняются.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: float = 24 * 60 * 60,
+        disk_path: str = None,
+        max_disk_entries: int = 100_000,
+        max_value_bytes: int = 256 * 1024,
+        max_temperature: float = 0.3,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_disk_entries = max_disk_entries
+        self.max_value_bytes = max_value_bytes
+        self.max_temperature = max_temperature
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self._items: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        if disk_path:
+            self._conn = sqlite3.connect(disk_path, check_same_thread=False)
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS llm_responses (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS llm_responses_created ON llm_responses (created_at)")
+            self._conn.commit()
+
+    @staticmethod
+    def key(payload: dict) -> str:
+        options = {
+            name: value for name, value in payload.get("completionOptions", {}).items() if name != "stream"
+        }
+        canonical = json.dumps(
+            {"modelUri": payload.get("modelUri"), "messages": payload.get("messages"), "completionOptions": options},
+            ensure_ascii=False, sort_keys=True, separators=(",", ":"),
+        )
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    def cacheable(self, temperature: float) -> bool:
+        """Кэшировать ли запрос: по температуре, запрошенной до ограничения в build_request"""
+        if temperature > self.max_temperature:
+            self.bypassed += 1
+            return False
+        return True
+
+    def get(self, key: str):
+        now = time.time()
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                if now - item[0] <= self.ttl:
+                    self._items.move_to_end(key)
+                    self.hits += 1
+                    return item[1]
+                del self._items[key]
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT value, created_at FROM llm_responses WHERE key = ? AND created_at >= ?", (key, now - self.ttl)
+                ).fetchone()
+                if row is not None:
+                    self._remember(key, row[0], row[1])
+                    self.disk_hits += 1
+                    return row[0]
+            self.misses += 1
+            return None
+
+    def _remember(self, key: str, value: str, created_at: float) -> None:
+        self._items[key] = (created_at, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_entries:
+            self._items.popitem(last=False)
+
+    def put(self, key: str, value: str) -> None:
+        if len(value.encode("utf-8")) > self.max_value_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            if self.max_entries > 0:
+                self._remember(key, value, now)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO llm_responses (key, value, created_at) VALUES (?, ?, ?)", (key, value, now)
+                )
+                # Устаревшие записи и всё сверх лимита, начиная с самых старых
+                self._conn.execute("DELETE FROM llm_responses WHERE created_at < ?", (now - self.ttl,))
+                self._conn.execute(
+                    "DELETE FROM llm_responses WHERE key IN ("
+                    "SELECT key FROM llm_responses ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_disk_entries,),
+                )
+                self._conn.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM llm_responses")
+                self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.disk_hits + self.misses
+            return {
+                "size": len(self._items),
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "bypassed": self.bypassed,
+                "hit_rate": (self.hits + self.disk_hits) / total if total else 0.0,
+            }
+
+
 def normalize_model_uri(uri: str) -> str:
     if uri.startswith("gpt://") and not uri.endswith("/latest"):
         return uri.rstrip("/") + "/latest"
@@ -36,57 +685,105 @@ def to_yandex_messages(messages):
         out.append({"role": role, "text": text})
     return out
 
+# Начало галлюцинированного продолжения диалога
+_CUT_MARKERS = re.compile(r"\n\n(?:Пользователь|Ассистент)", re.IGNORECASE)
+# Ключи, по которым узнаётся JSON с ответом модели
+_ANSWER_KEYS = ("response", "current_block")
+
+
+# Так начинается любой JSON-объект; остальные скобки отсеиваются без разбора
+_OBJECT_START = re.compile(r'\{\s*["}]')
+
+
+def _json_object_spans(text: str):
+    """
+    Находит все сбалансированные {...} за один проход.
+
+    Скобки внутри строковых литералов (с учётом экранирования) не считаются,
+    незакрытые внешние скобки не мешают найти объекты внутри них.
+
+    Returns:
+        Список пар (начало, конец), отсортированный по началу: внешний
+        объект идёт раньше вложенных в него
+    """
+    spans = []
+    opened = []
+    in_string = escape = False
+    for i, c in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif c == "\\":
+                escape = True
+            elif c == '"':
+                in_string = False
+        elif c == '"':
+            # Кавычки вне скобок — обычный текст
+            in_string = bool(opened)
+        elif c == "{":
+            opened.append(i)
+        elif c == "}" and opened:
+            spans.append((opened.pop(), i + 1))
+    spans.sort()
+    return spans
+
+
 def clean_yandex_hallucination(text: str) -> str:
     """
     Специальная очистка для YandexGPT галлюцинаций
     Обрезает ответ до первых \n\nПользователь или \n\nАссистент
+
+    Затем ищет JSON-объект: сначала с ключом response или current_block,
+    иначе первый валидный. Кандидаты перебираются от внешних к вложенным:
+    внутри валидного объекта вложенные не проверяются, а если внешний
+    объект невалиден, проверяются объекты внутри него, кроме тех, что
+    содержат место ошибки. Скобки, с которых не может начинаться
+    JSON-объект, отсеиваются без разбора.
     """
     if not text or not isinstance(text, str):
         return ""
     
     # ГЛАВНОЕ: обрезаем до первого появления галлюцинированного диалога
-    cut_patterns = [
-        r'\n\nПользователь',
-        r'\n\nАссистент'
-    ]
-    
-    min_cut_pos = len(text)
-    for pattern in cut_patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            min_cut_pos = min(min_cut_pos, match.start())
-    
-    # Обрезаем текст
-    if min_cut_pos < len(text):
-        text = text[:min_cut_pos].strip()
+    match = _CUT_MARKERS.search(text)
+    if match:
+        text = text[:match.start()].strip()
     
-    # Если после обрезки остался только текст без JSON, пытаемся найти JSON
-    json_patterns = [
-        r'```(?:json)?\s*(\{.*?\})\s*```',  # JSON в блоке кода
-        r'(\{[^{}]*"(?:response|current_block)"[^{}]*\})',  # Простой JSON
-        r'(\{(?:[^{}]|{[^{}]*})*\})'  # Любой JSON объект
-    ]
-    
-    for pattern in json_patterns:
-        match = re.search(pattern, text, re.DOTALL)
-        if match:
-            json_str = match.group(1).strip()
-            try:
-                # Проверяем что это валидный JSON
-                json.loads(json_str)
-                return json_str
-            except json.JSONDecodeError:
-                continue
+    first_valid = None
+    # Конец последнего валидного объекта: вложенные в него не проверяются
+    covered = 0
+    # Позиция ошибки разбора: объект, который её содержит, упадёт на ней же
+    error_at = -1
+    for start, end in _json_object_spans(text):
+        if start < covered or start < error_at < end or not _OBJECT_START.match(text, start):
+            continue
+        candidate = text[start:end]
+        try:
+            data = json.loads(candidate)
+        except json.JSONDecodeError as e:
+            error_at = start + e.pos
+            continue
+        except RecursionError:
+            # Вложенные объекты слишком глубокого объекта почти все такие же
+            covered = end
+            continue
+        covered = end
+        if any(key in data for key in _ANSWER_KEYS):
+            return candidate
+        if first_valid is None:
+            first_valid = candidate
+    if first_valid is not None:
+        return first_valid
     
     # Если JSON не найден, возвращаем обрезанный текст
     return text.strip()
 
-@tenacity.retry(
-    stop=tenacity.stop_after_attempt(3),
-    wait=tenacity.wait_exponential(multiplier=1, min=2, max=10),
-    retry=tenacity.retry_if_exception_type((aiohttp.ClientError, ModelAPIError))
-)
-async def get_completion(url, token, messages, model, temperature=0.7, folder_id: str = ""):
+def build_request(token, messages, model, temperature=0.7, folder_id: str = "", stream: bool = False):
+    """
+    Собирает заголовки и тело запроса к LLM.
+
+    Returns:
+        Кортеж (headers, payload)
+    """
     model_uri = build_model_uri(model, folder_id)
     headers = {
         "Content-Type": "application/json", 
@@ -109,7 +806,7 @@ async def get_completion(url, token, messages, model, temperature=0.7, folder_id
         "modelUri": model_uri,
         "messages": processed_messages,
         "completionOptions": {
-            "stream": False,
+            "stream": stream,
             "temperature": min(temperature, 0.1), 
             "maxTokens": "1024", 
             "reasoningOptions": {"mode": "DISABLED"},
@@ -123,57 +820,310 @@ async def get_completion(url, token, messages, model, temperature=0.7, folder_id
             "\n\nПользователь",
             "\n\nАссистент"
         ]
-    
-    timeout = aiohttp.ClientTimeout(total=60)
-    
+    # OpenAI-совместимые API включают потоковый режим флагом верхнего уровня
+    if stream:
+        payload["stream"] = True
+    return headers, payload
+
+
+def estimate_request_tokens(payload: dict) -> int:
+    """Грубая оценка токенов запроса с ответом: ~3 символа на токен плюс maxTokens"""
+    chars = sum(len(message["text"]) for message in payload["messages"])
+    return chars // 3 + int(payload["completionOptions"]["maxTokens"])
+
+
+def usage_tokens(text: str):
+    """Фактический расход токенов из ответа API или None"""
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        return None
+    usage = (data.get("result") or {}).get("usage") or data.get("usage") or {}
+    total = usage.get("totalTokens", usage.get("total_tokens"))
+    return int(total) if total is not None else None
+
+# Минимальное время, которое оставляется на попытку в пределах бюджета
+MIN_ATTEMPT_TIME = 1.0
+
+
+def _remaining(deadline):
+    """Сколько секунд осталось до deadline (None — без ограничения)"""
+    return deadline - time.monotonic() if deadline is not None else None
+
+
+def _stop_at_deadline(deadline):
+    def stop(retry_state) -> bool:
+        return deadline is not None and time.monotonic() + MIN_ATTEMPT_TIME >= deadline
+    return stop
+
+
+def _wait_within_deadline(wait, deadline):
+    def capped(retry_state) -> float:
+        delay = wait(retry_state)
+        if deadline is None:
+            return delay
+        return max(0.0, min(delay, deadline - time.monotonic() - MIN_ATTEMPT_TIME))
+    return capped
+
+
+async def _request_once(client, url, payload, headers, admission, priority, breaker, hedge, deadline) -> str:
+    """
+    Одна попытка запроса: допуск, размыкатель цепи и таймаут по оставшемуся бюджету.
+
+    Бюджет ограничивает и ожидание в очереди допуска: если он истёк там,
+    попытка завершается AdmissionTimeoutError, а размыкатель не считает
+    это ошибкой API.
+    """
+    probe = breaker.before_call() if breaker is not None else False
+    try:
+        if admission is None:
+            started = time.monotonic()
+            status, text = await asyncio.wait_for(client.post(url, payload, headers), _remaining(deadline))
+        else:
+            slot = admission.slot(priority, estimate_request_tokens(payload), timeout=_remaining(deadline))
+            async with slot:
+                # Таймаут запроса считается от момента допуска, а не от постановки в очередь
+                timeout = _remaining(deadline)
+                if timeout is not None and timeout <= 0:
+                    raise AdmissionTimeoutError("Бюджет времени истёк в очереди к LLM")
+                started = time.monotonic()
+                status, text = await asyncio.wait_for(client.post(url, payload, headers), timeout)
+                if status == 429:
+                    admission.throttle()
+                elif status == 200:
+                    slot.used_tokens = usage_tokens(text)
+
+        if DEBUG:
+            print(f"[LLM][YandexGPT][HTTP] {status}")
+            print(f"[LLM][YandexGPT][RAW] {text[:2000]}")
+
+        if status != 200:
+            raise ModelAPIError(f"YandexGPT HTTP {status}: {text}")
+        result = parse_completion(text)
+    except (AdmissionRejectedError, CircuitOpenError, asyncio.CancelledError):
+        # Запрос не дошёл до API или проиграл дублю: пробу, если она была нашей, можно повторить
+        if probe:
+            breaker.abandon()
+        raise
+    except (aiohttp.ClientError, asyncio.TimeoutError, ModelAPIError):
+        if breaker is not None:
+            breaker.record_failure()
+        raise
+
+    if breaker is not None:
+        breaker.record_success()
+    if hedge is not None:
+        hedge.observe(time.monotonic() - started)
+    return result
+
+
+async def get_completion(
+    url, token, messages, model, temperature=0.7, folder_id: str = "",
+    client: ModelAPIClient = None, cache: ResponseCache = None,
+    admission: AdmissionController = None, priority: int = PRIORITY_VALIDATION,
+    budget: float = None, breaker: CircuitBreaker = None, hedge: HedgePolicy = None,
+):
+    """
+    Запрос к LLM с повторами (до 3 попыток, экспоненциальная пауза 2–10 с).
+
+    Args:
+        budget: Общий бюджет времени на вызов вместе с повторами, секунды;
+            паузы и таймаут каждой попытки укладываются в оставшееся время.
+            Без бюджета попытка ограничена таймаутом сессии клиента
+        breaker: Размыкатель цепи; при разомкнутой цепи сразу CircuitOpenError
+        hedge: Политика дублирующих запросов для медленных попыток
+    """
+    headers, payload = build_request(token, messages, model, temperature, folder_id)
+
+    cache_key = None
+    if cache is not None and cache.cacheable(temperature):
+        cache_key = cache.key(payload)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            if DEBUG:
+                print(f"[LLM][YandexGPT][CACHE] {cached[:2000]}")
+            return cached
+
     if DEBUG:
         print("[LLM][YandexGPT][REQ]", json.dumps(payload, ensure_ascii=False, indent=2))
     
-    async with aiohttp.ClientSession(headers=headers, timeout=timeout) as session:
-        async with session.post(url=url, json=payload) as resp:
-            text = await resp.text()
+    client = client or get_default_client()
+    deadline = time.monotonic() + budget if budget else None
+
+    async def attempt_request():
+        return await _request_once(client, url, payload, headers, admission, priority, breaker, hedge, deadline)
+
+    retrying = tenacity.AsyncRetrying(
+        stop=tenacity.stop_after_attempt(3) | _stop_at_deadline(deadline),
+        wait=_wait_within_deadline(tenacity.wait_exponential(multiplier=1, min=2, max=10), deadline),
+        retry=(
+            tenacity.retry_if_exception_type((aiohttp.ClientError, asyncio.TimeoutError, ModelAPIError))
+            & tenacity.retry_if_not_exception_type((AdmissionRejectedError, CircuitOpenError))
+        ),
+        reraise=True,
+    )
+    async for attempt in retrying:
+        with attempt:
+            result = await (hedge.run(attempt_request) if hedge is not None else attempt_request())
+
+    if cache_key is not None and not result.startswith(ERROR_RESPONSE_PREFIX):
+        cache.put(cache_key, result)
+    return result
+
+
+# Так начинаются ответы-заглушки, которые get_completion возвращает вместо текста модели
+ERROR_RESPONSE_PREFIX = '{"response": "", "error"'
+
+
+def parse_completion(text: str) -> str:
+    """Извлекает текст ответа из тела ответа YandexGPT или OpenAI-совместимого API"""
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        raise ModelAPIError(f"Invalid JSON from YandexGPT: {text[:500]}")
+    
+    if DEBUG:
+        print("[LLM][YandexGPT][PARSED]", data)
+
+    # Обработка YandexGPT формата
+    if "result" in data:
+        alts = data["result"].get("alternatives", [])
+        if alts and "message" in alts[0]:
+            raw_text = alts[0]["message"].get("text", "").strip()
             
-            if DEBUG:
-                print(f"[LLM][YandexGPT][HTTP] {resp.status}")
-                print(f"[LLM][YandexGPT][RAW] {text[:2000]}")
+            if not raw_text:
+                return '{"response": "", "error": "empty_response"}'
             
-            if resp.status != 200:
-                raise ModelAPIError(f"YandexGPT HTTP {resp.status}: {text}")
-
-            try:
-                data = json.loads(text)
-            except json.JSONDecodeError:
-                raise ModelAPIError(f"Invalid JSON from YandexGPT: {text[:500]}")
+            # Специальная очистка для YandexGPT
+            cleaned_text = clean_yandex_hallucination(raw_text)
             
             if DEBUG:
-                print("[LLM][YandexGPT][PARSED]", data)
-
-            # Обработка YandexGPT формата
-            if "result" in data:
-                alts = data["result"].get("alternatives", [])
-                if alts and "message" in alts[0]:
-                    raw_text = alts[0]["message"].get("text", "").strip()
-                    
-                    if not raw_text:
-                        return '{"response": "", "error": "empty_response"}'
-                    
-                    # Специальная очистка для YandexGPT
-                    cleaned_text = clean_yandex_hallucination(raw_text)
-                    
-                    if DEBUG:
-                        print(f"[LLM][YandexGPT][CLEANED] {cleaned_text}")
-                    
-                    return cleaned_text if cleaned_text else '{"response": "", "error": "hallucination_cleaned"}'
-                
-                # Если нет alternatives, возвращаем как есть
-                return json.dumps(data["result"], ensure_ascii=False)
-
-            # OpenAI-совместимый формат (на всякий случай)
-            if "choices" in data:
-                raw_text = data["choices"][0]["message"]["content"]
-                return clean_yandex_hallucination(raw_text)
-
-            raise ModelAPIError(f"Unexpected YandexGPT schema: {json.dumps(data, ensure_ascii=False)[:1000]}")
+                print(f"[LLM][YandexGPT][CLEANED] {cleaned_text}")
+            
+            return cleaned_text if cleaned_text else '{"response": "", "error": "hallucination_cleaned"}'
+        
+        # Если нет alternatives, возвращаем как есть
+        return json.dumps(data["result"], ensure_ascii=False)
+
+    # OpenAI-совместимый формат (на всякий случай)
+    if "choices" in data:
+        raw_text = data["choices"][0]["message"]["content"]
+        return clean_yandex_hallucination(raw_text)
+
+    raise ModelAPIError(f"Unexpected YandexGPT schema: {json.dumps(data, ensure_ascii=False)[:1000]}")
+
+def _stream_chunk_text(line: str, text: str) -> str:
+    """
+    Разбирает одну строку потокового ответа и возвращает накопленный текст.
+
+    YandexGPT присылает JSON-объекты построчно, каждый с полным текстом на
+    текущий момент; OpenAI-совместимые API — SSE-события "data: {...}" с
+    приращением в choices[0].delta.content.
+    """
+    if line.startswith("data:"):
+        line = line[5:].strip()
+        if line == "[DONE]":
+            return text
+    elif not line.startswith("{"):
+        # Комментарии и служебные поля SSE (event:, id:, retry:)
+        return text
+    try:
+        data = json.loads(line)
+    except json.JSONDecodeError:
+        raise ModelAPIError(f"Invalid JSON chunk from YandexGPT: {line[:500]}")
+    if "error" in data:
+        raise ModelAPIError(f"YandexGPT stream error: {json.dumps(data['error'], ensure_ascii=False)[:1000]}")
+
+    if "result" in data:
+        alts = data["result"].get("alternatives", [])
+        if alts and "message" in alts[0]:
+            return alts[0]["message"].get("text", "")
+        return text
+    if "choices" in data:
+        choice = data["choices"][0] if data["choices"] else {}
+        delta = choice.get("delta") or choice.get("message") or {}
+        return text + (delta.get("content") or "")
+    raise ModelAPIError(f"Unexpected YandexGPT schema: {json.dumps(data, ensure_ascii=False)[:1000]}")
+
+
+async def stream_completion(
+    url, token, messages, model, temperature=0.7, folder_id: str = "",
+    client: ModelAPIClient = None, cache: ResponseCache = None,
+    admission: AdmissionController = None, priority: int = PRIORITY_RECOMMENDATION,
+    breaker: CircuitBreaker = None,
+):
+    """
+    Потоковая генерация ответа.
+
+    Отдаёт накопленный текст ответа после каждого полученного фрагмента.
+    Если модель начинает галлюцинировать продолжение диалога, поток
+    обрывается на этом месте. Окончательный ответ стоит пропустить через
+    clean_yandex_hallucination. При попадании в кэш ответ отдаётся одним фрагментом.
+    """
+    headers, payload = build_request(token, messages, model, temperature, folder_id, stream=True)
+
+    cache_key = None
+    if cache is not None and cache.cacheable(temperature):
+        cache_key = cache.key(payload)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            yield cached
+            return
+    if DEBUG:
+        print("[LLM][YandexGPT][STREAM][REQ]", json.dumps(payload, ensure_ascii=False, indent=2))
+
+    client = client or get_default_client()
+    text = ""
+    probe = breaker.before_call() if breaker is not None else False
+    slot = admission.slot(priority, estimate_request_tokens(payload)) if admission is not None else None
+    admitted = succeeded = False
+    stream = None
+    try:
+        if slot is not None:
+            await slot.__aenter__()
+            admitted = True
+        stream = client.stream(url, payload, headers)
+        async for line in stream:
+            new_text = _stream_chunk_text(line, text)
+            if new_text == text:
+                continue
+            cut = _CUT_MARKERS.search(new_text, max(0, len(text) - 20))
+            if cut:
+                if cut.start() > len(text):
+                    text = new_text[:cut.start()]
+                    yield text
+                break
+            text = new_text
+            yield text
+        succeeded = True
+    except (AdmissionRejectedError, CircuitOpenError):
+        raise
+    except (aiohttp.ClientError, asyncio.TimeoutError, ModelAPIError) as e:
+        if slot is not None and "HTTP 429" in str(e):
+            admission.throttle()
+        if breaker is not None:
+            breaker.record_failure()
+            breaker = None
+        raise
+    finally:
+        # После обрыва на маркере закрываем поток сразу, чтобы соединение
+        # вернулось в пул до освобождения слота, а не при сборке мусора
+        if stream is not None:
+            await stream.aclose()
+        if admitted:
+            await slot.__aexit__(None, None, None)
+        if breaker is not None:
+            if succeeded or text:
+                breaker.record_success()
+            elif probe:
+                breaker.abandon()
+
+    if DEBUG:
+        print(f"[LLM][YandexGPT][STREAM][RAW] {text[:2000]}")
+
+    if cache_key is not None and text.strip():
+        cache.put(cache_key, clean_yandex_hallucination(text))
+
 
 async def wrapped_get_completion(*args, **kwargs):
     try:
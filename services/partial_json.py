@@ -0,0 +1,132 @@
+"""
+Инкрементальный разбор JSON, который приходит от LLM по частям.
+"""
+import json
+from typing import Any, List, Optional
+
+
+class PartialJSONParser:
+    """
+    Разбирает JSON-объект по мере поступления текста.
+
+    Каждый новый фрагмент просматривается один раз; парсер помнит стек
+    открытых скобок и последнюю позицию, на которой JSON можно корректно
+    закрыть. value() возвращает объект, в котором незавершённые строковые
+    значения обрезаны по уже полученный текст, а недописанные ключи, числа
+    и литералы отброшены. Текст до первой "{" (например, ```json) пропускается.
+
+    Пример:
+        parser = PartialJSONParser()
+        parser.feed('{"response": "Рекоменд')  # {"response": "Рекоменд"}
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self._pos = 0
+        self._start = None
+        self._end = None
+        # Элементы стека: [скобка, ожидается ли ключ]
+        self._stack: List[list] = []
+        self._in_string = False
+        self._key_string = False
+        self._escape = False
+        self._scalar = False
+        self._safe = None
+        self._safe_closers = ""
+
+    @property
+    def done(self) -> bool:
+        """Объект верхнего уровня закрыт"""
+        return self._end is not None
+
+    def feed(self, chunk: str) -> Optional[Any]:
+        """Добавляет фрагмент текста и возвращает текущее частичное значение"""
+        self.buffer += chunk
+        self._scan()
+        return self.value()
+
+    def _closers(self) -> str:
+        return "".join("}" if bracket == "{" else "]" for bracket, _ in reversed(self._stack))
+
+    def _mark_safe(self, end: int) -> None:
+        self._safe = end
+        self._safe_closers = self._closers()
+
+    def _scan(self) -> None:
+        buffer = self.buffer
+        for i in range(self._pos, len(buffer)):
+            c = buffer[i]
+            if self._start is None:
+                if c == "{":
+                    self._start = i
+                    self._stack.append(["{", True])
+                    self._mark_safe(i + 1)
+                continue
+            if self._end is not None:
+                break
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if not self._key_string:
+                        self._mark_safe(i + 1)
+                continue
+
+            if self._scalar and c in ",}] \t\r\n":
+                self._scalar = False
+                self._mark_safe(i)
+
+            if c == '"':
+                self._in_string = True
+                top = self._stack[-1]
+                self._key_string = top[0] == "{" and top[1]
+            elif c in "{[":
+                self._stack.append([c, c == "{"])
+                self._mark_safe(i + 1)
+            elif c in "}]":
+                self._stack.pop()
+                self._mark_safe(i + 1)
+                if not self._stack:
+                    self._end = i + 1
+            elif c == ":":
+                self._stack[-1][1] = False
+            elif c == ",":
+                if self._stack[-1][0] == "{":
+                    self._stack[-1][1] = True
+            elif not c.isspace():
+                self._scalar = True
+        self._pos = len(buffer)
+
+    def _open_string_value(self) -> str:
+        """Текст с незакрытым строковым значением, пригодный для закрытия кавычкой"""
+        text = self.buffer[self._start:]
+        if self._escape:
+            return text[:-1]
+        # Недописанная последовательность \uXXXX
+        tail = text[-5:]
+        slash = tail.rfind("\\u")
+        if slash != -1:
+            prefix = text[:len(text) - len(tail) + slash]
+            backslashes = len(prefix) - len(prefix.rstrip("\\"))
+            if backslashes % 2 == 0:
+                return prefix
+        return text
+
+    def value(self) -> Optional[Any]:
+        """Текущее частичное значение или None, если объект ещё не начался"""
+        if self._start is None:
+            return None
+        if self._end is not None:
+            text = self.buffer[self._start:self._end]
+        elif self._in_string and not self._key_string:
+            text = self._open_string_value() + '"' + self._closers()
+        else:
+            text = self.buffer[self._start:self._safe] + self._safe_closers
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            return None
@@ -0,0 +1,239 @@
+"""
+Сборка промпта финальных рекомендаций с учётом бюджета входных токенов.
+"""
+import json
+import math
+import re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+SYSTEM_PROMPT_RULES = (
+    "Ты — опытный карьерный коуч, специализирующийся на технических ролях в ML/AI. "
+    "Твоя задача — проанализировать КОНКРЕТНЫЕ найденные вакансии и дать подробные персональные рекомендации.\n\n"
+
+    "ОБЯЗАТЕЛЬНЫЕ ПРАВИЛА:\n"
+    "1. Используй ТОЛЬКО вакансии из списка 'found_positions' — не придумывай новые.\n"
+    "2. Упоминай конкретные компании и позиции по названиям.\n"
+    "3. Используй навыки из 'skills_to_develop' и требования из 'requirements' для плана развития.\n"
+    "4. Рассматривай карьерные пути из 'career_paths'.\n"
+    "5. Отвечай СТРОГО в формате JSON без лишнего текста.\n\n"
+)
+
+SYSTEM_PROMPT_EXAMPLE = (
+    "ПРИМЕР (few-shot):\n"
+    "Входные данные:\n"
+    "{\n"
+    "  \"found_positions\": [\n"
+    "    {\"title\": \"ML Engineer\", \"company\": \"Сбер\"},\n"
+    "    {\"title\": \"Senior NLP Engineer\", \"company\": \"Just AI\"},\n"
+    "    {\"title\": \"Data Scientist\", \"company\": \"Яндекс\"}\n"
+    "  ],\n"
+    "  \"skills_to_develop\": [\"NLP\", \"Deep Learning\"],\n"
+    "  \"career_paths\": [\"ML Engineer → Senior ML Engineer\"]\n"
+    "}\n\n"
+
+    "Ожидаемый ответ:\n"
+    "{\n"
+    "  \"response\": \"С учётом вашего опыта оптимально начать с роли ML Engineer в Сбере — там требования совпадают с вашим профилем. "
+    "Senior NLP Engineer в Just AI можно рассматривать как следующую цель, так как у вас есть базовые навыки NLP. "
+    "Data Scientist в Яндексе также подходит, но менее релевантен.\",\n"
+    "  \"recommendation\": {\n"
+    "    \"nearest_position\": \"ML Engineer в Сбер\",\n"
+    "    \"nearest_position_reason\": \"Эта роль наиболее близка к текущим навыкам, требования совпадают.\",\n"
+    "    \"recommended_position\": \"Senior NLP Engineer в Just AI\",\n"
+    "    \"recommended_position_reason\": \"Подходит для следующего карьерного шага, есть перспектива роста в NLP.\",\n"
+    "    \"skills_gap\": \"Необходимо подтянуть NLP и Deep Learning.\",\n"
+    "    \"plan_1_2_years\": \"В течение года укрепить экспертизу в NLP, через 2 года выйти на уровень Senior.\",\n"
+    "    \"recommended_courses\": [\"Курс по NLP\", \"Advanced Deep Learning\"],\n"
+    "    \"current_vacancies\": [\n"
+    "      \"ML Engineer в Сбер\",\n"
+    "      \"Senior NLP Engineer в Just AI\",\n"
+    "      \"Data Scientist в Яндекс\"\n"
+    "    ]\n"
+    "  }\n"
+    "}\n\n"
+)
+
+# Без примера модели нужна хотя бы схема ответа
+SYSTEM_PROMPT_SCHEMA = (
+    "ФОРМАТ ОТВЕТА: {\"response\": \"...\", \"recommendation\": {\"nearest_position\", \"nearest_position_reason\", "
+    "\"recommended_position\", \"recommended_position_reason\", \"skills_gap\", \"plan_1_2_years\", "
+    "\"recommended_courses\": [...], \"current_vacancies\": [...]}}\n\n"
+)
+
+SYSTEM_PROMPT_TAIL = (
+    "КРИТИЧЕСКИ ВАЖНО: Ответь строго JSON. Никакого текста вне JSON. Если нужно пояснение — включи его в поле response. Любой другой формат считается ошибкой»"
+)
+
+USER_MESSAGE_TEMPLATE = """АНАЛИЗИРУЙ СЛЕДУЮЩИЕ ДАННЫЕ И ДАЙ РЕКОМЕНДАЦИИ:
+
+=== МОЙ ПРОФИЛЬ ===
+{profile}
+
+=== МОИ КАРЬЕРНЫЕ ЦЕЛИ ===
+{career_goals}
+
+=== НАЙДЕННЫЕ ДЛЯ МЕНЯ ВАКАНСИИ (ОБЯЗАТЕЛЬНО используй эти конкретные позиции) ===
+{positions}
+
+=== НАВЫКИ ДЛЯ РАЗВИТИЯ ===
+{skills}
+
+=== ВОЗМОЖНЫЕ КАРЬЕРНЫЕ ПУТИ ===
+{career_paths}"""
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Локальная оценка числа токенов без токенизатора модели.
+
+    Слово латиницей считается как токен на каждые 4 символа, кириллицей — на
+    каждые 3, знак препинания — отдельный токен. Оценка слегка завышена,
+    чтобы бюджет не превышался.
+    """
+    tokens = 0
+    for match in _TOKEN_RE.finditer(text):
+        word = match.group()
+        tokens += math.ceil(len(word) / (4 if word.isascii() else 3))
+    return tokens
+
+
+def compact_json(data: Any) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def dedup(items: List[str], limit: Optional[int] = None) -> List[str]:
+    """Убирает повторы без учёта регистра, сохраняя порядок"""
+    seen = set()
+    result = []
+    for item in items:
+        key = str(item).strip().casefold()
+        if key and key not in seen:
+            seen.add(key)
+            result.append(str(item).strip())
+            if limit is not None and len(result) >= limit:
+                break
+    return result
+
+
+def truncate(text: Any, limit: int) -> str:
+    """Обрезает текст (или список ключевых слов) по границе слова"""
+    if hasattr(text, "tolist"):
+        text = text.tolist()
+    if isinstance(text, (list, tuple)):
+        text = ", ".join(dedup(text))
+    text = re.sub(r"\s+", " ", str(text or "")).strip()
+    if len(text) <= limit:
+        return text
+    cut = text.rfind(" ", 0, limit)
+    return text[:cut if cut > 0 else limit].rstrip(" ,.;:") + "…"
+
+
+@lru_cache(maxsize=2)
+def system_prompt(with_example: bool = True) -> Tuple[str, int]:
+    """Статический системный промпт и его размер в токенах (вычисляются один раз)"""
+    text = SYSTEM_PROMPT_RULES + (SYSTEM_PROMPT_EXAMPLE if with_example else SYSTEM_PROMPT_SCHEMA) + SYSTEM_PROMPT_TAIL
+    return text, estimate_tokens(text)
+
+
+class PromptBuilder:
+    """
+    Собирает сообщения для финальных рекомендаций в пределах token_budget.
+
+    Вакансии упаковываются компактно: минифицированный JSON, навыки без
+    повторов, обрезанные требования. Если промпт не помещается в бюджет,
+    по очереди отбрасываются наименее релевантные вакансии (хотя бы одна
+    остаётся), навыки для развития и карьерные пути с конца списка, затем
+    few-shot пример.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = 3000,
+        max_positions: int = 10,
+        max_position_skills: int = 8,
+        max_requirement_chars: int = 200,
+        max_skills_to_develop: int = 15,
+        max_career_paths: int = 5,
+    ):
+        self.token_budget = token_budget
+        self.max_positions = max_positions
+        self.max_position_skills = max_position_skills
+        self.max_requirement_chars = max_requirement_chars
+        self.max_skills_to_develop = max_skills_to_develop
+        self.max_career_paths = max_career_paths
+
+    def compact_position(self, rec: Dict[str, Any]) -> Dict[str, Any]:
+        position = {
+            "title": rec["title"],
+            "company": rec["company"],
+            "experience": rec["experience"],
+            "salary": rec["salary"],
+            "key_skills": dedup(list(rec.get("skills", [])), self.max_position_skills),
+            "requirements": truncate(rec.get("requirements"), self.max_requirement_chars),
+            "relevance_score": round(float(rec["similarity_score"]), 3),
+        }
+        return {name: value for name, value in position.items() if value not in (None, "", [])}
+
+    def render_user_message(self, profile: Dict[str, Any], career_goals: str, positions, skills, career_paths) -> str:
+        return USER_MESSAGE_TEMPLATE.format(
+            profile=compact_json(profile),
+            career_goals=career_goals,
+            positions=compact_json(positions),
+            skills=compact_json(skills),
+            career_paths=compact_json(career_paths),
+        )
+
+    def build(
+        self,
+        user_profile_json: Dict[str, Any],
+        career_goals: str,
+        recommendations: List[Dict[str, Any]],
+        expanded_skills: List[str],
+        career_paths: List[str],
+    ) -> Tuple[List[Dict[str, str]], Dict[str, Any]]:
+        """
+        Собирает сообщения для LLM.
+
+        Returns:
+            Кортеж (messages, stats), где stats — оценка токенов и что было отброшено
+        """
+        profile = {name: value for name, value in user_profile_json.items() if value not in (None, "", [])}
+        ranked = sorted(recommendations, key=lambda rec: rec["similarity_score"], reverse=True)
+        positions = [self.compact_position(rec) for rec in ranked[:self.max_positions]]
+        skills = dedup(expanded_skills, self.max_skills_to_develop)
+        paths = list(career_paths[:self.max_career_paths])
+        with_example = True
+
+        while True:
+            system_text, system_tokens = system_prompt(with_example)
+            user_message = self.render_user_message(profile, career_goals, positions, skills, paths)
+            tokens = system_tokens + estimate_tokens(user_message)
+            if tokens <= self.token_budget:
+                break
+            if len(positions) > 1:
+                positions.pop()
+            elif skills:
+                skills.pop()
+            elif paths:
+                paths.pop()
+            elif with_example:
+                with_example = False
+            else:
+                # Меньше не сжать: отправляем как есть
+                break
+
+        messages = [
+            {"role": "system", "content": system_text},
+            {"role": "user", "content": user_message},
+        ]
+        stats = {
+            "tokens": tokens,
+            "budget": self.token_budget,
+            "positions": len(positions),
+            "dropped_positions": len(recommendations) - len(positions),
+            "with_example": with_example,
+        }
+        return messages, stats
@@ -0,0 +1,182 @@
+"""
+Хранилище диалогов на стороне сервера.
+
+Клиент Gradio присылает только новое сообщение, а история и позиция в анкете
+берутся из SessionStore по идентификатору сессии.
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+
+class SessionRecord:
+    """Состояние одного диалога: история сообщений и текущий вопрос анкеты"""
+
+    __slots__ = ("session_id", "history", "block", "question_index", "waiting_for_answer", "updated_at", "version")
+
+    def __init__(
+        self,
+        session_id: str,
+        history: Optional[List[Dict[str, str]]] = None,
+        block: str = "context",
+        question_index: int = 0,
+        waiting_for_answer: bool = True,
+        updated_at: float = 0.0,
+        version: int = 0,
+    ):
+        self.session_id = session_id
+        self.history = history if history is not None else []
+        self.block = block
+        self.question_index = question_index
+        self.waiting_for_answer = waiting_for_answer
+        self.updated_at = updated_at
+        self.version = version
+
+    def to_json(self) -> str:
+        return json.dumps(
+            [[message["role"], message["content"]] for message in self.history],
+            ensure_ascii=False, separators=(",", ":"),
+        )
+
+    @staticmethod
+    def history_from_json(data: str) -> List[Dict[str, str]]:
+        return [{"role": role, "content": content} for role, content in json.loads(data)]
+
+
+class SessionStore:
+    """
+    Сессии в памяти (LRU на max_sessions записей, срок жизни ttl секунд)
+    и, если задан db_path, в SQLite.
+
+    С SQLite хранилище переживает перезапуск и может быть общим для
+    нескольких процессов: при чтении номер версии записи сверяется с базой,
+    и устаревшая копия в памяти перечитывается.
+    """
+
+    def __init__(self, max_sessions: int = 10_000, ttl: float = 24 * 60 * 60, db_path: str = None):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self.hits = 0
+        self.db_hits = 0
+        self.created = 0
+        self._items: "OrderedDict[str, SessionRecord]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        if db_path:
+            self._conn = sqlite3.connect(db_path, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS chat_sessions (
+                    session_id TEXT PRIMARY KEY,
+                    history TEXT NOT NULL,
+                    block TEXT NOT NULL,
+                    question_index INTEGER NOT NULL,
+                    waiting_for_answer INTEGER NOT NULL,
+                    updated_at REAL NOT NULL,
+                    version INTEGER NOT NULL
+                )
+                """
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS chat_sessions_updated ON chat_sessions (updated_at)")
+            self._conn.commit()
+
+    def _remember(self, record: SessionRecord) -> None:
+        if self.max_sessions <= 0:
+            return
+        self._items[record.session_id] = record
+        self._items.move_to_end(record.session_id)
+        while len(self._items) > self.max_sessions:
+            self._items.popitem(last=False)
+
+    def _load(self, session_id: str, now: float) -> Optional[SessionRecord]:
+        row = self._conn.execute(
+            "SELECT history, block, question_index, waiting_for_answer, updated_at, version "
+            "FROM chat_sessions WHERE session_id = ? AND updated_at >= ?",
+            (session_id, now - self.ttl),
+        ).fetchone()
+        if row is None:
+            return None
+        history, block, question_index, waiting_for_answer, updated_at, version = row
+        return SessionRecord(
+            session_id, SessionRecord.history_from_json(history), block, question_index,
+            bool(waiting_for_answer), updated_at, version,
+        )
+
+    def get(self, session_id: str) -> Optional[SessionRecord]:
+        """Сессия по идентификатору или None, если её нет или она устарела"""
+        now = time.time()
+        with self._lock:
+            record = self._items.get(session_id)
+            if record is not None and now - record.updated_at > self.ttl:
+                del self._items[session_id]
+                record = None
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT version FROM chat_sessions WHERE session_id = ?", (session_id,)
+                ).fetchone()
+                if record is not None and row is not None and row[0] == record.version:
+                    self.hits += 1
+                    self._items.move_to_end(session_id)
+                    return record
+                # Записи нет в памяти или её обновил другой процесс
+                record = self._load(session_id, now) if row is not None else None
+                if record is not None:
+                    self.db_hits += 1
+                    self._remember(record)
+                return record
+            if record is not None:
+                self.hits += 1
+                self._items.move_to_end(session_id)
+            return record
+
+    def get_or_create(self, session_id: str, history: List[Dict[str, str]]) -> SessionRecord:
+        """
+        Сессия по идентификатору; новая начинается с копии history.
+
+        Args:
+            history: Начальная история (например, первый вопрос анкеты)
+        """
+        record = self.get(session_id)
+        if record is None:
+            record = SessionRecord(session_id, [dict(message) for message in history])
+            self.created += 1
+        return record
+
+    def save(self, record: SessionRecord) -> None:
+        now = time.time()
+        with self._lock:
+            record.updated_at = now
+            record.version += 1
+            self._remember(record)
+            if self._conn is not None:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO chat_sessions "
+                    "(session_id, history, block, question_index, waiting_for_answer, updated_at, version) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        record.session_id, record.to_json(), record.block, record.question_index,
+                        int(record.waiting_for_answer), now, record.version,
+                    ),
+                )
+                self._conn.execute("DELETE FROM chat_sessions WHERE updated_at < ?", (now - self.ttl,))
+                self._conn.commit()
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._items.pop(session_id, None)
+            if self._conn is not None:
+                self._conn.execute("DELETE FROM chat_sessions WHERE session_id = ?", (session_id,))
+                self._conn.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._items),
+                "hits": self.hits,
+                "db_hits": self.db_hits,
+                "created": self.created,
+            }
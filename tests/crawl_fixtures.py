@@ -0,0 +1,51 @@
+"""Синтетический архив ответов hh.ru для тестов парсеров на ReplayServer."""
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "parser"))
+
+from http_fixtures import FixtureArchive, fixture_key  # noqa: E402
+
+PER_PAGE = 100
+# Запрос -> страницы с vacancy_id; вакансии 3 и 7 встречаются в обоих запросах
+QUERIES = {
+    "ML": [[1, 2, 3, 4], [5, 6, 7]],
+    "NLP": [[3, 7, 8], [9, 10]],
+}
+
+
+def vacancy_item(vacancy_id: int) -> dict:
+    return {
+        "id": str(vacancy_id),
+        "name": f"ML Engineer {vacancy_id}",
+        "area": {"name": "Москва"},
+        "snippet": {"requirement": "Python", "responsibility": "Модели"},
+        "employer": {"id": str(vacancy_id % 3), "name": f"Компания {vacancy_id % 3}"},
+        "experience": {"name": "От 1 года до 3 лет"},
+        "salary": None,
+        "alternate_url": f"https://hh.ru/vacancy/{vacancy_id}",
+        "published_at": f"2025-01-{vacancy_id:02d}T10:00:00+0300",
+    }
+
+
+def search_key(text: str, page: int) -> str:
+    query = f"text={text}&per_page={PER_PAGE}&page={page}&order_by=publication_time"
+    return fixture_key("/vacancies", query)
+
+
+def make_archive() -> FixtureArchive:
+    archive = FixtureArchive()
+    for text, pages in QUERIES.items():
+        for page, ids in enumerate(pages):
+            body = {"items": [vacancy_item(i) for i in ids], "pages": len(pages), "page": page}
+            archive.add(search_key(text, page), 200, json.dumps(body), {})
+    for vacancy_id in unique_ids():
+        archive.add(f"/vacancies/{vacancy_id}", 200, json.dumps({"key_skills": [{"name": "Python"}]}), {})
+    for employer_id in range(3):
+        archive.add(f"/employers/{employer_id}", 200, json.dumps({"industries": [{"name": "IT"}]}), {})
+    return archive
+
+
+def unique_ids() -> set:
+    return {i for pages in QUERIES.values() for ids in pages for i in ids}
@@ -0,0 +1,140 @@
+import asyncio
+
+import pytest
+
+from services.model_api import (
+    PRIORITY_RECOMMENDATION,
+    PRIORITY_VALIDATION,
+    AdmissionController,
+    AdmissionRejectedError,
+    AdmissionTimeoutError,
+)
+
+
+async def settle():
+    """Даёт event loop выполнить запланированные выдачи допуска"""
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_higher_priority_lane_is_served_first():
+    async def scenario():
+        admission = AdmissionController(max_in_flight=1, reserved_slots=0)
+        order = []
+
+        async def request(name, priority):
+            await admission.acquire(priority)
+            order.append(name)
+            admission.release()
+
+        await admission.acquire(PRIORITY_VALIDATION)
+        tasks = []
+        arrivals = [
+            ("v1", PRIORITY_VALIDATION),
+            ("r1", PRIORITY_RECOMMENDATION),
+            ("v2", PRIORITY_VALIDATION),
+            ("r2", PRIORITY_RECOMMENDATION),
+        ]
+        for name, priority in arrivals:
+            tasks.append(asyncio.create_task(request(name, priority)))
+            await settle()
+        admission.release()
+        await asyncio.gather(*tasks)
+        return order
+
+    # Внутри полосы — порядок поступления
+    assert asyncio.run(scenario()) == ["r1", "r2", "v1", "v2"]
+
+
+def test_reserved_slot_is_not_given_to_validation():
+    async def scenario():
+        admission = AdmissionController(max_in_flight=2, reserved_slots=1)
+        await admission.acquire(PRIORITY_VALIDATION)
+        validation = asyncio.create_task(admission.acquire(PRIORITY_VALIDATION))
+        recommendation = asyncio.create_task(admission.acquire(PRIORITY_RECOMMENDATION))
+        await settle()
+        result = (validation.done(), recommendation.done())
+        validation.cancel()
+        await asyncio.gather(validation, return_exceptions=True)
+        return result, admission.stats()
+
+    (validation_done, recommendation_done), stats = asyncio.run(scenario())
+    assert not validation_done
+    assert recommendation_done
+    assert stats["in_flight"] == 2 and stats["queued"] == 0
+
+
+def test_cancelled_waiter_leaves_queue():
+    async def scenario():
+        admission = AdmissionController(max_in_flight=1)
+        await admission.acquire()
+        waiter = asyncio.create_task(admission.acquire())
+        await settle()
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        queued = admission.stats()["queued"]
+        admission.release()
+        # Место не потеряно: следующий запрос допускается сразу
+        await asyncio.wait_for(admission.acquire(), 1)
+        return queued, admission.stats()
+
+    queued, stats = asyncio.run(scenario())
+    assert queued == 0
+    assert stats["in_flight"] == 1 and stats["queued"] == 0
+
+
+def test_cancel_after_grant_returns_slot():
+    async def scenario():
+        admission = AdmissionController(max_in_flight=1)
+        await admission.acquire()
+        waiter = asyncio.create_task(admission.acquire())
+        await settle()
+        # Допуск выдан, но ожидающий отменён раньше, чем успел его получить
+        admission.release()
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        await settle()
+        return admission.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["in_flight"] == 0 and stats["queued"] == 0
+
+
+def test_full_queue_rejects_immediately():
+    async def scenario():
+        admission = AdmissionController(max_in_flight=1, max_queue=1)
+        await admission.acquire()
+        waiter = asyncio.create_task(admission.acquire())
+        await settle()
+        with pytest.raises(AdmissionRejectedError):
+            await admission.acquire()
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        return admission.stats()
+
+    assert asyncio.run(scenario())["rejected"] == 1
+
+
+def test_slot_timeout_raises_and_dequeues():
+    async def scenario():
+        admission = AdmissionController(max_in_flight=1)
+        await admission.acquire()
+        with pytest.raises(AdmissionTimeoutError):
+            async with admission.slot(PRIORITY_RECOMMENDATION, timeout=0.05):
+                pass
+        return admission.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["in_flight"] == 1 and stats["queued"] == 0
+
+
+def test_throttle_pauses_admission():
+    async def scenario():
+        admission = AdmissionController(max_in_flight=4, throttle_pause=0.2)
+        admission.throttle()
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await admission.acquire()
+        return loop.time() - started
+
+    assert asyncio.run(scenario()) >= 0.15
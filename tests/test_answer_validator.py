@@ -0,0 +1,98 @@
+import pytest
+
+from services.answer_validator import ACCEPT, ESCALATE, REJECT, AnswerValidator, QUESTION_RULES
+
+# (блок, номер вопроса, ответ, ожидаемое решение правил)
+CASES = [
+    # context: должность и сфера
+    ("context", 0, "Data Scientist в банке, занимаюсь кредитным скорингом", ACCEPT),
+    ("context", 0, "Работаю бэкенд-разработчиком в финтехе", ACCEPT),
+    ("context", 0, "ок", REJECT),
+    ("context", 0, "не знаю", REJECT),
+    ("context", 0, "пртвлдж кнм", REJECT),
+    ("context", 0, "фывапролдж", ESCALATE),
+    # context: опыт в годах
+    ("context", 1, "5 лет, из них 2 года в ML", ACCEPT),
+    ("context", 1, "3", ACCEPT),
+    ("context", 1, "полгода", ACCEPT),
+    ("context", 1, "нет опыта", ACCEPT),
+    ("context", 1, "не помню", REJECT),
+    # context: значимые проекты
+    ("context", 2, "Разработал систему рекомендаций товаров для интернет-магазина", ACCEPT),
+    ("context", 2, "Внедрил пайплайн обучения моделей на Airflow", ACCEPT),
+    ("context", 2, "ничего", REJECT),
+    ("context", 2, "хз", REJECT),
+    # education: образование
+    ("education", 0, "МФТИ, прикладная математика и физика, магистратура", ACCEPT),
+    ("education", 0, "Окончил университет по специальности информатика", ACCEPT),
+    ("education", 0, "МФТИ", ESCALATE),
+    ("education", 0, "ВШЭ", ESCALATE),
+    ("education", 0, "нет", REJECT),
+    # education: профессиональные навыки
+    ("education", 1, "Машинное обучение, статистика, SQL и визуализация данных", ACCEPT),
+    ("education", 1, "Python, анализ данных", ACCEPT),
+    ("education", 1, "ML, NLP, CV", ESCALATE),
+    ("education", 1, "пропустить", REJECT),
+    # education: личные качества
+    ("education", 2, "Ответственность, любознательность и умение работать в команде", ACCEPT),
+    ("education", 2, "Усидчивость и внимательность к деталям", ACCEPT),
+    ("education", 2, "ааааааа", REJECT),
+    # education: языки и инструменты — перечни аббревиатур не отклоняются
+    ("education", 3, "Python, SQL, Docker, Airflow", ACCEPT),
+    ("education", 3, "python", ACCEPT),
+    ("education", 3, "C++", ACCEPT),
+    ("education", 3, "SQL, ML, NLP, CV", ESCALATE),
+    ("education", 3, "BI, SQL, DWH", ESCALATE),
+    ("education", 3, "PHP, JS, CSS", ESCALATE),
+    ("education", 3, "ничего не использую", REJECT),
+    ("education", 3, "ккккк", REJECT),
+    # goals: желаемая должность
+    ("goals", 0, "Хочу стать Senior ML Engineer или тимлидом команды", ACCEPT),
+    ("goals", 0, "Вырасти до руководителя отдела аналитики", ACCEPT),
+    ("goals", 0, "не знаю", REJECT),
+    # goals: формат работы
+    ("goals", 1, "удалёнка", ACCEPT),
+    ("goals", 1, "гибрид", ACCEPT),
+    ("goals", 1, "офис", ACCEPT),
+    ("goals", 1, "без разницы", ACCEPT),
+    ("goals", 1, "а", REJECT),
+    # goals: доход
+    ("goals", 2, "от 300 тыс. рублей", ACCEPT),
+    ("goals", 2, "250к", ACCEPT),
+    ("goals", 2, "$5000", ACCEPT),
+    ("goals", 2, "не скажу", REJECT),
+    # goals: что важно при выборе работы
+    ("goals", 3, "Интересные задачи и рост", ACCEPT),
+    ("goals", 3, "стабильность", ACCEPT),
+    ("goals", 3, "деньги", ACCEPT),
+    ("goals", 3, "не знаю, наверное рост", ESCALATE),
+    ("goals", 3, "skip", REJECT),
+]
+
+
+@pytest.fixture
+def validator():
+    return AnswerValidator()
+
+
+def test_cases_cover_every_question():
+    assert {(block, index) for block, index, _, _ in CASES} == set(QUESTION_RULES)
+
+
+@pytest.mark.parametrize("block, index, answer, expected", CASES)
+def test_rule_decision(validator, block, index, answer, expected):
+    assert validator.rule_decision(block, index, answer) == expected
+
+
+def test_classifier_decides_escalated_answers(validator):
+    records = [
+        {"block": "goals", "index": 0, "answer": f"Хочу расти в сторону {role}", "label": True}
+        for role in ["MLOps", "NLP", "CV", "аналитики данных", "продуктовой аналитики"] * 10
+    ] + [
+        {"block": "goals", "index": 0, "answer": f"посмотрим {word}", "label": False}
+        for word in ["потом", "как-нибудь", "там видно будет", "может быть", "не решил"] * 10
+    ]
+    assert validator.train(records)
+    assert validator.check("goals", 0, "Хочу расти в сторону NLP") == ACCEPT
+    assert validator.check("goals", 0, "посмотрим потом") == REJECT
+    assert validator.stats()["goals:0"]["skip_rate"] == 1.0
@@ -0,0 +1,176 @@
+import asyncio
+import json
+import os
+
+import httpx
+import polars as pl
+import pytest
+
+# Настройки читаются при импорте config; реальные ключи тестам не нужны
+TEST_ENV = {
+    "API_TOKEN": "test",
+    "MODEL_URL": "http://llm.test",
+    "MODEL_NAME": "model",
+    "FOLDER_ID": "folder",
+    "MODEL_TEMP": "0.1",
+}
+for name, value in TEST_ENV.items():
+    os.environ.setdefault(name, value)
+
+from api import server  # noqa: E402
+from backend.worker_pool import RetrievalBusyError  # noqa: E402
+from services.model_api import CircuitBreaker, CircuitOpenError  # noqa: E402
+
+RECOMMENDATION = {
+    "title": "ML Engineer",
+    "company": "Компания",
+    "experience": "3–6 лет",
+    "salary": None,
+    "skills": ["Python", "SQL"],
+    "requirements": "Опыт обучения моделей",
+    "similarity_score": 0.9,
+}
+GOALS = "Сейчас я Data Scientist, через 2 года хочу стать Senior ML Engineer"
+
+
+def request(method, path, **kwargs):
+    async def scenario():
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://api.test") as client:
+            return await client.request(method, path, **kwargs)
+    return asyncio.run(scenario())
+
+
+@pytest.fixture
+def retrieval(monkeypatch):
+    """Подменяет поиск в пуле; результат и задержку задаёт тест"""
+    calls = {"result": ([RECOMMENDATION], ["MLOps"], ["ML Engineer"]), "delay": 0, "error": None}
+
+    async def recommend_vacancies(user_text, **kwargs):
+        await asyncio.sleep(calls["delay"])
+        if calls["error"] is not None:
+            raise calls["error"]
+        return calls["result"]
+
+    monkeypatch.setattr(server.retrieval_pool, "recommend_vacancies", recommend_vacancies)
+    monkeypatch.setattr(server, "llm_breaker", CircuitBreaker())
+    return calls
+
+
+class FakeDenseEngine:
+    def __init__(self, error=None):
+        self.error = error
+
+    async def search_async(self, query, top_n=10, filters=None):
+        if self.error is not None:
+            raise self.error
+        return pl.DataFrame([{"vacancy_id": "1", "name": "ML Engineer"}])
+
+
+def test_health():
+    response = request("GET", "/health")
+    assert response.status_code == 200 and response.json() == {"status": "ok"}
+
+
+def test_ready_depends_on_retrieval_and_breaker(monkeypatch):
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=60)
+    monkeypatch.setattr(server, "llm_breaker", breaker)
+    monkeypatch.setitem(server.state, "retrieval", False)
+    assert request("GET", "/ready").status_code == 503
+
+    monkeypatch.setitem(server.state, "retrieval", True)
+    assert request("GET", "/ready").status_code == 200
+
+    breaker.record_failure()
+    response = request("GET", "/ready")
+    assert response.status_code == 503 and response.json()["llm"] == "open"
+
+
+def test_recommend_without_llm(retrieval):
+    response = request("POST", "/recommend", json={"career_goals": GOALS, "with_llm": False})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["recommendations"] == [RECOMMENDATION]
+    assert body["recommendation"] is None
+
+
+def test_recommend_parses_llm_json(retrieval, monkeypatch):
+    async def get_completion(*args, **kwargs):
+        return 'Ответ: {"response": "Развивайте MLOps"}'
+
+    monkeypatch.setattr(server, "get_completion", get_completion)
+    response = request("POST", "/recommend", json={"career_goals": GOALS})
+    assert response.status_code == 200
+    assert response.json()["recommendation"] == {"response": "Развивайте MLOps"}
+
+
+def test_invalid_request_body_is_rejected(retrieval):
+    assert request("POST", "/recommend", json={"career_goals": ""}).status_code == 422
+
+
+def test_busy_pool_maps_to_503(retrieval):
+    retrieval["error"] = RetrievalBusyError("Пул поиска занят")
+    response = request("POST", "/recommend", json={"career_goals": GOALS})
+    assert response.status_code == 503
+    assert "занят" in response.json()["detail"]
+
+
+def test_open_breaker_maps_to_503(retrieval, monkeypatch):
+    async def get_completion(*args, **kwargs):
+        raise CircuitOpenError("LLM API временно недоступен")
+
+    monkeypatch.setattr(server, "get_completion", get_completion)
+    assert request("POST", "/recommend", json={"career_goals": GOALS}).status_code == 503
+
+
+def test_slow_request_maps_to_504(retrieval, monkeypatch):
+    monkeypatch.setattr(server.config, "API_REQUEST_TIMEOUT", 0.05)
+    retrieval["delay"] = 1
+    assert request("POST", "/recommend", json={"career_goals": GOALS, "with_llm": False}).status_code == 504
+
+
+def test_batch_reports_errors_per_item(retrieval, monkeypatch):
+    async def recommend_vacancies(user_text, **kwargs):
+        if user_text == "занято":
+            raise RetrievalBusyError("Пул поиска занят")
+        return retrieval["result"]
+
+    monkeypatch.setattr(server.retrieval_pool, "recommend_vacancies", recommend_vacancies)
+    items = [{"career_goals": GOALS, "with_llm": False}, {"career_goals": "занято", "with_llm": False}]
+    response = request("POST", "/recommend/batch", json={"items": items})
+    assert response.status_code == 200
+    lines = {line["index"]: line for line in map(json.loads, response.text.splitlines())}
+    assert lines[0]["result"]["recommendations"] == [RECOMMENDATION]
+    assert lines[1]["status"] == 503
+
+
+def test_batch_over_limit_maps_to_413(retrieval, monkeypatch):
+    monkeypatch.setattr(server.config, "API_MAX_BATCH", 1)
+    items = [{"career_goals": GOALS}] * 2
+    assert request("POST", "/recommend/batch", json={"items": items}).status_code == 413
+
+
+def test_dense_search_without_index_maps_to_503(monkeypatch):
+    monkeypatch.setitem(server.state, "dense", None)
+    monkeypatch.setitem(server.state, "dense_error", None)
+    assert request("POST", "/search/dense", json={"query": "ML"}).status_code == 503
+
+
+def test_dense_search_returns_results(monkeypatch):
+    monkeypatch.setitem(server.state, "dense", FakeDenseEngine())
+    response = request("POST", "/search/dense", json={"query": "ML", "top_n": 1})
+    assert response.status_code == 200
+    assert response.json()["results"] == [{"vacancy_id": "1", "name": "ML Engineer"}]
+
+
+def test_invalid_dense_profile_maps_to_400(monkeypatch):
+    monkeypatch.setitem(server.state, "dense", FakeDenseEngine())
+    query = {"requirement_responsibility": "Python, ML", "experience": "космонавт"}
+    response = request("POST", "/search/dense", json={"query": query})
+    assert response.status_code == 400
+    assert [error["loc"] for error in response.json()["detail"]] == [["experience"]]
+
+
+def test_engine_value_error_maps_to_400(monkeypatch):
+    monkeypatch.setitem(server.state, "dense", FakeDenseEngine(ValueError("Сначала необходимо обучить модель")))
+    assert request("POST", "/search/dense", json={"query": "ML"}).status_code == 400
@@ -0,0 +1,40 @@
+import json
+import random
+
+import pytest
+
+from scripts.bench_clean_response import PATHOLOGICAL, random_reply
+from services.model_api import clean_yandex_hallucination
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_fuzz_replies(seed):
+    rng = random.Random(seed)
+    for _ in range(400):
+        reply, expected = random_reply(rng)
+        assert json.loads(clean_yandex_hallucination(reply)) == expected, reply
+
+
+@pytest.mark.parametrize("reply, expected", [
+    # Валидный объект с ответом внутри невалидного внешнего
+    ('{ответ: {"response": "ok"} }', '{"response": "ok"}'),
+    ('{"meta": oops, "data": {"response": "ok"}}', '{"response": "ok"}'),
+    ('{{"response": "ok"}', '{"response": "ok"}'),
+    ("{x {x {\"current_block\": \"goals\"} } }", '{"current_block": "goals"}'),
+    # Объект с ответом предпочитается первому валидному
+    ('{"a": 1} и {"response": "ok"}', '{"response": "ok"}'),
+    ('{"a": 1} и {не json}', '{"a": 1}'),
+    # Внутри валидного объекта вложенные не выбираются
+    ('{"response": "ok", "recommendation": {"response": "вложенный"}}',
+     '{"response": "ok", "recommendation": {"response": "вложенный"}}'),
+    ('```json\n{"response": "ok"}\n```', '{"response": "ok"}'),
+    ('{"response": "ok"}\n\nПользователь: {"response": "лишнее"}', '{"response": "ok"}'),
+    ("просто текст", "просто текст"),
+])
+def test_finds_answer_object(reply, expected):
+    assert clean_yandex_hallucination(reply) == expected
+
+
+@pytest.mark.parametrize("name", sorted(PATHOLOGICAL))
+def test_pathological_inputs(name):
+    clean_yandex_hallucination(PATHOLOGICAL[name](20_000))
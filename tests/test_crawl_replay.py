@@ -0,0 +1,39 @@
+import pytest
+
+from crawl_fixtures import QUERIES, make_archive, unique_ids
+from async_crawler import AsyncVacancyCrawler
+from http_fixtures import ReplayServer
+from vacancy_parser import Vacancy_parser
+
+
+def run_sync(url, tmp_path):
+    parser = Vacancy_parser(hh_api_token="", path=str(tmp_path / "sync.parquet"), base_url=url, query_pause=(0, 0))
+    return parser.parse_vacancies_incremental(queries=list(QUERIES))
+
+
+def run_async(url, tmp_path):
+    crawler = AsyncVacancyCrawler(
+        hh_api_token="", path=str(tmp_path / "async.parquet"), base_url=url, rate=1000, burst=10, backoff_base=0.01,
+    )
+    return crawler.run(list(QUERIES))
+
+
+@pytest.mark.parametrize("run", [run_sync, run_async], ids=["sync", "async"])
+def test_replay_run_has_no_misses(run, tmp_path):
+    with ReplayServer(make_archive()) as server:
+        df = run(server.url, tmp_path)
+    assert server.stats()["misses"] == 0
+    assert server.stats()["errors"] == 0
+    assert set(df["vacancy_id"].cast(int).to_list()) == unique_ids()
+
+
+def test_async_crawler_fetches_each_url_once_and_retries_429(tmp_path):
+    with ReplayServer(make_archive(), error_status=429, fail_first=3) as server:
+        df = run_async(server.url, tmp_path)
+    stats = server.stats()
+    assert stats["errors"] == 3
+    assert stats["misses"] == 0
+    assert set(df["vacancy_id"].cast(int).to_list()) == unique_ids()
+    # Пересекающиеся вакансии и общие работодатели запрашиваются один раз
+    assert server.served and max(server.served.values()) == 1
+    assert stats["requests"] == sum(server.served.values()) + stats["errors"]
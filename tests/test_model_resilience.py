@@ -0,0 +1,188 @@
+import asyncio
+import json
+import time
+
+import pytest
+
+from services.model_api import (
+    AdmissionController,
+    AdmissionTimeoutError,
+    CircuitBreaker,
+    CircuitOpenError,
+    HedgePolicy,
+    ModelAPIError,
+    get_completion,
+    stream_completion,
+)
+
+MESSAGES = [{"role": "user", "text": "Привет"}]
+
+
+def completion_body(text):
+    return json.dumps({"result": {"alternatives": [{"message": {"text": text}}]}})
+
+
+class FakeClient:
+    """Отвечает по очереди из responses: (задержка, статус, текст)"""
+
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    async def post(self, url, payload, headers):
+        delay, status, text = self.responses[min(self.calls, len(self.responses) - 1)]
+        self.calls += 1
+        await asyncio.sleep(delay)
+        return status, text
+
+
+def call(client, **kwargs):
+    return asyncio.run(get_completion("http://llm", "token", MESSAGES, "model", client=client, **kwargs))
+
+
+# Размыкатель цепи
+
+def test_breaker_opens_after_threshold_and_rejects():
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=60)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_breaker_single_probe_after_recovery_timeout():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.state == "half_open"
+    assert breaker.before_call() is True
+    # Пока проба не завершилась, остальные запросы отклоняются
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.before_call() is False
+
+
+def test_breaker_failed_probe_reopens_and_abandoned_probe_is_retried():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.before_call() is True
+    breaker.abandon()
+    assert breaker.before_call() is True
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.stats()["opened"] == 2
+
+
+def test_failures_through_get_completion_open_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, recovery_timeout=60)
+    client = FakeClient([(0, 500, "error")])
+    with pytest.raises(ModelAPIError):
+        call(client, breaker=breaker, budget=0.5)
+    with pytest.raises(CircuitOpenError):
+        call(client, breaker=breaker)
+    assert client.calls == 1
+
+
+# Бюджет времени
+
+def test_budget_bounds_slow_request_and_retries():
+    client = FakeClient([(5, 200, completion_body("поздно"))])
+    started = time.monotonic()
+    with pytest.raises(asyncio.TimeoutError):
+        call(client, budget=0.3)
+    assert time.monotonic() - started < 1.0
+    assert client.calls == 1
+
+
+def test_budget_spent_in_admission_queue_is_not_an_api_failure():
+    async def scenario():
+        admission = AdmissionController(max_in_flight=1)
+        await admission.acquire()
+        breaker = CircuitBreaker(failure_threshold=1)
+        client = FakeClient([(0, 200, completion_body("ok"))])
+        with pytest.raises(AdmissionTimeoutError):
+            await get_completion(
+                "http://llm", "token", MESSAGES, "model",
+                client=client, admission=admission, budget=0.1, breaker=breaker,
+            )
+        return client.calls, breaker.state, admission.stats()
+
+    calls, state, stats = asyncio.run(scenario())
+    assert calls == 0
+    assert state == "closed"
+    assert stats["in_flight"] == 1 and stats["queued"] == 0
+
+
+# Дублирующие запросы
+
+def test_hedge_waits_for_samples():
+    hedge = HedgePolicy(min_samples=3, min_delay=0.01)
+    assert hedge.delay() is None
+    for seconds in (0.01, 0.02, 0.03):
+        hedge.observe(seconds)
+    assert hedge.delay() == pytest.approx(0.03)
+
+
+def test_slow_attempt_is_hedged_and_fast_duplicate_wins():
+    hedge = HedgePolicy(min_samples=1, min_delay=0.05)
+    hedge.observe(0.01)
+    client = FakeClient([(2, 200, completion_body("медленно")), (0, 200, completion_body("быстро"))])
+    started = time.monotonic()
+    assert call(client, hedge=hedge) == "быстро"
+    assert time.monotonic() - started < 1.0
+    assert (hedge.hedged, hedge.hedge_wins) == (1, 1)
+
+
+def test_fast_attempt_is_not_hedged():
+    hedge = HedgePolicy(min_samples=1, min_delay=0.5)
+    hedge.observe(0.01)
+    client = FakeClient([(0, 200, completion_body("ok"))])
+    assert call(client, hedge=hedge) == "ok"
+    assert client.calls == 1 and hedge.hedged == 0
+
+
+# Потоковый ответ
+
+class FakeStreamClient:
+    def __init__(self, chunks, error=None):
+        self.chunks = chunks
+        self.error = error
+        self.sent = 0
+        self.closed = False
+
+    async def stream(self, url, payload, headers):
+        try:
+            for text in self.chunks:
+                self.sent += 1
+                yield completion_body(text)
+            if self.error is not None:
+                raise self.error
+        finally:
+            self.closed = True
+
+
+def collect_stream(client, **kwargs):
+    async def scenario():
+        stream = stream_completion("http://llm", "token", MESSAGES, "model", client=client, **kwargs)
+        return [text async for text in stream]
+    return asyncio.run(scenario())
+
+
+def test_stream_cut_marker_closes_upstream():
+    client = FakeStreamClient(["Ответ", "Ответ\n\nПользователь: ещё", "Ответ\n\nПользователь: ещё вопрос"])
+    assert collect_stream(client) == ["Ответ"]
+    assert client.closed and client.sent == 2
+
+
+def test_stream_timeout_counts_as_failure():
+    breaker = CircuitBreaker(failure_threshold=1)
+    client = FakeStreamClient([], error=asyncio.TimeoutError())
+    with pytest.raises(asyncio.TimeoutError):
+        collect_stream(client, breaker=breaker)
+    assert breaker.state == "open"
@@ -0,0 +1,87 @@
+from services.prompt_builder import PromptBuilder, estimate_tokens, system_prompt
+
+PROFILE = {"current_position": "Data Scientist", "experience_years": "3", "skills": []}
+GOALS = "Сейчас я работаю: Data Scientist, через 1-3 года я бы хотел быть: Senior ML Engineer"
+
+
+def recommendation(i):
+    return {
+        "title": f"ML Engineer {i}",
+        "company": f"Компания {i}",
+        "experience": "3–6 лет",
+        "salary": None,
+        "skills": ["Python", "PyTorch", "python", "SQL", "Docker"],
+        "requirements": "Опыт обучения и вывода моделей в продакшн, знание Python и SQL. " * 5,
+        "similarity_score": i / 10,
+    }
+
+
+RECOMMENDATIONS = [recommendation(i) for i in range(1, 11)]
+SKILLS = [f"навык {i}" for i in range(15)]
+PATHS = [f"Путь {i} → Senior ML Engineer" for i in range(5)]
+
+
+def build(budget):
+    return PromptBuilder(token_budget=budget).build(PROFILE, GOALS, RECOMMENDATIONS, SKILLS, PATHS)
+
+
+def user_message(messages):
+    return messages[1]["content"]
+
+
+def test_fits_budget_without_dropping():
+    messages, stats = build(100_000)
+    assert stats["positions"] == 10 and stats["dropped_positions"] == 0 and stats["with_example"]
+    assert stats["tokens"] == estimate_tokens(messages[0]["content"]) + estimate_tokens(user_message(messages))
+    # Навыки вакансии без повторов с учётом регистра, пустые поля не отправляются
+    assert '"key_skills":["Python","PyTorch","SQL","Docker"]' in user_message(messages)
+    assert '"salary"' not in user_message(messages)
+
+
+def test_drops_least_relevant_positions_first():
+    full_tokens = build(100_000)[1]["tokens"]
+    messages, stats = build(full_tokens - 1)
+    assert 1 <= stats["positions"] < 10
+    assert stats["dropped_positions"] == 10 - stats["positions"]
+    # Остаются самые релевантные вакансии, навыки и пути не тронуты
+    assert "ML Engineer 10" in user_message(messages)
+    assert '"title":"ML Engineer 1",' not in user_message(messages)
+    assert all(skill in user_message(messages) for skill in SKILLS)
+    assert all(path in user_message(messages) for path in PATHS)
+    assert stats["tokens"] <= full_tokens - 1
+
+
+def drop_order(budgets):
+    """Что оставалось в промпте при каждом бюджете: (вакансии, навыки, пути, пример)"""
+    rows = []
+    for budget in budgets:
+        messages, stats = build(budget)
+        text = user_message(messages)
+        rows.append((
+            stats["positions"],
+            sum(skill in text for skill in SKILLS),
+            sum(path in text for path in PATHS),
+            stats["with_example"],
+        ))
+    return rows
+
+
+def test_drop_order_positions_skills_paths_example():
+    full_tokens = build(100_000)[1]["tokens"]
+    rows = drop_order(range(full_tokens, 0, -25))
+    # Каждая следующая часть начинает сокращаться только после предыдущей
+    for positions, skills, paths, with_example in rows:
+        if skills < len(SKILLS):
+            assert positions == 1
+        if paths < len(PATHS):
+            assert skills == 0
+        if not with_example:
+            assert paths == 0
+    assert rows[-1] == (1, 0, 0, False)
+
+
+def test_sends_minimum_when_budget_is_unreachable():
+    messages, stats = build(1)
+    assert stats["positions"] == 1 and not stats["with_example"]
+    assert messages[0]["content"] == system_prompt(False)[0]
+    assert stats["tokens"] > stats["budget"]
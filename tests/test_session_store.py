@@ -0,0 +1,78 @@
+import time
+
+from services.session_store import SessionStore
+
+GREETING = [{"role": "assistant", "content": "Кем вы работаете?"}]
+
+
+def answered(store, session_id, answer):
+    record = store.get_or_create(session_id, GREETING)
+    record.history.append({"role": "user", "content": answer})
+    record.question_index += 1
+    store.save(record)
+    return record
+
+
+def test_new_session_starts_from_copy_of_history():
+    store = SessionStore()
+    record = store.get_or_create("s1", GREETING)
+    record.history.append({"role": "user", "content": "Аналитик"})
+    assert GREETING == [{"role": "assistant", "content": "Кем вы работаете?"}]
+    assert store.get("s1") is None
+    assert store.stats()["created"] == 1
+
+
+def test_lru_evicts_least_recently_used():
+    store = SessionStore(max_sessions=2)
+    for session_id in ("a", "b"):
+        answered(store, session_id, "ответ")
+    store.get("a")
+    answered(store, "c", "ответ")
+    assert store.get("b") is None
+    assert store.get("a") is not None and store.get("c") is not None
+    assert store.stats()["size"] == 2
+
+
+def test_expired_session_is_dropped(tmp_path):
+    for db_path in (None, str(tmp_path / "sessions.sqlite")):
+        store = SessionStore(ttl=0.05, db_path=db_path)
+        answered(store, "s1", "ответ")
+        assert store.get("s1") is not None
+        time.sleep(0.1)
+        assert store.get("s1") is None
+
+
+def test_sqlite_survives_restart(tmp_path):
+    db_path = str(tmp_path / "sessions.sqlite")
+    answered(SessionStore(db_path=db_path), "s1", "Data Scientist")
+
+    restarted = SessionStore(db_path=db_path)
+    record = restarted.get("s1")
+    assert record.history[-1] == {"role": "user", "content": "Data Scientist"}
+    assert record.question_index == 1
+    assert restarted.stats()["db_hits"] == 1
+    # Повторное чтение той же версии обслуживается из памяти
+    restarted.get("s1")
+    assert restarted.stats()["hits"] == 1
+
+
+def test_copy_updated_by_other_process_is_reloaded(tmp_path):
+    db_path = str(tmp_path / "sessions.sqlite")
+    first, second = SessionStore(db_path=db_path), SessionStore(db_path=db_path)
+    answered(first, "s1", "первый ответ")
+    assert len(second.get("s1").history) == 2
+
+    answered(first, "s1", "второй ответ")
+    record = second.get("s1")
+    assert record.history[-1]["content"] == "второй ответ"
+    assert record.question_index == 2
+    assert second.stats()["db_hits"] == 2
+
+
+def test_delete_in_other_process_hides_cached_copy(tmp_path):
+    db_path = str(tmp_path / "sessions.sqlite")
+    first, second = SessionStore(db_path=db_path), SessionStore(db_path=db_path)
+    answered(first, "s1", "ответ")
+    assert second.get("s1") is not None
+    first.delete("s1")
+    assert second.get("s1") is None
@@ -0,0 +1,79 @@
+import asyncio
+
+from backend.speculation import SpeculativeRetrieval
+
+
+def test_same_key_reuses_background_result():
+    async def scenario():
+        speculation = SpeculativeRetrieval()
+        calls = []
+
+        async def search(goals):
+            calls.append(goals)
+            return goals
+
+        speculation.launch("s1", "recommend", "ML", lambda: search("ML"))
+        speculation.launch("s1", "recommend", "ML", lambda: search("ML"))
+        result = await speculation.get("s1", "recommend", "ML", lambda: search("ML"))
+        return result, calls, speculation.stats()
+
+    result, calls, stats = asyncio.run(scenario())
+    assert result == "ML" and calls == ["ML"]
+    assert stats["launched"] == 1 and stats["hits"] == 1
+
+
+def test_changed_key_cancels_stale_task():
+    async def scenario():
+        speculation = SpeculativeRetrieval()
+        started = asyncio.Event()
+
+        async def slow(goals):
+            started.set()
+            await asyncio.sleep(10)
+            return goals
+
+        async def fast(goals):
+            return goals
+
+        speculation.launch("s1", "recommend", "ML", lambda: slow("ML"))
+        await started.wait()
+        speculation.launch("s1", "recommend", "NLP", lambda: fast("NLP"))
+        result = await speculation.get("s1", "recommend", "NLP", lambda: fast("NLP"))
+        return result, speculation.stats()
+
+    result, stats = asyncio.run(scenario())
+    assert result == "NLP"
+    assert stats["cancelled"] == 1 and stats["hits"] == 1
+
+
+def test_get_with_other_key_runs_factory():
+    async def scenario():
+        speculation = SpeculativeRetrieval()
+
+        async def search(goals):
+            return goals
+
+        speculation.launch("s1", "recommend", "ML", lambda: search("ML"))
+        result = await speculation.get("s1", "recommend", "NLP", lambda: search("NLP"))
+        return result, speculation.stats()
+
+    result, stats = asyncio.run(scenario())
+    assert result == "NLP"
+    assert stats["misses"] == 1 and stats["hits"] == 0
+
+
+def test_failed_background_task_falls_back_to_factory():
+    async def scenario():
+        speculation = SpeculativeRetrieval()
+
+        async def broken():
+            raise RuntimeError("индекс недоступен")
+
+        async def search():
+            return "ok"
+
+        speculation.launch("s1", "recommend", "ML", broken)
+        return await speculation.get("s1", "recommend", "ML", search), speculation.stats()
+
+    result, stats = asyncio.run(scenario())
+    assert result == "ok" and stats["misses"] == 1
@@ -0,0 +1,111 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from backend import worker_pool
+from backend.worker_pool import RetrievalBusyError, RetrievalPool
+
+
+@pytest.fixture(autouse=True)
+def no_index_preload(monkeypatch):
+    # Индексы RAG в тестах пула не нужны
+    monkeypatch.setattr(worker_pool, "_init_worker", lambda: None)
+
+
+def blocking(event: threading.Event, value=None):
+    event.wait(5)
+    return value
+
+
+async def wait_until(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "условие не выполнилось вовремя"
+        await asyncio.sleep(0.01)
+
+
+def test_full_pool_rejects_after_queue_timeout():
+    async def scenario():
+        pool = RetrievalPool(workers=1, max_pending=2, queue_timeout=0.05)
+        event = threading.Event()
+        running = [asyncio.create_task(pool.run(blocking, event, i)) for i in range(2)]
+        await asyncio.sleep(0.01)
+        with pytest.raises(RetrievalBusyError):
+            await pool.run(blocking, event)
+        event.set()
+        results = await asyncio.gather(*running)
+        pool.shutdown(wait=True)
+        return results, pool.stats()
+
+    results, stats = asyncio.run(scenario())
+    assert results == [0, 1]
+    assert stats["rejected"] == 1 and stats["completed"] == 2 and stats["pending"] == 0
+
+
+def test_cancelled_call_keeps_slot_until_job_finishes():
+    async def scenario():
+        pool = RetrievalPool(workers=1, max_pending=1, queue_timeout=0.05)
+        event = threading.Event()
+        caller = asyncio.create_task(pool.run(blocking, event))
+        await wait_until(lambda: pool.stats()["pending"] == 1)
+        caller.cancel()
+        await asyncio.gather(caller, return_exceptions=True)
+        # Задача ещё выполняется в потоке: место занято, новый вызов отклоняется
+        with pytest.raises(RetrievalBusyError):
+            await pool.run(blocking, event)
+        event.set()
+        await wait_until(lambda: pool.stats()["pending"] == 0)
+        result = await pool.run(blocking, event, "ok")
+        pool.shutdown(wait=True)
+        return result
+
+    assert asyncio.run(scenario()) == "ok"
+
+
+def test_cancelled_queued_job_frees_slot_immediately():
+    async def scenario():
+        pool = RetrievalPool(workers=1, max_pending=2)
+        event = threading.Event()
+        running = asyncio.create_task(pool.run(blocking, event, "first"))
+        await wait_until(lambda: pool.stats()["pending"] == 1)
+        queued = asyncio.create_task(pool.run(blocking, event, "second"))
+        await wait_until(lambda: pool.stats()["pending"] == 2)
+        queued.cancel()
+        await asyncio.gather(queued, return_exceptions=True)
+        # Не начатая задача снята с очереди исполнителя и место вернулось сразу
+        await wait_until(lambda: pool.stats()["pending"] == 1)
+        event.set()
+        result = await running
+        pool.shutdown(wait=True)
+        return result, pool.stats()
+
+    result, stats = asyncio.run(scenario())
+    assert result == "first"
+    assert stats["pending"] == 0 and stats["completed"] == 1
+
+
+def test_concurrency_never_exceeds_max_pending():
+    active = 0
+    peak = 0
+    lock = threading.Lock()
+
+    def job():
+        nonlocal active, peak
+        with lock:
+            active += 1
+            peak = max(peak, active)
+        time.sleep(0.01)
+        with lock:
+            active -= 1
+
+    async def scenario():
+        pool = RetrievalPool(workers=8, max_pending=3)
+        await asyncio.gather(*(pool.run(job) for _ in range(20)))
+        pool.shutdown(wait=True)
+        return pool.stats()
+
+    stats = asyncio.run(scenario())
+    assert peak <= 3
+    assert stats["completed"] == 20 and stats["pending"] == 0
@@ -1,13 +1,27 @@
 import gradio as gr
-import asyncio
-import aiohttp
-import tenacity
 import json
 import re
 
-from services.model_api import wrapped_get_completion
-from backend.rag import recommend_vacancies
-from services.user_profile import process_user_profile_from_history
+from services.model_api import (
+    PRIORITY_RECOMMENDATION,
+    PRIORITY_VALIDATION,
+    AdmissionController,
+    CircuitBreaker,
+    CircuitOpenError,
+    HedgePolicy,
+    ModelAPIClient,
+    ResponseCache,
+    clean_yandex_hallucination,
+    get_completion,
+    stream_completion,
+    wrapped_get_completion,
+)
+from services.answer_validator import ACCEPT, ESCALATE, REJECT, AnswerValidator
+from services.partial_json import PartialJSONParser
+from services.prompt_builder import PromptBuilder
+from services.session_store import SessionStore
+from backend.speculation import SpeculativeRetrieval
+from backend.worker_pool import RetrievalBusyError, RetrievalPool
 
 from config import config
 
@@ -16,7 +30,54 @@ API_TOKEN= config.API_TOKEN
 MODEL_URL = config.MODEL_URL
 MODEL_NAME = f"gpt://{config.FOLDER_ID}/{config.MODEL_NAME}" 
 MODEL_TEMP = config.MODEL_TEMP
-MAX_HISTORY = config.MAX_HISTORY
+
+# Общий клиент LLM: соединения к MODEL_URL переиспользуются между запросами
+llm_client = ModelAPIClient(
+    limit_per_host=config.LLM_CONNECTIONS_PER_HOST,
+    keepalive_timeout=config.LLM_KEEPALIVE_TIMEOUT,
+)
+# Повторные валидации и одинаковые профили не ходят в LLM
+llm_cache = ResponseCache(
+    max_entries=config.LLM_CACHE_SIZE,
+    ttl=config.LLM_CACHE_TTL,
+    disk_path=config.LLM_CACHE_PATH or None,
+)
+# Общие для всех сессий лимиты: рекомендации обслуживаются раньше валидаций
+llm_admission = AdmissionController(
+    max_in_flight=config.LLM_MAX_IN_FLIGHT,
+    rps=config.LLM_RPS,
+    tpm=config.LLM_TPM,
+)
+# При недоступном LLM валидация пропускается, а не висит на повторах
+llm_breaker = CircuitBreaker(
+    failure_threshold=config.LLM_BREAKER_FAILURES,
+    recovery_timeout=config.LLM_BREAKER_RECOVERY,
+)
+validation_hedge = HedgePolicy(quantile=config.LLM_HEDGE_QUANTILE) if config.LLM_HEDGE_QUANTILE > 0 else None
+# Промпт рекомендаций укладывается в бюджет входных токенов
+prompt_builder = PromptBuilder(token_budget=config.PROMPT_TOKEN_BUDGET)
+# Очевидные ответы проверяются локально, в LLM уходят только сомнительные
+answer_validator = AnswerValidator(
+    log_path=config.VALIDATOR_LOG_PATH or None,
+    audit_rate=config.VALIDATOR_AUDIT_RATE,
+    confidence=config.VALIDATOR_CONFIDENCE,
+)
+# Поиск вакансий и разбор профиля выполняются вне event loop UI
+retrieval_pool = RetrievalPool(
+    workers=config.RETRIEVAL_WORKERS,
+    processes=config.RETRIEVAL_PROCESSES,
+    max_pending=config.RETRIEVAL_MAX_PENDING,
+    queue_timeout=config.RETRIEVAL_QUEUE_TIMEOUT,
+)
+# Диалоги по идентификатору сессии Gradio; с SESSION_STORE_PATH переживают перезапуск
+session_store = SessionStore(
+    max_sessions=config.SESSION_STORE_SIZE,
+    ttl=config.SESSION_TTL,
+    db_path=config.SESSION_STORE_PATH or None,
+)
+# Поиск вакансий стартует, как только известны карьерные цели, не дожидаясь конца анкеты
+speculation = SpeculativeRetrieval()
+RECOMMEND_PARAMS = dict(top_k=10, top_career=2, min_skill_freq=2, top_skills=15)
 
 
 QUESTION_BLOCKS = {
@@ -55,26 +116,37 @@ VALIDATION_PROMPT = """Ты — помощник карьерного коуча
 Ответь ТОЛЬКО "Да" или "Нет" без дополнительных пояснений."""
 
 
-async def validate_answer(question: str, answer: str) -> bool:
+async def validate_answer(current_block: str, question_index: int, answer: str) -> bool:
     """Проверяет, подходит ли ответ пользователя к заданному вопросу"""
-    if not answer or len(answer.strip()) < 5:
-        return False
+    decision = answer_validator.check(current_block, question_index, answer)
+    audit = decision != ESCALATE and answer_validator.should_audit()
+    if decision != ESCALATE and not audit:
+        return decision == ACCEPT
+    
+    if llm_breaker.is_open:
+        print("LLM недоступен, ответ принят без проверки")
+        return decision != REJECT
     
+    question = get_current_question(current_block, question_index)
     validation_prompt = VALIDATION_PROMPT.format(question=question, answer=answer)
     messages = [{"role": "system", "content": validation_prompt}]
     
     try:
-        llm_response = await wrapped_get_completion(
-            MODEL_URL, API_TOKEN, messages, MODEL_NAME, 0.3, folder_id=config.FOLDER_ID
+        llm_response = await get_completion(
+            MODEL_URL, API_TOKEN, messages, MODEL_NAME, 0.3, folder_id=config.FOLDER_ID,
+            client=llm_client, cache=llm_cache, admission=llm_admission, priority=PRIORITY_VALIDATION,
+            budget=config.LLM_VALIDATION_BUDGET, breaker=llm_breaker, hedge=validation_hedge,
         )
         
         # Проверяем, содержит ли ответ "Да"
-        return "да" in llm_response.lower().strip()[:10]
+        is_valid = "да" in llm_response.lower().strip()[:10]
+        answer_validator.record(current_block, question_index, answer, decision, is_valid)
+        return is_valid
     
     except Exception as e:
         print(f"Ошибка валидации: {e}")
         # В случае ошибки считаем ответ валидным, чтобы не блокировать пользователя
-        return True
+        return decision != REJECT
 
 
 def get_current_question(current_block: str, question_index: int) -> str:
@@ -105,7 +177,47 @@ def get_next_block_and_question(current_block: str, question_index: int):
     return "recommendation", 0
 
 
-async def chatbot_step(user_input, history, current_block, question_index, waiting_for_answer):
+def get_career_goals(history):
+    """Карьерные цели для поиска вакансий из ответов пользователя, если они уже есть"""
+    user_answers = [msg for msg in history if msg["role"] == "user"]
+    if len(user_answers) < 8:
+        return None
+    return f"Сейчас я работаю: {user_answers[0]['content']}, через 1-3 года я бы хотел быть: {user_answers[7]['content']}"
+
+
+def speculate_retrieval(session_id, history):
+    """
+    Запускает поиск вакансий в фоне, как только известны карьерные цели,
+    пока пользователь отвечает на оставшиеся вопросы.
+
+    Разбор профиля не спекулируется: он зависит от последнего ответа
+    анкеты, поэтому результат фонового разбора ни разу не совпал бы с
+    итоговым.
+
+    Поиск зависит только от career_goals (первое и восьмое сообщения
+    пользователя), а история лишь дописывается, так что после восьмого
+    ответа ключ не меняется. Более поздние ответы (навыки, формат работы,
+    зарплата) попадают в промпт через профиль, а не в поиск. Если поиск
+    начнёт их учитывать, их нужно добавить в ключ: launch с новым ключом
+    отменит устаревшую задачу.
+    """
+    career_goals = get_career_goals(history)
+    if session_id is None or career_goals is None:
+        return
+    speculation.launch(
+        session_id, "recommend", career_goals,
+        lambda: retrieval_pool.recommend_vacancies(career_goals, **RECOMMEND_PARAMS),
+    )
+
+
+async def chatbot_step_stream(user_input, history, current_block, question_index, waiting_for_answer, session_id=None):
+    """
+    Шаг диалога в потоковом режиме.
+
+    Отдаёт кортежи (history, current_block, question_index, waiting_for_answer, response);
+    финальные рекомендации приходят несколькими кортежами по мере генерации.
+    session_id включает фоновый поиск вакансий до окончания анкеты.
+    """
     
     # Если ждем ответ на конкретный вопрос
     if waiting_for_answer:
@@ -113,14 +225,15 @@ async def chatbot_step(user_input, history, current_block, question_index, waiti
         
         if current_question:
             # Валидируем ответ
-            is_valid = await validate_answer(current_question, user_input)
+            is_valid = await validate_answer(current_block, question_index, user_input)
             
             if not is_valid:
                 # Ответ не подходит, просим еще раз
                 response = f"Пожалуйста, ответь более подробно на вопрос: {current_question}"
                 history.append({"role": "user", "content": user_input})
                 history.append({"role": "assistant", "content": response})
-                return history, current_block, question_index, True, response
+                yield history, current_block, question_index, True, response
+                return
             
             # Ответ подходит, сохраняем и переходим дальше
             history.append({"role": "user", "content": user_input})
@@ -137,13 +250,20 @@ async def chatbot_step(user_input, history, current_block, question_index, waiti
                     print(f"{i}. {answer['content']}")
                 print("=" * 60)
 
-                career_goals = f"Сейчас я работаю: {user_answers[0]['content']}, через 1-3 года я бы хотел быть: {user_answers[7]['content']}"
-
-                response = await generate_final_recommendations(history, career_goals)
-                history.append({"role": "assistant", "content": response})
-                return history, next_block, 0, False, response
+                career_goals = get_career_goals(history)
+
+                message = {"role": "assistant", "content": ""}
+                history.append(message)
+                try:
+                    async for response in generate_final_recommendations_stream(history, career_goals, session_id):
+                        message["content"] = response
+                        yield history, next_block, 0, False, response
+                finally:
+                    speculation.drop(session_id)
+                return
             else:
                 # Задаем следующий вопрос
+                speculate_retrieval(session_id, history)
                 next_question = get_current_question(next_block, next_question_index)
                 if next_question:
                     # Добавляем переходную фразу между блоками
@@ -159,213 +279,176 @@ async def chatbot_step(user_input, history, current_block, question_index, waiti
                         response = next_question
                     
                     history.append({"role": "assistant", "content": response})
-                    return history, next_block, next_question_index, True, response
+                    yield history, next_block, next_question_index, True, response
+                    return
     
     # Если не ждем ответ (начальное состояние или ошибка)
     first_question = get_current_question("context", 0)
     if first_question:
         history.append({"role": "assistant", "content": first_question})
-        return history, "context", 0, True, first_question
+        yield history, "context", 0, True, first_question
+        return
     
-    return history, current_block, question_index, waiting_for_answer, "Произошла ошибка. Попробуйте начать заново."
+    yield history, current_block, question_index, waiting_for_answer, "Произошла ошибка. Попробуйте начать заново."
+
+
+async def chatbot_step(user_input, history, current_block, question_index, waiting_for_answer, session_id=None):
+    """Шаг диалога целиком: возвращает последнее состояние chatbot_step_stream"""
+    result = None
+    async for result in chatbot_step_stream(user_input, history, current_block, question_index, waiting_for_answer, session_id):
+        pass
+    return result
 
 
-async def generate_final_recommendations(history, career_goals):
+NO_RECOMMENDATIONS = "К сожалению, не удалось найти подходящие рекомендации. Попробуйте уточнить ваши карьерные цели."
+RETRIEVAL_BUSY = "Сейчас слишком много запросов на подбор вакансий. Попробуйте начать заново через минуту."
+
+
+async def build_final_messages(history, career_goals, session_id=None):
     """
-    Улучшенная генерация финальных рекомендаций
+    Подбирает вакансии и собирает промпт для финальных рекомендаций.
+
+    Если для session_id поиск уже запущен в фоне с теми же данными,
+    используется его результат.
+
+    Returns:
+        Кортеж (messages, expanded_skills, career_paths) или None, если вакансий не нашлось
     """
     
-    # Собираем профиль из истории    
-    user_profile_json, user_profile_text = process_user_profile_from_history(history)
+    # Собираем профиль из истории: нужны все ответы анкеты, история не обрезается
+    user_profile_json, _ = await retrieval_pool.process_user_profile(list(history))
     
-    # Расширяем поисковый запрос контекстом из профиля
-    enhanced_query = f"{career_goals}\n\nДополнительный контекст:\n{user_profile_text}"
-    
-    # Получаем рекомендации на основе расширенного профиля
-    recommendations, expanded_skills, career_paths = recommend_vacancies(
-        career_goals, 
-        top_k=10, 
-        top_career=2,
-        min_skill_freq=2,
-        top_skills=15
+    # Вакансии подбираются по карьерным целям; профиль используется только в промпте
+    recommendations, expanded_skills, career_paths = await speculation.get(
+        session_id, "recommend", career_goals,
+        lambda: retrieval_pool.recommend_vacancies(career_goals, **RECOMMEND_PARAMS),
     )
     
     if not recommendations:
-        return "К сожалению, не удалось найти подходящие рекомендации. Попробуйте уточнить ваши карьерные цели."
+        return None
     
-    # Улучшенный системный промпт
-    # final_system_prompt = (
-    #     "Ты — опытный карьерный коуч, специализирующийся на технических ролях в ML/AI. "
-    #     "Твоя задача — проанализировать КОНКРЕТНЫЕ найденные вакансии и дать подробные (важно!) персональные рекомендации.\n\n"
-        
-    #     "ОБЯЗАТЕЛЬНЫЕ ТРЕБОВАНИЯ:\n"
-    #     "1. Используй ТОЛЬКО вакансии из списка 'found_positions' - не придумывай новые\n"
-    #     "2. Упоминай конкретные компании и позиции по названиям\n"
-    #     "3. Используй навыки из 'skills_to_develop' для планирования развития\n"
-    #     "4. Рассматривай карьерные пути из 'career_paths'\n\n"
-        
-    #     "ПРИМЕРЫ ПРАВИЛЬНЫХ ОТВЕТОВ:\n"
-    #     "✅ 'Рекомендую позицию Senior NLP engineer в Just AI'\n"
-    #     "✅ 'С Вашим опытом Вам подходит позиция ML Engineer в Сбере'\n"
-    #     "❌ 'Рекомендую работу в крупной IT-компании' (слишком общее)\n"
-    #     "❌ 'Советую найти позицию в Google' (компании нет в списке)\n\n"
-        
-    #     "ФОРМАТ ОТВЕТА (строго JSON):\n"
-    #     "{\n"
-    #     "  \"response\": \"Детальный анализ найденных вакансий с конкретными названиями компаний и позиций. Объясни почему именно эти вакансии подходят по целям пользователя. Обязательно упомяни релевантность.\",\n"
-    #     "  \"recommendation\": {\n"
-    #     "    \"nearest_position\": \"ТОЧНОЕ название позиции из found_positions с указанием компании\",\n"
-    #     "    \"nearest_position_reason\": \"Почему именно эта позиция (компания + роль) наиболее подходящая сейчас, укажи релевантность\",\n"
-    #     "    \"recommended_position\": \"Целевая позиция из found_positions для роста\",\n"
-    #     "    \"recommended_position_reason\": \"Обоснование выбора с учетом карьерных целей\",\n"
-    #     "    \"skills_gap\": \"Навыки из skills_to_develop, которые нужно развить для этих позиций\",\n"
-    #     "    \"plan_1_2_years\": \"План развития на основе найденных требований из requirements, вакансий и навыков\",\n"
-    #     "    \"recommended_courses\": [\"Курсы для развития навыков из skills_to_develop\"],\n"
-    #     "    \"current_vacancies\": [\"Топ-3 самые подходящие вакансии с компаниями из found_positions\"]\n"
-    #     "  }\n"
-    #     "}\n\n"
-        
-    #     "КРИТИЧЕСКИ ВАЖНО: Не создавай новые вакансии - работай только с предоставленными данными!"
-    # )
-    final_system_prompt = (
-        "Ты — опытный карьерный коуч, специализирующийся на технических ролях в ML/AI. "
-        "Твоя задача — проанализировать КОНКРЕТНЫЕ найденные вакансии и дать подробные персональные рекомендации.\n\n"
-        
-        "ОБЯЗАТЕЛЬНЫЕ ПРАВИЛА:\n"
-        "1. Используй ТОЛЬКО вакансии из списка 'found_positions' — не придумывай новые.\n"
-        "2. Упоминай конкретные компании и позиции по названиям.\n"
-        "3. Используй навыки из 'skills_to_develop' и требования из 'requirements' для плана развития.\n"
-        "4. Рассматривай карьерные пути из 'career_paths'.\n"
-        "5. Отвечай СТРОГО в формате JSON без лишнего текста.\n\n"
-        
-        "ПРИМЕР (few-shot):\n"
-        "Входные данные:\n"
-        "{\n"
-        "  \"found_positions\": [\n"
-        "    {\"title\": \"ML Engineer\", \"company\": \"Сбер\"},\n"
-        "    {\"title\": \"Senior NLP Engineer\", \"company\": \"Just AI\"},\n"
-        "    {\"title\": \"Data Scientist\", \"company\": \"Яндекс\"}\n"
-        "  ],\n"
-        "  \"skills_to_develop\": [\"NLP\", \"Deep Learning\"],\n"
-        "  \"career_paths\": [\"ML Engineer → Senior ML Engineer\"]\n"
-        "}\n\n"
-        
-        "Ожидаемый ответ:\n"
-        "{\n"
-        "  \"response\": \"С учётом вашего опыта оптимально начать с роли ML Engineer в Сбере — там требования совпадают с вашим профилем. "
-        "Senior NLP Engineer в Just AI можно рассматривать как следующую цель, так как у вас есть базовые навыки NLP. "
-        "Data Scientist в Яндексе также подходит, но менее релевантен.\",\n"
-        "  \"recommendation\": {\n"
-        "    \"nearest_position\": \"ML Engineer в Сбер\",\n"
-        "    \"nearest_position_reason\": \"Эта роль наиболее близка к текущим навыкам, требования совпадают.\",\n"
-        "    \"recommended_position\": \"Senior NLP Engineer в Just AI\",\n"
-        "    \"recommended_position_reason\": \"Подходит для следующего карьерного шага, есть перспектива роста в NLP.\",\n"
-        "    \"skills_gap\": \"Необходимо подтянуть NLP и Deep Learning.\",\n"
-        "    \"plan_1_2_years\": \"В течение года укрепить экспертизу в NLP, через 2 года выйти на уровень Senior.\",\n"
-        "    \"recommended_courses\": [\"Курс по NLP\", \"Advanced Deep Learning\"],\n"
-        "    \"current_vacancies\": [\n"
-        "      \"ML Engineer в Сбер\",\n"
-        "      \"Senior NLP Engineer в Just AI\",\n"
-        "      \"Data Scientist в Яндекс\"\n"
-        "    ]\n"
-        "  }\n"
-        "}\n\n"
-        
-        # "КРИТИЧЕСКИ ВАЖНО: верни ответ ТОЛЬКО в JSON-формате как в примере выше. "
-        # "Любой текст вне JSON — ошибка."
-        "КРИТИЧЕСКИ ВАЖНО: Ответь строго JSON. Никакого текста вне JSON. Если нужно пояснение — включи его в поле response. Любой другой формат считается ошибкой»"
+    messages, stats = prompt_builder.build(
+        user_profile_json, career_goals, recommendations, expanded_skills, career_paths
     )
+    print(f"[PROMPT] {stats}")
 
+    return messages, expanded_skills, career_paths
 
-    # Подготовка данных для модели
-    payload = {
-        "user_profile": user_profile_json,
-        "user_goals": career_goals,
-        "found_positions": [
-            {
-                "title": rec["title"],
-                "company": rec["company"],
-                "experience": rec["experience"],
-                "salary": rec["salary"],
-                "key_skills": rec["skills"][6:], 
-                "requirements": rec["requirements"],
-                "relevance_score": rec["similarity_score"]
-            }
-            for rec in recommendations[5:] 
-        ],
-        "skills_to_develop": expanded_skills,
-        "career_paths": career_paths[:5],  # Топ-5 карьерных путей
-    }
-
-    user_message = f"""
-АНАЛИЗИРУЙ СЛЕДУЮЩИЕ ДАННЫЕ И ДАЙ РЕКОМЕНДАЦИИ:
-
-=== МОЙ ПРОФИЛЬ ===
-{user_profile_json}
-
-=== МОИ КАРЬЕРНЫЕ ЦЕЛИ ===
-{career_goals}
-
-=== НАЙДЕННЫЕ ДЛЯ МЕНЯ ВАКАНСИИ (ОБЯЗАТЕЛЬНО используй эти конкретные позиции) ===
-{json.dumps(payload["found_positions"], ensure_ascii=False, indent=2)}
-
-=== НАВЫКИ ДЛЯ РАЗВИТИЯ ===
-{json.dumps(expanded_skills[:15], ensure_ascii=False)}
-
-=== ВОЗМОЖНЫЕ КАРЬЕРНЫЕ ПУТИ ===
-{json.dumps(career_paths[:8], ensure_ascii=False)}
-"""
-# ПРИМЕР ПРАВИЛЬНОГО ОТВЕТА:
-# "Рекомендую позицию 'Senior NLP engineer' в компании 'Just AI' как наиболее подходящую..."
-
-# ЗАДАЧА: Проанализируй ЭТИ КОНКРЕТНЫЕ вакансии и выбери лучшие для пользователя. Упоминай названия компаний!
-
-    messages = [
-        {"role": "system", "content": final_system_prompt},
-        {"role": "user", "content": user_message},
-    ]
+
+def render_final_response(llm_response, expanded_skills, career_paths) -> str:
+    """Превращает ответ LLM с рекомендациями в текст для чата"""
+    # Улучшенное извлечение JSON
+    json_match = re.search(r'\{[\s\S]*\}', llm_response)
+    if json_match:
+        try:
+            result = json.loads(json_match.group(0))
+            
+            # Валидация результата
+            if "response" in result and "recommendation" in result:
+                # res = result.get("response", "Рекомендации сформированы успешно!")
+                # res += "\nНАВЫКИ ДЛЯ РАЗВИТИЯ:\n"
+                # res += json.dumps(expanded_skills[:5], ensure_ascii=False)
+                # res += "ВОЗМОЖНЫЕ КАРЬЕРНЫЕ ПУТИ:\n"
+                # res += json.dumps(career_paths[:3], ensure_ascii=False)
+                res = parse_llm_response(result)
+                return res
+                # return result.get("response", "Рекомендации сформированы успешно!")
+            else:
+                print(f"[ERROR] Неполный JSON ответ: {result}")
+                
+        except json.JSONDecodeError as e:
+            print(f"[ERROR] Ошибка парсинга JSON: {e}")
+            print(f"[ERROR] Ответ LLM: {llm_response}")
+    
+    # Если JSON не извлечен, возвращаем как есть
+    res = llm_response
+    res += "\n\nНАВЫКИ ДЛЯ РАЗВИТИЯ:\n"
+    res += json.dumps(expanded_skills[:5], ensure_ascii=False)
+    res += "\n\nВОЗМОЖНЫЕ КАРЬЕРНЫЕ ПУТИ:\n"
+    res += json.dumps(career_paths[:3], ensure_ascii=False)
+    return llm_response
+
+
+async def generate_final_recommendations(history, career_goals, session_id=None):
+    """
+    Улучшенная генерация финальных рекомендаций
+    """
+    try:
+        prepared = await build_final_messages(history, career_goals, session_id)
+    except RetrievalBusyError as e:
+        print(f"[ERROR] {e}")
+        return RETRIEVAL_BUSY
+    if prepared is None:
+        return NO_RECOMMENDATIONS
+    messages, expanded_skills, career_paths = prepared
 
     try:
         llm_response = await wrapped_get_completion(
-            MODEL_URL, API_TOKEN, messages, MODEL_NAME, MODEL_TEMP, folder_id=config.FOLDER_ID
+            MODEL_URL, API_TOKEN, messages, MODEL_NAME, MODEL_TEMP, folder_id=config.FOLDER_ID,
+            client=llm_client, cache=llm_cache, admission=llm_admission, priority=PRIORITY_RECOMMENDATION,
+            budget=config.LLM_RECOMMENDATION_BUDGET, breaker=llm_breaker,
         )
         print(f"[LLM reponse]: {llm_response}")
-        # Улучшенное извлечение JSON
-        json_match = re.search(r'\{[\s\S]*\}', llm_response)
-        if json_match:
-            try:
-                result = json.loads(json_match.group(0))
-                
-                # Валидация результата
-                if "response" in result and "recommendation" in result:
-                    # res = result.get("response", "Рекомендации сформированы успешно!")
-                    # res += "\nНАВЫКИ ДЛЯ РАЗВИТИЯ:\n"
-                    # res += json.dumps(expanded_skills[:5], ensure_ascii=False)
-                    # res += "ВОЗМОЖНЫЕ КАРЬЕРНЫЕ ПУТИ:\n"
-                    # res += json.dumps(career_paths[:3], ensure_ascii=False)
-                    res = parse_llm_response(result)
-                    return res
-                    # return result.get("response", "Рекомендации сформированы успешно!")
-                else:
-                    print(f"[ERROR] Неполный JSON ответ: {result}")
-                    
-            except json.JSONDecodeError as e:
-                print(f"[ERROR] Ошибка парсинга JSON: {e}")
-                print(f"[ERROR] Ответ LLM: {llm_response}")
-        
-        # Если JSON не извлечен, возвращаем как есть
-        res = llm_response
-        res += "\n\nНАВЫКИ ДЛЯ РАЗВИТИЯ:\n"
-        res += json.dumps(expanded_skills[:5], ensure_ascii=False)
-        res += "\n\nВОЗМОЖНЫЕ КАРЬЕРНЫЕ ПУТИ:\n"
-        res += json.dumps(career_paths[:3], ensure_ascii=False)
-        return llm_response
+        return render_final_response(llm_response, expanded_skills, career_paths)
         
     except Exception as e:
         print(f"[ERROR] Ошибка при генерации рекомендаций: {e}")
         return f"Произошла ошибка при генерации рекомендаций: {e}"
 
 
+async def generate_final_recommendations_stream(history, career_goals, session_id=None):
+    """
+    Потоковая генерация финальных рекомендаций.
+
+    Отдаёт текст для чата по мере генерации: поля response и recommendation
+    показываются, как только появляются в частично полученном JSON.
+    """
+    yield "⏳ Подбираю подходящие вакансии..."
+    try:
+        prepared = await build_final_messages(history, career_goals, session_id)
+    except RetrievalBusyError as e:
+        print(f"[ERROR] {e}")
+        yield RETRIEVAL_BUSY
+        return
+    if prepared is None:
+        yield NO_RECOMMENDATIONS
+        return
+    messages, expanded_skills, career_paths = prepared
+    yield "⏳ Формирую рекомендации..."
+
+    parser = PartialJSONParser()
+    llm_response = ""
+    try:
+        async for llm_response in stream_completion(
+            MODEL_URL, API_TOKEN, messages, MODEL_NAME, MODEL_TEMP, folder_id=config.FOLDER_ID,
+            client=llm_client, cache=llm_cache, admission=llm_admission, priority=PRIORITY_RECOMMENDATION,
+            breaker=llm_breaker,
+        ):
+            partial = parser.feed(llm_response[len(parser.buffer):])
+            if isinstance(partial, dict) and partial.get("response"):
+                yield parse_llm_response(partial)
+        llm_response = clean_yandex_hallucination(llm_response) or '{"response": "", "error": "empty_response"}'
+    except CircuitOpenError as e:
+        print(f"[ERROR] Ошибка при генерации рекомендаций: {e}")
+        yield f"Произошла ошибка при генерации рекомендаций: {e}"
+        return
+    except Exception as e:
+        if llm_response:
+            print(f"[ERROR] Поток прерван: {e}")
+            llm_response = clean_yandex_hallucination(llm_response)
+        else:
+            # Поток не начался — обычный запрос с повторами
+            print(f"[ERROR] Потоковая генерация недоступна: {e}")
+            llm_response = await wrapped_get_completion(
+                MODEL_URL, API_TOKEN, messages, MODEL_NAME, MODEL_TEMP, folder_id=config.FOLDER_ID,
+                client=llm_client, cache=llm_cache, admission=llm_admission, priority=PRIORITY_RECOMMENDATION,
+                budget=config.LLM_RECOMMENDATION_BUDGET, breaker=llm_breaker,
+            )
+
+    print(f"[LLM reponse]: {llm_response}")
+    yield render_final_response(llm_response, expanded_skills, career_paths)
+
+
 def parse_llm_response(data: str) -> str:
     rec = data.get("recommendation", {})
 
@@ -400,17 +483,38 @@ def parse_llm_response(data: str) -> str:
 
     return "\n".join(text)
 
-def sync_chatbot(user_input, history, current_block, question_index, waiting_for_answer):
-    history, current_block, question_index, waiting_for_answer, response = asyncio.run(
-        chatbot_step(user_input, history, current_block, question_index, waiting_for_answer)
-    )
-    return history, history, current_block, question_index, waiting_for_answer, ""
+def initial_history():
+    return [{"role": "assistant", "content": get_current_question("context", 0)}]
 
 
-def reset_chat():
-    first_question = get_current_question("context", 0)
-    initial_history = [{"role": "assistant", "content": first_question}]
-    return initial_history, initial_history, "context", 0, True, ""
+async def chat(user_input, request: gr.Request):
+    """
+    Обработчик отправки сообщения.
+
+    Async-генератор выполняется на event loop Gradio, поэтому ожидание LLM не
+    занимает поток, а пул соединений llm_client общий для всех сессий.
+    История и позиция в анкете хранятся в session_store, от клиента приходит
+    только новое сообщение.
+    """
+    session_id = request.session_hash if request else None
+    record = session_store.get_or_create(session_id, initial_history())
+    try:
+        async for history, current_block, question_index, waiting_for_answer, response in chatbot_step_stream(
+            user_input, record.history, record.block, record.question_index, record.waiting_for_answer, session_id
+        ):
+            record.history = history
+            record.block, record.question_index, record.waiting_for_answer = current_block, question_index, waiting_for_answer
+            yield history, ""
+    finally:
+        if session_id is not None:
+            session_store.save(record)
+
+
+def reset_chat(request: gr.Request):
+    session_id = request.session_hash if request else None
+    speculation.drop(session_id)
+    session_store.delete(session_id)
+    return initial_history(), ""
 
 
 with gr.Blocks() as demo:
@@ -418,32 +522,29 @@ with gr.Blocks() as demo:
     gr.Markdown("Отвечай на вопросы подробно, чтобы получить персональные карьерные рекомендации!")
 
     chatbot_ui = gr.Chatbot(
-        value=[{"role": "assistant", "content": get_current_question("context", 0)}],
+        value=initial_history(),
         type="messages"
     )
 
     msg = gr.Textbox(label="Ваш ответ:", placeholder="Введите ваш ответ здесь...")
     reset_btn = gr.Button("🔄 Начать заново")
 
-    # Состояния
-    history_state = gr.State(value=[{"role": "assistant", "content": get_current_question("context", 0)}])
-    block_state = gr.State(value="context")
-    question_index_state = gr.State(value=0)
-    waiting_for_answer_state = gr.State(value=True)
-    
-    # Отправка сообщения
-    msg.submit(
-        sync_chatbot, 
-        [msg, history_state, block_state, question_index_state, waiting_for_answer_state], 
-        [chatbot_ui, history_state, block_state, question_index_state, waiting_for_answer_state, msg]
-    )
+    # Состояние диалога хранится в session_store на сервере
+    msg.submit(chat, [msg], [chatbot_ui, msg])
 
     # Кнопка сброса
-    reset_btn.click(
-        reset_chat, 
-        [], 
-        [chatbot_ui, history_state, block_state, question_index_state, waiting_for_answer_state, msg]
-    )
+    reset_btn.click(reset_chat, [], [chatbot_ui, msg])
 
+# Обработчики асинхронные: одновременно обслуживается до UI_CONCURRENCY_LIMIT
+# диалогов, остальные ждут в очереди до UI_QUEUE_SIZE запросов
+demo.queue(default_concurrency_limit=config.UI_CONCURRENCY_LIMIT, max_size=config.UI_QUEUE_SIZE)
 
-demo.launch()
\ No newline at end of file
+
+if __name__ == "__main__":
+    # Индексы загружаются в воркерах параллельно со стартом интерфейса
+    retrieval_pool.start()
+    try:
+        demo.launch()
+    finally:
+        llm_client.close_sync()
+        retrieval_pool.shutdown()
\ No newline at end of file
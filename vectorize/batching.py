@@ -0,0 +1,125 @@
+import asyncio
+import logging
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+
+class BatchMetrics:
+    """Статистика микро-батчинга: распределение размеров батчей и время ожидания."""
+
+    def __init__(self):
+        self.batch_sizes = Counter()
+        self.batches = 0
+        self.items = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, size: int, waits: List[float]) -> None:
+        self.batch_sizes[size] += 1
+        self.batches += 1
+        self.items += size
+        self.total_wait += sum(waits)
+        self.max_wait = max([self.max_wait] + waits)
+
+    def snapshot(self) -> Dict[str, object]:
+        """Возвращает текущие метрики в виде словаря."""
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+            "batch_size_distribution": dict(sorted(self.batch_sizes.items())),
+            "mean_wait_ms": 1000 * self.total_wait / self.items if self.items else 0.0,
+            "max_wait_ms": 1000 * self.max_wait,
+        }
+
+
+class QueryEncodeBatcher:
+    """
+    Асинхронный микро-батчер для кодирования поисковых запросов.
+
+    Копит тексты запросов в течение max_wait_ms или до max_batch_size штук,
+    кодирует их одним вызовом encode_fn в пуле потоков и отдаёт каждому
+    вызывающему его собственный вектор.
+    """
+
+    def __init__(
+        self,
+        encode_fn: Callable[[List[str]], np.ndarray],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size должен быть не меньше 1")
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.metrics = BatchMetrics()
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _ensure_worker(self) -> None:
+        # Очередь и фоновая задача привязаны к event loop, поэтому при смене
+        # цикла (например, asyncio.run на каждый запрос) создаём их заново
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._worker is None or self._worker.done():
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    async def encode(self, text: str) -> np.ndarray:
+        """Кодирует один запрос в составе ближайшего батча."""
+        self._ensure_worker()
+        future = self._loop.create_future()
+        await self._queue.put((text, future, self._loop.time()))
+        return await future
+
+    async def _collect(self) -> List[Tuple[str, asyncio.Future, float]]:
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._collect()
+            batch = [item for item in batch if not item[1].cancelled()]
+            if not batch:
+                continue
+
+            # Одинаковые тексты в батче кодируем один раз
+            unique_texts = list(dict.fromkeys(text for text, _, _ in batch))
+            started = self._loop.time()
+            try:
+                vectors = await self._loop.run_in_executor(None, self.encode_fn, unique_texts)
+            except Exception as e:
+                logging.error(f"Ошибка кодирования батча из {len(batch)} запросов: {e}")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            self.metrics.record(len(batch), [started - enqueued for _, _, enqueued in batch])
+            by_text = dict(zip(unique_texts, vectors))
+            for text, future, _ in batch:
+                if not future.done():
+                    future.set_result(by_text[text])
+
+    async def close(self) -> None:
+        """Останавливает фоновую задачу батчера."""
+        if self._worker is not None and not self._worker.done():
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        self._worker = None
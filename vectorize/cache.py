@@ -0,0 +1,74 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+
+def normalize_query(text: str) -> str:
+    """Нормализует текст запроса для ключа кэша (пробелы и переносы строк)."""
+    return re.sub(r"\s+", " ", text).strip()
+
+
+class QueryEmbeddingCache:
+    """
+    Потокобезопасный LRU-кэш эмбеддингов запросов с ограничением размера и TTL.
+
+    Ключ — пара (название модели, нормализованный текст запроса).
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = 3600.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._items: "OrderedDict[Tuple[str, str], Tuple[float, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, model_name: str, text: str) -> Optional[np.ndarray]:
+        key = (model_name, normalize_query(text))
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and self.ttl is not None and time.monotonic() - item[0] > self.ttl:
+                del self._items[key]
+                self.evictions += 1
+                item = None
+            if item is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def put(self, model_name: str, text: str, vector: np.ndarray) -> None:
+        if self.max_size <= 0:
+            return
+        key = (model_name, normalize_query(text))
+        # Вектор только для чтения, чтобы вызывающий код не испортил кэш
+        vector = np.array(vector, copy=True)
+        vector.setflags(write=False)
+        with self._lock:
+            self._items[key] = (time.monotonic(), vector)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_size:
+                self._items.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """Возвращает метрики кэша: размер, попадания, промахи и hit rate."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._items),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
@@ -0,0 +1,155 @@
+import hashlib
+import heapq
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# Модель, загруженная в процессе-воркере (по одной на процесс)
+_worker_model = None
+
+
+def _init_worker(model_name: str, threads: int) -> None:
+    global _worker_model
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    # Без ограничения каждый процесс займёт все ядра и они будут мешать друг другу
+    torch.set_num_threads(threads)
+    _worker_model = SentenceTransformer(model_name, device="cpu")
+
+
+def _encode_chunk(chunk_idx: int, texts: List[str], batch_size: int) -> Tuple[int, np.ndarray]:
+    embeddings = _worker_model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+    return chunk_idx, embeddings.astype(np.float32)
+
+
+def _fingerprint(model_name: str, texts: List[str], chunk_size: int) -> str:
+    digest = hashlib.sha1(f"{model_name}|{chunk_size}|{len(texts)}".encode())
+    for text in texts:
+        digest.update(text.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class _Checkpoint:
+    """Чекпоинт готовых чанков на диске: позволяет продолжить прерванную векторизацию."""
+
+    def __init__(self, directory: str, fingerprint: str):
+        self.dir = Path(directory)
+        manifest = self.dir / "manifest.json"
+        if manifest.exists() and json.loads(manifest.read_text()).get("fingerprint") != fingerprint:
+            logging.info(f"Чекпоинт в {self.dir} построен для других данных, начинаем заново")
+            shutil.rmtree(self.dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        manifest.write_text(json.dumps({"fingerprint": fingerprint}))
+
+    def _path(self, chunk_idx: int) -> Path:
+        return self.dir / f"chunk_{chunk_idx:06d}.npy"
+
+    def has(self, chunk_idx: int) -> bool:
+        return self._path(chunk_idx).exists()
+
+    def load(self, chunk_idx: int) -> np.ndarray:
+        return np.load(self._path(chunk_idx))
+
+    def save(self, chunk_idx: int, embeddings: np.ndarray) -> None:
+        tmp_path = self._path(chunk_idx).with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            np.save(f, embeddings)
+        os.replace(tmp_path, self._path(chunk_idx))
+
+
+def encode_parallel(
+    model_name: str,
+    texts: List[str],
+    n_workers: int,
+    chunk_size: int = 1024,
+    batch_size: int = 32,
+    checkpoint_dir: Optional[str] = None,
+    max_restarts: int = 3,
+) -> Iterator[Tuple[int, np.ndarray]]:
+    """
+    Векторизует тексты пулом процессов и отдаёт эмбеддинги чанками строго по порядку.
+
+    Args:
+        model_name: Название модели Sentence-BERT
+        texts: Тексты для векторизации
+        n_workers: Число процессов-воркеров
+        chunk_size: Размер чанка, который получает воркер
+        batch_size: Размер батча внутри воркера
+        checkpoint_dir: Папка для сохранения готовых чанков; при повторном
+            запуске на тех же данных готовые чанки не пересчитываются
+        max_restarts: Сколько раз можно пересоздать пул после падения воркера
+
+    Yields:
+        Пары (номер чанка, эмбеддинги чанка) в порядке следования текстов
+    """
+    n_chunks = (len(texts) + chunk_size - 1) // chunk_size
+    checkpoint = _Checkpoint(checkpoint_dir, _fingerprint(model_name, texts, chunk_size)) if checkpoint_dir else None
+    threads = max(1, (os.cpu_count() or 1) // n_workers)
+    # Окно ограничивает число чанков в работе и в буфере переупорядочивания
+    window = 2 * n_workers
+
+    def make_pool() -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=n_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_name, threads),
+        )
+
+    to_submit = [idx for idx in range(n_chunks) if checkpoint is None or not checkpoint.has(idx)]
+    heapq.heapify(to_submit)
+    if checkpoint is not None and len(to_submit) < n_chunks:
+        logging.info(f"Из чекпоинта восстановлено {n_chunks - len(to_submit)} чанков из {n_chunks}")
+
+    pending = {}
+    ready = {}
+    next_yield = 0
+    restarts = 0
+    pool = make_pool()
+    try:
+        while next_yield < n_chunks:
+            while to_submit and to_submit[0] < next_yield + window and len(pending) < window:
+                idx = heapq.heappop(to_submit)
+                chunk = texts[idx * chunk_size:(idx + 1) * chunk_size]
+                pending[pool.submit(_encode_chunk, idx, chunk, batch_size)] = idx
+
+            if next_yield in ready:
+                yield next_yield, ready.pop(next_yield)
+                next_yield += 1
+                continue
+            if checkpoint is not None and next_yield not in pending.values() and checkpoint.has(next_yield):
+                yield next_yield, checkpoint.load(next_yield)
+                next_yield += 1
+                continue
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                idx = pending.pop(future)
+                try:
+                    _, embeddings = future.result()
+                except BrokenProcessPool:
+                    restarts += 1
+                    if restarts > max_restarts:
+                        raise
+                    logging.warning(f"Воркер векторизации упал, перезапуск пула ({restarts}/{max_restarts})")
+                    for lost_idx in [idx, *pending.values()]:
+                        heapq.heappush(to_submit, lost_idx)
+                    pending.clear()
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = make_pool()
+                    break
+                if checkpoint is not None:
+                    checkpoint.save(idx, embeddings)
+                ready[idx] = embeddings
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
@@ -1,25 +1,95 @@
+import asyncio
 import polars as pl
 import numpy as np
 import logging
-import faiss
-from sentence_transformers import SentenceTransformer
+import threading
+from contextlib import contextmanager
 from typing import List, Dict, Any, Union
-from pydantic import BaseModel, Field
-from enum import Enum
 from schema import CandidateProfile, ExperienceLevel
+from batching import QueryEncodeBatcher
+from cache import QueryEmbeddingCache
+from parallel import encode_parallel
 
 
 
+class _ReadWriteLock:
+    """Блокировка «много читателей или один писатель»; ждущий писатель не пропускает новых читателей."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
 class VacancySearchEngine:
     """Класс для поиска вакансий с использованием Sentence-BERT и FAISS."""
     
-    def __init__(self, model_name: str = "efederici/sentence-bert-base"):
-        self.model = SentenceTransformer(model_name)
+    def __init__(self, model_name: str = "efederici/sentence-bert-base", query_cache_size: int = 1024, query_cache_ttl: float = 3600.0):
+        self.model_name = model_name
+        self._model = None
+        self._model_lock = threading.Lock()
+        self.query_cache = QueryEmbeddingCache(query_cache_size, query_cache_ttl)
         self.index = None
         self.df = None
         self.dimension = None
         self.vacancy_profiles = []
+        self.batcher = None
+        self.id_mapped = False
+        self.index_factory = "Flat"
+        self.rebuild_every = 0
+        self._row_by_id = {}
+        self._embeddings = None
+        # Поиск берёт блокировку на чтение, изменения индекса — на запись
+        self._lock = _ReadWriteLock()
+        self._version = 0
+        self._mutations = 0
+        self._rebuild_thread = None
         
+    @property
+    def model(self):
+        """Модель Sentence-BERT; загружается при первом обращении."""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    self._model = SentenceTransformer(self.model_name)
+        return self._model
+
+    def warmup(self) -> None:
+        """Заранее загружает модель и тяжёлые зависимости, чтобы первый запрос не ждал."""
+        import faiss  # noqa: F401
+        self.model
+
     # Заполняет модель pydantic данными из датасета
     def _create_vacancy_profile(self, row: dict) -> CandidateProfile:
         """Создает CandidateProfile из строки вакансии."""
@@ -37,10 +107,13 @@ class VacancySearchEngine:
             if isinstance(row["skills"], str):
                 skills = [skill.strip() for skill in row["skills"].split(",")]
             elif isinstance(row["skills"], list):
-                skills = row["skills"].lower()
+                skills = [str(skill).lower() for skill in row["skills"]]
         
         experience = ExperienceLevel.NO_EXPERIENCE
-        if "experience" in row and row["experience"]:
+        # Нормализованный датасет (parser/normalize.py) уже хранит уровень опыта
+        if row.get("experience_level"):
+            experience = ExperienceLevel(row["experience_level"])
+        elif "experience" in row and row["experience"]:
             exp_str = row["experience"].lower()
             if "1" in exp_str and "3" in exp_str:
                 experience = ExperienceLevel.ONE_TO_THREE
@@ -55,12 +128,17 @@ class VacancySearchEngine:
             experience=experience
         )
     
-    def fit(self, df: pl.DataFrame) -> None:
+    def fit(self, df: pl.DataFrame, n_workers: int = 1, chunk_size: int = 1024, checkpoint_dir: str = None) -> None:
         """
         Векторизация вакансий и создание FAISS индекса.
         
         Args:
             df: DataFrame Polars с вакансиями
+            n_workers: Число процессов для векторизации; при n_workers > 1
+                тексты делятся на чанки и кодируются пулом процессов
+            chunk_size: Размер чанка для параллельной векторизации
+            checkpoint_dir: Папка для чекпоинтов готовых чанков, позволяет
+                продолжить прерванное построение индекса
         """
         self.df = df
         
@@ -72,6 +150,16 @@ class VacancySearchEngine:
             self.vacancy_profiles.append(profile)
             texts.append(profile.to_bert_string())
         
+        if self.id_mapped:
+            self._fit_id_mapped(texts, n_workers, chunk_size, checkpoint_dir)
+            return
+        
+        if n_workers > 1:
+            self._fit_parallel(texts, n_workers, chunk_size, checkpoint_dir)
+            return
+        
+        import faiss
+        
         embeddings = self.model.encode(texts, show_progress_bar=True, convert_to_numpy=True)
         self.dimension = embeddings.shape[1]
         
@@ -79,6 +167,224 @@ class VacancySearchEngine:
         self.index.add(embeddings.astype(np.float32))
         
         logging.info(f"Индекс создан для {len(embeddings)} вакансий, размерность: {self.dimension}")
+
+    def _fit_parallel(self, texts: List[str], n_workers: int, chunk_size: int, checkpoint_dir: str = None) -> None:
+        """Строит индекс, добавляя эмбеддинги чанками по мере готовности."""
+        import faiss
+        
+        self.index = None
+        total = 0
+        for chunk_idx, embeddings in encode_parallel(
+            self.model_name, texts, n_workers, chunk_size=chunk_size, checkpoint_dir=checkpoint_dir
+        ):
+            if self.index is None:
+                self.dimension = embeddings.shape[1]
+                self.index = faiss.IndexFlatL2(self.dimension)
+            self.index.add(embeddings)
+            total += len(embeddings)
+            logging.info(f"Чанк {chunk_idx}: добавлено {total} из {len(texts)} вакансий")
+        
+        logging.info(f"Индекс создан для {total} вакансий, размерность: {self.dimension}")
+
+    def _fit_id_mapped(self, texts: List[str], n_workers: int, chunk_size: int, checkpoint_dir: str = None) -> None:
+        """Строит индекс с ключами vacancy_id и сохраняет эмбеддинги для последующих пересборок."""
+        if n_workers > 1:
+            chunks = encode_parallel(
+                self.model_name, texts, n_workers, chunk_size=chunk_size, checkpoint_dir=checkpoint_dir
+            )
+            embeddings = np.vstack([chunk for _, chunk in chunks])
+        else:
+            embeddings = self.model.encode(texts, show_progress_bar=True, convert_to_numpy=True).astype(np.float32)
+        
+        self.dimension = embeddings.shape[1]
+        self._embeddings = embeddings
+        self._row_by_id = self._build_row_map(self.df)
+        self.index = self._new_id_mapped_index(embeddings, self._vacancy_ids(self.df))
+        self._mutations = 0
+        
+        logging.info(f"Индекс с vacancy_id создан для {len(embeddings)} вакансий, размерность: {self.dimension}")
+
+    def enable_id_mapping(self, index_factory: str = "Flat", rebuild_every: int = 0) -> None:
+        """
+        Включает режим индекса с ключами vacancy_id (вызывать до fit() или load_index()).
+        
+        В этом режиме доступны add_vacancies и remove_vacancies, которые
+        обновляют индекс и метаданные без полной перевекторизации. Индекс
+        меняется на месте; поиски на время изменения ждут. Если вложенный
+        индекс не плоский (HNSW, IVF и т. п.), обновление
+        существующих вакансий и удаление пересобирают индекс целиком,
+        а без сохранённых эмбеддингов завершаются ValueError.
+        
+        Args:
+            index_factory: Строка faiss.index_factory для вложенного индекса
+                (например, "Flat" или "IVF256,Flat")
+            rebuild_every: После скольких изменённых вакансий пересобирать
+                индекс в фоне (0 — не пересобирать автоматически)
+        """
+        self.id_mapped = True
+        self.index_factory = index_factory
+        self.rebuild_every = rebuild_every
+
+    def add_vacancies(self, df_delta: pl.DataFrame) -> None:
+        """
+        Добавляет новые вакансии и обновляет уже существующие по vacancy_id.
+        
+        Args:
+            df_delta: DataFrame Polars с новыми или изменёнными вакансиями
+        """
+        self._require_id_mapping()
+        if df_delta.is_empty():
+            return
+        
+        profiles = [self._create_vacancy_profile(row) for row in df_delta.iter_rows(named=True)]
+        embeddings = self._encode_queries([profile.to_bert_string() for profile in profiles])
+        ids = self._vacancy_ids(df_delta)
+        
+        with self._lock.write():
+            keep = ~np.isin(self._vacancy_ids(self.df), ids)
+            # Без сохранённых эмбеддингов (индекс без reconstruct) обновления
+            # работают, но пересборка индекса недоступна
+            all_embeddings = None if self._embeddings is None else np.vstack([self._embeddings[keep], embeddings])
+            if self._remove_from_index(ids, all_embeddings, np.concatenate([self._vacancy_ids(self.df)[keep], ids])):
+                self.index.add_with_ids(embeddings, ids)
+            self._replace_metadata(
+                pl.concat([self.df.filter(pl.Series(keep)), df_delta], how="diagonal_relaxed"),
+                [p for p, k in zip(self.vacancy_profiles, keep) if k] + profiles,
+                all_embeddings,
+                len(ids),
+            )
+        
+        logging.info(f"Добавлено/обновлено {len(ids)} вакансий, всего в индексе: {len(self.df)}")
+        self._maybe_schedule_rebuild()
+
+    def remove_vacancies(self, ids: List[int]) -> None:
+        """
+        Удаляет вакансии из индекса и метаданных.
+        
+        Args:
+            ids: Список vacancy_id для удаления
+        """
+        self._require_id_mapping()
+        ids = np.asarray(ids, dtype=np.int64)
+        if len(ids) == 0:
+            return
+        
+        with self._lock.write():
+            keep = ~np.isin(self._vacancy_ids(self.df), ids)
+            embeddings = None if self._embeddings is None else self._embeddings[keep]
+            self._remove_from_index(ids, embeddings, self._vacancy_ids(self.df)[keep])
+            self._replace_metadata(
+                self.df.filter(pl.Series(keep)),
+                [p for p, k in zip(self.vacancy_profiles, keep) if k],
+                embeddings,
+                int((~keep).sum()),
+            )
+        
+        logging.info(f"Удалено {len(ids)} вакансий, всего в индексе: {len(self.df)}")
+        self._maybe_schedule_rebuild()
+
+    def rebuild_index(self) -> bool:
+        """
+        Пересобирает (и при необходимости заново обучает) индекс по текущим вакансиям.
+        
+        Построение идёт без блокировки поиска; если за это время индекс
+        изменился, результат отбрасывается.
+        
+        Returns:
+            True, если новый индекс был установлен
+        """
+        self._require_id_mapping()
+        with self._lock.read():
+            version = self._version
+            embeddings = self._embeddings
+            ids = self._vacancy_ids(self.df)
+        if embeddings is None:
+            logging.warning("Эмбеддинги вакансий недоступны, пересборка индекса невозможна")
+            return False
+        
+        index = self._new_id_mapped_index(embeddings, ids)
+        
+        with self._lock.write():
+            if self._version != version:
+                logging.info("Индекс изменился во время пересборки, пересборка отложена")
+                return False
+            self.index = index
+            self._mutations = 0
+        
+        logging.info(f"Индекс пересобран для {len(ids)} вакансий")
+        return True
+
+    def _maybe_schedule_rebuild(self) -> None:
+        if not self.rebuild_every or self._mutations < self.rebuild_every:
+            return
+        if self._rebuild_thread is not None and self._rebuild_thread.is_alive():
+            return
+        if self._embeddings is None:
+            logging.warning("Эмбеддинги вакансий недоступны, фоновая пересборка индекса невозможна")
+            return
+        self._rebuild_thread = threading.Thread(target=self.rebuild_index, daemon=True)
+        self._rebuild_thread.start()
+
+    def _require_id_mapping(self) -> None:
+        if not self.id_mapped or self.index is None:
+            raise ValueError("Сначала включите enable_id_mapping() и постройте индекс методом fit()")
+
+    def _new_id_mapped_index(self, embeddings: np.ndarray, ids: np.ndarray):
+        import faiss
+        
+        index = faiss.index_factory(self.dimension, f"IDMap2,{self.index_factory}")
+        if not index.is_trained:
+            index.train(embeddings)
+        index.add_with_ids(embeddings, ids)
+        return index
+
+    def _remove_from_index(self, ids: np.ndarray, embeddings: np.ndarray, remaining_ids: np.ndarray) -> bool:
+        """
+        Удаляет ids из индекса на месте (вызывать под блокировкой на запись).
+        
+        Удалять на месте можно только из плоского вложенного индекса: HNSW
+        удаление не поддерживает, а IVF внутри IDMap2 после удаления
+        рассогласует нумерацию, и следующее удаление роняет процесс на
+        assert в FAISS. Остальные индексы пересобираются из embeddings
+        с ключами remaining_ids — это уже итоговое состояние, и новые векторы
+        добавлять не нужно.
+        
+        Returns:
+            True, если ids удалены из текущего индекса; False, если индекс пересобран
+        """
+        import faiss
+        
+        if not any(int(vacancy_id) in self._row_by_id for vacancy_id in ids):
+            return True
+        if isinstance(faiss.downcast_index(self.index.index), faiss.IndexFlat):
+            self.index.remove_ids(ids)
+            return True
+        if embeddings is None:
+            kind = type(faiss.downcast_index(self.index.index)).__name__
+            raise ValueError(
+                f"Индекс {kind} не поддерживает удаление на месте, а эмбеддингов для пересборки нет: "
+                "пересоберите индекс методом fit()"
+            )
+        logging.info(f"Индекс не поддерживает удаление, пересборка для {len(remaining_ids)} вакансий")
+        self.index = self._new_id_mapped_index(embeddings, remaining_ids)
+        self._mutations = 0
+        return False
+
+    def _replace_metadata(self, df: pl.DataFrame, profiles: List[CandidateProfile], embeddings: np.ndarray, changed: int) -> None:
+        self.df = df
+        self.vacancy_profiles = profiles
+        self._embeddings = embeddings
+        self._row_by_id = self._build_row_map(df)
+        self._version += 1
+        self._mutations += changed
+
+    @staticmethod
+    def _vacancy_ids(df: pl.DataFrame) -> np.ndarray:
+        return df["vacancy_id"].cast(pl.Int64).to_numpy()
+
+    @classmethod
+    def _build_row_map(cls, df: pl.DataFrame) -> Dict[int, int]:
+        return {int(vacancy_id): row for row, vacancy_id in enumerate(cls._vacancy_ids(df))}
     
     def search(self, query: Union[str, CandidateProfile], top_n: int = 5, filters: Dict[str, Any] = None) -> pl.DataFrame:
         """
@@ -95,22 +401,84 @@ class VacancySearchEngine:
         if self.index is None or self.df is None:
             raise ValueError("Сначала необходимо обучить модель методом fit()")
         
-        if isinstance(query, CandidateProfile):
-            query_text = query.to_bert_string()
-        else:
-            query_text = query
+        query_vector = self._encode_query(self._query_text(query))
+        return self._search_vector(query_vector, top_n, filters)
+
+    async def search_async(self, query: Union[str, CandidateProfile], top_n: int = 5, filters: Dict[str, Any] = None) -> pl.DataFrame:
+        """
+        Асинхронный поиск: при включённом батчинге запрос кодируется
+        вместе с другими одновременными запросами.
         
-        query_vector = self.model.encode([query_text], convert_to_numpy=True).astype(np.float32)
+        Args:
+            query: Текстовый запрос или объект CandidateProfile
+            top_n: Количество возвращаемых результатов
+            filters: Словарь фильтров (поле: значение)
+            
+        Returns:
+            DataFrame с результатами поиска
+        """
+        if self.index is None or self.df is None:
+            raise ValueError("Сначала необходимо обучить модель методом fit()")
+        if self.batcher is None:
+            return await asyncio.to_thread(self.search, query, top_n, filters)
         
-        distances, indices = self.index.search(query_vector, min(top_n * 3, len(self.df)))
+        query_text = self._query_text(query)
+        query_vector = self.query_cache.get(self.model_name, query_text)
+        if query_vector is None:
+            query_vector = await self.batcher.encode(query_text)
+            self.query_cache.put(self.model_name, query_text, query_vector)
+        return await asyncio.to_thread(self._search_vector, query_vector.reshape(1, -1), top_n, filters)
+
+    def enable_batching(self, max_batch_size: int = 32, max_wait_ms: float = 5.0) -> QueryEncodeBatcher:
+        """
+        Включает микро-батчинг кодирования запросов для search_async.
+        
+        Args:
+            max_batch_size: Максимальный размер батча
+            max_wait_ms: Максимальное время ожидания заполнения батча, мс
+            
+        Returns:
+            Батчер; его метрики доступны через batcher.metrics.snapshot()
+        """
+        self.batcher = QueryEncodeBatcher(self._encode_queries, max_batch_size, max_wait_ms)
+        return self.batcher
+
+    def _query_text(self, query: Union[str, CandidateProfile]) -> str:
+        if isinstance(query, CandidateProfile):
+            return query.to_bert_string()
+        return query
+
+    def _encode_query(self, query_text: str) -> np.ndarray:
+        """Кодирует запрос, используя кэш эмбеддингов запросов."""
+        query_vector = self.query_cache.get(self.model_name, query_text)
+        if query_vector is None:
+            query_vector = self._encode_queries([query_text])[0]
+            self.query_cache.put(self.model_name, query_text, query_vector)
+        return query_vector.reshape(1, -1)
+
+    def _encode_queries(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(texts, convert_to_numpy=True).astype(np.float32)
+
+    def _search_vector(self, query_vector: np.ndarray, top_n: int, filters: Dict[str, Any] = None) -> pl.DataFrame:
+        # Индекс меняется на месте, поэтому поиск по нему идёт под блокировкой
+        # на чтение; метаданные изменения подменяют целиком, и снимка хватает
+        with self._lock.read():
+            df = self.df
+            row_by_id = self._row_by_id if self.id_mapped else None
+            distances, indices = self.index.search(query_vector, min(top_n * 3, len(df)))
         logging.info(query_vector)
 
         results = []
+        seen_rows = set()
         for i, idx in enumerate(indices[0]):
-            if idx < 0 or idx >= len(self.df):
+            if row_by_id is not None:
+                # Удалённые вакансии уже отсутствуют в метаданных
+                idx = row_by_id.get(int(idx), -1)
+            if idx < 0 or idx >= len(df) or idx in seen_rows:
                 continue
+            seen_rows.add(idx)
                 
-            row = self.df.row(idx, named=True)
+            row = df.row(idx, named=True)
             
             if filters:
                 skip = False
@@ -148,14 +516,44 @@ class VacancySearchEngine:
         """Сохраняет FAISS индекс на диск."""
         if self.index is None:
             raise ValueError("Индекс не создан")
+        import faiss
         faiss.write_index(self.index, index_path)
     
     def load_index(self, index_path: str, df: pl.DataFrame) -> None:
         """Загружает FAISS индекс с диска."""
+        import faiss
+        
+        index = faiss.read_index(index_path)
+        # Проверяем согласованность до изменения состояния, чтобы ошибка не оставила полузагруженный индекс
+        embeddings = self._reconstruct_embeddings(index, df) if hasattr(index, "id_map") else None
+        
         self.df = df
-        self.index = faiss.read_index(index_path)
+        self.index = index
         self.dimension = self.index.d
         
         self.vacancy_profiles = []
         for row in df.iter_rows(named=True):
             self.vacancy_profiles.append(self._create_vacancy_profile(row))
+        
+        if hasattr(self.index, "id_map"):
+            self.id_mapped = True
+            self._row_by_id = self._build_row_map(df)
+            self._embeddings = embeddings
+
+    def _reconstruct_embeddings(self, index, df: pl.DataFrame):
+        """Восстанавливает эмбеддинги из индекса в порядке строк df (нужны для пересборки)."""
+        import faiss
+        
+        position_by_id = {int(vacancy_id): pos for pos, vacancy_id in enumerate(faiss.vector_to_array(index.id_map))}
+        missing = [int(vacancy_id) for vacancy_id in self._vacancy_ids(df) if int(vacancy_id) not in position_by_id]
+        if missing:
+            raise ValueError(
+                f"В индексе нет {len(missing)} vacancy_id из датасета (например, {missing[:5]}): "
+                "индекс и датасет рассинхронизированы, пересоберите индекс методом fit()"
+            )
+        try:
+            vectors = index.index.reconstruct_n(0, index.ntotal)
+        except RuntimeError:
+            logging.warning("Индекс не поддерживает восстановление векторов, пересборка будет недоступна")
+            return None
+        return vectors[[position_by_id[vacancy_id] for vacancy_id in self._vacancy_ids(df)]]